@@ -47,25 +47,42 @@ of the module:
         vectors, but will represent the perpendicular distance along the non-
         periodic direction. For 1D crystals, we use this value
         as the cross-sectional area of the crystal. Defaults to None  
+
+    jobs (-j): the number of processes used to generate the structures in
+        parallel. If 0, uses all available CPUs. Defaults to 1  
+
+    seed (-r): the master random seed. Each structure gets its own seed
+        derived from it (printed with the structure), so a run or any single
+        structure can be reproduced. Defaults to None  
+
+    unique (-u): skip structures which are duplicates of an earlier one, as
+        found by Fingerprint_filter. Defaults to False  
+
+    write (-w): a single file to write all structures to, using
+        Structure_writer. The format is chosen from the extension (.cif or
+        .extxyz, optionally followed by .gz). If not set, each structure is
+        written to its own cif file in outdir. Defaults to None  
 """
 
 import sys
+import io
+import gzip
+import json
 from time import time
 from os.path import exists
 
 from spglib import get_symmetry_dataset
 from pymatgen.core.structure import Structure
 from pymatgen.core.structure import Molecule
+from pymatgen.core.lattice import Lattice as pmg_Lattice
 from pymatgen.io.cif import CifWriter
 
 from optparse import OptionParser
 from scipy.spatial.distance import cdist
 import numpy as np
-from random import uniform as rand_u
-from random import choice as choose
-from random import randint
+from multiprocessing import Pool
 from math import sqrt, pi, sin, cos, acos, fabs
-from copy import deepcopy
+from copy import copy, deepcopy
 
 from pyxtal.database.element import Element
 import pyxtal.database.hall as hall
@@ -75,6 +92,7 @@ from pyxtal.operations import angle
 from pyxtal.operations import random_vector
 from pyxtal.operations import are_equal
 from pyxtal.operations import random_shear_matrix
+from pyxtal.operations import get_rng
 from pyxtal.symmetry import *
 
 #some optional libs
@@ -89,10 +107,18 @@ max1 = 30 #Attempts for generating lattices
 max2 = 30 #Attempts for a given lattice
 max3 = 30 #Attempts for a given Wyckoff position
 minvec = 2.0 #minimum vector length
+lattice_pool_min = 64 #Candidate cells drawn for the first refill of a Lattice's pool
+lattice_pool_size = 1000 #Largest number of candidate cells drawn per refill
 #Matrix for a Euclidean metric
 Euclidean_lattice = np.array([[1,0,0],[0,1,0],[0,0,1]])
 
 
+#Default tolerance matrices for each (prototype, factor), shared between
+#Tol_matrix objects
+tol_matrix_cache = {}
+#Atomic numbers for each specie passed to Tol_matrix.numbers_from_species
+specie_numbers = {}
+
 #Define functions
 #------------------------------
 class Tol_matrix():
@@ -130,35 +156,12 @@ class Tol_matrix():
         else:
             self.radius_type = "N/A"
         self.f = f
-        H = Element('H')
-        m = [[0.]*(len(H.elements_list)+1)]
-        for i, tup1 in enumerate(H.elements_list):
-            m.append([0.])
-            for j, tup2 in enumerate(H.elements_list):
-                #Get the appropriate atomic radii
-                if tup1[attrindex] is None:
-                    if tup1[5] is None:
-                        val1 = None
-                    else:
-                        #Use the covalent radius
-                        val1 = tup1[5]
-                else:
-                    val1 = tup1[attrindex]
-                if tup2[attrindex] is None:
-                    if tup2[5] is None:
-                        val2 = None
-                    else:
-                        #Use the covalent radius
-                        val2 = tup1[5]
-                else:
-                    val2 = tup2[attrindex]
-                if val1 is not None and val2 is not None:
-                    m[-1].append( f * (val1 + val2))
-                else:
-                    #If no radius is found for either atom, set tolerance to None
-                    m[-1].append(None)
-        self.matrix = np.array(m)
-        """A symmetric numpy matrix storing the tolerance between specie pairs."""
+        key = (prototype, factor)
+        if key not in tol_matrix_cache:
+            tol_matrix_cache[key] = Tol_matrix.build_matrix(attrindex, f)
+        self.matrix = tol_matrix_cache[key].copy()
+        """A symmetric numpy matrix storing the tolerance between specie pairs.
+        Pairs for which no radius is known are stored as nan."""
         self.custom_values = []
         """A list of tuples storing which species pair tolerances have custom values."""
 
@@ -170,11 +173,7 @@ class Tol_matrix():
             print("    All custom entries should be entered using the following form:")
             print("    (specie1, specie2, value), where value is the tolerance in Angstroms.")
 
-        self.radius_list = []
-        for i in range(len(self.matrix)):
-            if i == 0: continue
-            x = self.get_tol(i, i)
-            self.radius_list.append(x)
+        self.radius_list = [None if np.isnan(x) else x for x in np.diag(self.matrix)[1:]]
 
     def get_tol(self, specie1, specie2):
         """
@@ -187,15 +186,93 @@ class Tol_matrix():
         Returns:
             the tolerance between the provided pair of atomic species
         """
-        if self.prototype == "single_value":
+        if self.prototype == "single value":
             return self.matrix[0][0]
-        index1 = Element.number_from_specie(specie1)
-        index2 = Element.number_from_specie(specie2)
-        if index1 is not None and index2 is not None:
-            return self.matrix[index1][index2]
+        numbers = Tol_matrix.numbers_from_species([specie1, specie2])
+        if numbers is not None:
+            tol = self.matrix[numbers[0]][numbers[1]]
+            if np.isnan(tol):
+                return None
+            return tol
         else:
             return None
 
+    def get_tols(self, species1, species2=None):
+        """
+        Returns the tolerances between every pair of species from two lists.
+
+        Args:
+            species1: a list of atomic numbers (int or float), names (str), symbols
+                (str), Element objects, or pymatgen Specie objects. An array of
+                atomic numbers may also be used
+            species2: another list of species. If not given, species1 is used
+
+        Returns:
+            a numpy array whose [i][j] entry is the tolerance between species1[i]
+            and species2[j]. If any specie is invalid, returns None
+        """
+        if species2 is None:
+            species2 = species1
+        if self.prototype == "single value":
+            return np.full((len(species1), len(species2)), self.matrix[0][0])
+        numbers1 = Tol_matrix.numbers_from_species(species1)
+        numbers2 = Tol_matrix.numbers_from_species(species2)
+        if numbers1 is None or numbers2 is None:
+            return None
+        return self.matrix[numbers1[:,None], numbers2[None,:]]
+
+    def numbers_from_species(species):
+        """
+        Returns the atomic numbers for a list of species. The number for each
+        specie is cached, so repeated species do not create new Element objects.
+
+        Args:
+            species: a list of atomic numbers (int or float), names (str), symbols
+                (str), Element objects, or pymatgen Specie objects. An array of
+                atomic numbers is returned unchanged
+
+        Returns:
+            a numpy array of atomic numbers. If any specie is invalid, returns None
+        """
+        if isinstance(species, np.ndarray) and species.dtype.kind in "iu":
+            return species
+        numbers = []
+        for specie in species:
+            try:
+                number = specie_numbers[specie]
+            except KeyError:
+                number = Element.number_from_specie(specie)
+                if number is not None:
+                    specie_numbers[specie] = number
+            except TypeError:
+                #Unhashable species are not cached
+                number = Element.number_from_specie(specie)
+            if number is None:
+                return None
+            numbers.append(number)
+        return np.array(numbers, dtype=int)
+
+    def build_matrix(attrindex, f):
+        """
+        Builds the default tolerance matrix from the atomic radii in the element
+        list. Elements without the requested radius use their covalent radius.
+
+        Args:
+            attrindex: the index of the radius within Element.elements_list
+            f: the factor to multiply the sum of two radii by
+
+        Returns:
+            a numpy matrix whose indices correspond to atomic numbers. The 0th row
+            and column are 0, and pairs with no known radius are nan
+        """
+        elements_list = Element.elements_list
+        radii = np.array([el[attrindex] for el in elements_list], dtype=float)
+        covalent = np.array([el[5] for el in elements_list], dtype=float)
+        radii = np.where(np.isnan(radii), covalent, radii)
+        m = np.zeros([len(radii)+1, len(radii)+1])
+        m[1:,1:] = f * (radii[:,None] + radii[None,:])
+        return m
+
     def set_tol(self, specie1, specie2, value):
         """
         Sets the distance tolerance between two species.
@@ -361,7 +438,7 @@ class Tol_matrix():
             print("Error: Could not load Tol_matrix from file.")
             return
 
-def gaussian(min, max, sigma=3.0):
+def gaussian(min, max, sigma=3.0, rng=None):
     """
     Choose a random number from a Gaussian probability distribution centered
     between min and max. sigma is the number of standard deviations that min
@@ -374,15 +451,17 @@ def gaussian(min, max, sigma=3.0):
         min: the minimum acceptable value
         max: the maximum acceptable value
         sigma: the number of standard deviations between the center and min or max
+        rng: an optional numpy.random.Generator to draw from
 
     Returns:
         a value chosen randomly between min and max
     """
+    rng = get_rng(rng)
     center = (max+min)*0.5
     delta = fabs(max-min)*0.5
     ratio = delta/sigma
     while True:
-        x = np.random.normal(scale=ratio, loc=center)
+        x = rng.normal(scale=ratio, loc=center)
         if x > min and x < max:
             return x
 
@@ -440,19 +519,10 @@ def check_distance(coord1, coord2, species1, species2, lattice, PBC=[1,1,1], tm=
         return True
 
     #Create tolerance matrix from subset of tm
-    tols = np.zeros((len(species1),len(species2)))
-    for i1, specie1 in enumerate(species1):
-        for i2, specie2 in enumerate(species2):
-            tols[i1][i2] = tm.get_tol(specie1, specie2)
+    tols = tm.get_tols(species1, species2)
 
-    #Calculate the distance between each i, j pair
-    d = distance_matrix(coord1, coord2, lattice, PBC=PBC)
-
-    #Check if the distance is ever less than the tolerance
-    if (d < tols).sum() > 0:
-        return False
-    else:
-        return True
+    #Check if the distance between any i, j pair is less than the tolerance
+    return Neighbor_search(coord2, lattice, tols.max(), PBC=PBC).check(coord1, tols)
 
 def check_images(coords, species, lattice, PBC=[1,1,1], tm=Tol_matrix(prototype="atomic"), d_factor=1.0):
     """
@@ -481,6 +551,220 @@ def check_images(coords, species, lattice, PBC=[1,1,1], tm=Tol_matrix(prototype=
         new_species += species
     return check_distance(coords, np.array(new_coords), species, new_species, lattice, PBC=[0,0,0], tm=tm, d_factor=d_factor)
 
+class Occupied_space():
+    """
+    Class for storing the atoms which have already been placed in a crystal,
+    and checking new atoms against them. Atoms are sorted into a grid of bins at
+    least as wide as the cutoff, so checking a new set of atoms only compares it
+    with atoms in neighboring bins, and the cost does not grow with the size of
+    the crystal. Used within random_crystal and molecular_crystal while adding
+    Wyckoff positions.
+
+    New atoms are first checked with test, then stored with commit, along with
+    an optional site object (a Wyckoff_site or mol_site) describing them. The
+    atoms and sites form an append-only stack: checkpoint records the current
+    state as an integer, and rollback truncates every atom and site stored
+    after it, so no copies are made while backtracking.
+
+    Atoms may be given integer labels, such as the number of the molecule
+    they belong to. Pairs of atoms with the same label are not checked, so a
+    molecular crystal can check a stored site against all stored molecules
+    except its own.
+
+    Args:
+        lattice: a 3x3 matrix describing the unit cell vectors
+        cutoff: the largest tolerance (in Angstroms) between any two species
+            which will be stored
+        PBC: A periodic boundary condition list, where 1 means periodic, 0 means not periodic.
+            Ex: [1,1,1] -> full 3d periodicity, [0,0,1] -> periodicity along the z axis
+        tm: a Tol_matrix object used to look up the tolerance between species
+        factor: the tolerances are multiplied by this amount
+    """
+    def __init__(self, lattice, cutoff, PBC=[1,1,1], tm=Tol_matrix(prototype="atomic"), factor=1.0):
+        self.lattice = np.array(lattice, dtype=float)
+        self.cutoff = cutoff
+        self.PBC = PBC
+        self.tm = tm
+        self.factor = factor
+        #Choose the number of bins along each axis so that each bin is at
+        #least cutoff wide, measured between lattice planes
+        volume = abs(np.linalg.det(self.lattice))
+        self.nbins = np.ones(3, dtype=int)
+        for i in range(3):
+            area = np.linalg.norm(np.cross(self.lattice[(i+1)%3], self.lattice[(i+2)%3]))
+            if area > 0 and cutoff > 0:
+                self.nbins[i] = max(1, int(volume / area / cutoff))
+        self.offsets = create_matrix().astype(int)
+        self.translations = image_translations(self.lattice, cutoff, PBC=PBC)
+        self.coords = np.zeros([64,3])
+        """A buffer holding the fractional coordinates of the stored atoms in
+        its first len(self) rows"""
+        self.species = []
+        """The atomic species of the stored atoms"""
+        self.labels = []
+        """The labels of the stored atoms, or -1 for unlabeled atoms"""
+        self.sites = []
+        """The site objects stored with commit, in order"""
+        self.site_starts = []
+        self.keys = []
+        self.bins = {}
+        self.pending = None
+        self.violation = None
+        """The species of the closest pair of atoms (new, stored) which made
+        the last call to test fail, or None"""
+        self.last_checkpoint = 0
+
+    def __len__(self):
+        return len(self.species)
+
+    def get_bin(self, key):
+        #Wrap bin indices along the periodic axes
+        return tuple(k % n if a else k for k, n, a in zip(key, self.nbins, self.PBC))
+
+    def test(self, coords, species, labels=None):
+        """
+        Checks whether a set of new atoms is far enough away from every stored
+        atom. Distances between the new atoms themselves are not checked. If the
+        check passes, the new atoms are kept until commit is called.
+
+        Args:
+            coords: a list of fractional coordinates
+            species: a list of atomic species for each coordinate
+            labels: an optional list of integer labels for each coordinate.
+                Distances to stored atoms with the same label are not checked
+
+        Returns:
+            True if the new atoms are not too close to any stored atom, False
+            otherwise
+        """
+        coords = filtered_coords(np.reshape(coords, (-1,3)), PBC=self.PBC)
+        keys = [tuple(k) for k in np.floor(coords * self.nbins).astype(int)]
+        self.pending = None
+        self.violation = None
+        #Find the stored atoms in or next to the bins of the new atoms
+        candidates = set()
+        for key in set(keys):
+            for offset in self.offsets:
+                b = self.get_bin(np.add(key, offset))
+                if b in self.bins:
+                    candidates.update(self.bins[b])
+        if len(candidates) > 0:
+            c = np.array(sorted(candidates))
+            #Shortest distance over all periodic images
+            images = self.coords[c][None,:,:] + self.translations[:,None,:]
+            displacements = np.dot(images[:,None,:,:] - coords[None,:,None,:], self.lattice)
+            d = np.min(np.linalg.norm(displacements, axis=-1), axis=0)
+            if labels is not None:
+                stored = np.array(self.labels)[c]
+                d[(np.reshape(labels, (-1,1)) == stored[None,:]) & (stored >= 0)[None,:]] = np.inf
+            tols = self.tm.get_tols(species, [self.species[j] for j in c]) * self.factor
+            if (d < tols).any():
+                a, b = np.unravel_index(np.argmin(d - tols), d.shape)
+                self.violation = (species[a], self.species[c[b]])
+                return False
+        self.pending = (coords, list(species), keys, labels)
+        return True
+
+    def commit(self, coords=None, species=None, site=None, labels=None):
+        """
+        Stores the atoms from the last successful call to test. If coords and
+        species are given, stores those atoms instead, without checking them.
+
+        Args:
+            coords: an optional list of fractional coordinates
+            species: a list of atomic species for each coordinate
+            site: an optional object describing the new atoms, which is
+                returned by get_sites until it is rolled back
+            labels: an optional list of integer labels for each coordinate.
+                Defaults to the labels passed to test, if any
+        """
+        if coords is not None:
+            coords = filtered_coords(np.reshape(coords, (-1,3)), PBC=self.PBC)
+            keys = [tuple(k) for k in np.floor(coords * self.nbins).astype(int)]
+            self.pending = (coords, list(species), keys, labels)
+        if self.pending is None:
+            return
+        coords, species, keys, pending_labels = self.pending
+        if labels is None:
+            labels = pending_labels
+        if labels is None:
+            labels = [-1] * len(species)
+        if site is not None:
+            self.sites.append(site)
+            self.site_starts.append(len(self.species))
+        for key in keys:
+            b = self.get_bin(key)
+            if b not in self.bins:
+                self.bins[b] = []
+            self.bins[b].append(len(self.keys))
+            self.keys.append(b)
+        n = len(self.species)
+        if n + len(coords) > len(self.coords):
+            size = max(2*len(self.coords), n+len(coords))
+            self.coords = np.vstack([self.coords, np.zeros([size-len(self.coords),3])])
+        self.coords[n:n+len(coords)] = coords
+        self.species += species
+        self.labels += [int(l) for l in labels]
+        self.pending = None
+
+    def checkpoint(self):
+        """
+        Records the current set of stored atoms, so that rollback can return to it.
+
+        Returns:
+            the number of stored atoms, which may be passed to rollback
+        """
+        self.last_checkpoint = len(self.species)
+        return self.last_checkpoint
+
+    def rollback(self, checkpoint=None):
+        """
+        Removes all atoms and sites stored after a checkpoint.
+
+        Args:
+            checkpoint: the number of atoms to keep, as returned by checkpoint.
+                Defaults to the most recent checkpoint
+
+        Returns:
+            a list of the removed sites, in the order they were stored
+        """
+        if checkpoint is None:
+            checkpoint = self.last_checkpoint
+        #Atoms are appended to the bins in order, so the newest are at the end
+        for i in range(len(self.keys)-1, checkpoint-1, -1):
+            b = self.keys.pop()
+            self.bins[b].pop()
+            if self.bins[b] == []:
+                del self.bins[b]
+        del self.species[checkpoint:]
+        del self.labels[checkpoint:]
+        removed = []
+        while self.site_starts and self.site_starts[-1] >= checkpoint:
+            self.site_starts.pop()
+            removed.append(self.sites.pop())
+        self.last_checkpoint = min(self.last_checkpoint, checkpoint)
+        self.pending = None
+        return removed[::-1]
+
+    def get_coords_and_species(self):
+        """
+        Returns the stored atoms.
+
+        Returns:
+            coords, species: a numpy array of fractional coordinates, and a list
+            of atomic species for each coordinate
+        """
+        return self.coords[:len(self.species)].copy(), list(self.species)
+
+    def get_sites(self):
+        """
+        Returns the stored site objects.
+
+        Returns:
+            a list of the site objects passed to commit, in order
+        """
+        return list(self.sites)
+
 def get_center(xyzs, lattice, PBC=[1,1,1]):
     """
     Finds the geometric centers of the clusters under periodic boundary
@@ -715,12 +999,9 @@ def find_short_dist(coor, lattice, tol, PBC=[1,1,1]):
     for i in range(len(coor)):
         graph.append([])
 
-    d = distance_matrix(coor, coor, lattice, PBC=PBC)
-    ijs = np.where(d<= tol)
-    for i in np.unique(ijs[0]):
-        j = ijs[1][i]
+    for i, j, d in zip(*find_pairs(coor, coor, lattice, tol, PBC=PBC)):
         if j <= i: continue
-        pairs.append([i, j, d[i][j]])
+        pairs.append([i, j, d])
 
     pairs = np.array(pairs)
     if len(pairs) > 0:
@@ -832,7 +1113,37 @@ def merge_coordinate(coor, lattice, group, tol):
                 index, point = check_wyckoff_position(coor, group)
             return coor, index, point
 
-def estimate_volume(numIons, species, factor=1.0):
+def sample_wyckoff(wp, point, lattice, tol, PBC=[1,1,1]):
+    """
+    Places a point directly into a Wyckoff position, without merging. The
+    point is mapped onto the free parameters of the position by its first
+    operation (for example, x,0,1/4), and then expanded into the full orbit.
+    Used in place of merge_coordinate when the Wyckoff position is chosen in
+    advance, so that special positions do not have to be found by merging
+    general ones.
+
+    Args:
+        wp: a Wyckoff_position object
+        point: a random fractional 3-vector, such as from Lattice.generate_point
+        lattice: a 3x3 matrix representing the unit cell
+        tol: the minimum distance allowed between points in the orbit
+        PBC: A periodic boundary condition list, where 1 means periodic, 0 means not periodic.
+            Ex: [1,1,1] -> full 3d periodicity, [0,0,1] -> periodicity along the z axis
+
+    Returns:
+        coor, point: (coor) is the list of fractional coordinates for the
+        orbit, and (point) is the generating 3-vector. If any two points in
+        the orbit are closer than tol, returns None, None
+    """
+    point = wp[0].operate(point)
+    coor = filtered_coords(wp.operate_many(point), PBC=PBC)
+    if len(coor) > 1:
+        xs, ys, ds = find_pairs(coor, coor, lattice, tol, PBC=PBC)
+        if (xs != ys).any():
+            return None, None
+    return coor, point
+
+def estimate_volume(numIons, species, factor=1.0, rng=None):
     """
     Estimates the volume of a unit cell based on the number and types of ions.
     Assumes each atom takes up a sphere with radius equal to its covalent bond
@@ -844,17 +1155,19 @@ def estimate_volume(numIons, species, factor=1.0):
             element in the list should be a string for the atomic symbol
         factor: an optional factor to multiply the result by. Larger values
             allow more space between atoms
+        rng: an optional numpy.random.Generator to draw the radii from
     
     Returns:
         a float value for the estimated volume
     """
+    rng = get_rng(rng)
     volume = 0
     for numIon, specie in zip(numIons, species):
-        r = rand_u(Element(specie).covalent_radius, Element(specie).vdw_radius)
+        r = rng.uniform(Element(specie).covalent_radius, Element(specie).vdw_radius)
         volume += numIon*4/3*pi*r**3
     return factor*volume
 
-def generate_lattice(ltype, volume, minvec=tol_m, minangle=pi/6, max_ratio=10.0, maxattempts = 100, **kwargs):
+def generate_lattice(ltype, volume, minvec=tol_m, minangle=pi/6, max_ratio=10.0, maxattempts = 100, rng=None, **kwargs):
     """
     Generates a lattice (3x3 matrix) according to the space group symmetry and
     number of atoms. If the spacegroup has centering, we will transform to
@@ -869,6 +1182,7 @@ def generate_lattice(ltype, volume, minvec=tol_m, minangle=pi/6, max_ratio=10.0,
         minangle: minimum allowed lattice angle (among alpha, beta, and gamma)
         max_ratio: largest allowed ratio of two lattice vector lengths
         maxattempts: the maximum number of attempts for generating a lattice
+        rng: an optional numpy.random.Generator to draw from
         kwargs: a dictionary of optional values. These include:
             'unique_axis': the axis ('a', 'b', or 'c') which is not symmetrically
                 equivalent to the other two
@@ -889,10 +1203,10 @@ def generate_lattice(ltype, volume, minvec=tol_m, minangle=pi/6, max_ratio=10.0,
         #if sg <= 2:
         if ltype == "triclinic":
             #Derive lattice constants from a random matrix
-            mat = random_shear_matrix(width=0.2)
+            mat = random_shear_matrix(width=0.2, rng=rng)
             a, b, c, alpha, beta, gamma = matrix2para(mat)
             x = sqrt(1-cos(alpha)**2 - cos(beta)**2 - cos(gamma)**2 + 2*(cos(alpha)*cos(beta)*cos(gamma)))
-            vec = random_vector()
+            vec = random_vector(rng=rng)
             abc = volume/x
             xyz = vec[0]*vec[1]*vec[2]
             a = vec[0]*np.cbrt(abc)/np.cbrt(xyz)
@@ -902,9 +1216,9 @@ def generate_lattice(ltype, volume, minvec=tol_m, minangle=pi/6, max_ratio=10.0,
         #elif sg <= 15:
         elif ltype == "monoclinic":
             alpha, gamma  = pi/2, pi/2
-            beta = gaussian(minangle, maxangle)
+            beta = gaussian(minangle, maxangle, rng=rng)
             x = sin(beta)
-            vec = random_vector()
+            vec = random_vector(rng=rng)
             xyz = vec[0]*vec[1]*vec[2]
             abc = volume/x
             a = vec[0]*np.cbrt(abc)/np.cbrt(xyz)
@@ -915,7 +1229,7 @@ def generate_lattice(ltype, volume, minvec=tol_m, minangle=pi/6, max_ratio=10.0,
         elif ltype == "orthorhombic":
             alpha, beta, gamma = pi/2, pi/2, pi/2
             x = 1
-            vec = random_vector()
+            vec = random_vector(rng=rng)
             xyz = vec[0]*vec[1]*vec[2]
             abc = volume/x
             a = vec[0]*np.cbrt(abc)/np.cbrt(xyz)
@@ -926,7 +1240,7 @@ def generate_lattice(ltype, volume, minvec=tol_m, minangle=pi/6, max_ratio=10.0,
         elif ltype == "tetragonal":
             alpha, beta, gamma = pi/2, pi/2, pi/2
             x = 1
-            vec = random_vector()
+            vec = random_vector(rng=rng)
             c = vec[2]/(vec[0]*vec[1])*np.cbrt(volume/x)
             a = b = sqrt((volume/x)/c)
         #Trigonal/Rhombohedral/Hexagonal
@@ -934,7 +1248,7 @@ def generate_lattice(ltype, volume, minvec=tol_m, minangle=pi/6, max_ratio=10.0,
         elif ltype == "hexagonal":
             alpha, beta, gamma = pi/2, pi/2, pi/3*2
             x = sqrt(3.)/2.
-            vec = random_vector()
+            vec = random_vector(rng=rng)
             c = vec[2]/(vec[0]*vec[1])*np.cbrt(volume/x)
             a = b = sqrt((volume/x)/c)
         #Cubic
@@ -982,7 +1296,7 @@ def generate_lattice(ltype, volume, minvec=tol_m, minangle=pi/6, max_ratio=10.0,
     print("Error: Could not generate lattice after "+str(n+1)+" attempts for volume ", volume)
     return
 
-def generate_lattice_2D(ltype, volume, thickness=None, minvec=tol_m, minangle=pi/6, max_ratio=10.0, maxattempts = 100, **kwargs):
+def generate_lattice_2D(ltype, volume, thickness=None, minvec=tol_m, minangle=pi/6, max_ratio=10.0, maxattempts = 100, rng=None, **kwargs):
     """
     Generates a lattice (3x3 matrix) according to the spacegroup symmetry and
     number of atoms. If the layer group has centering, we will use the
@@ -1002,6 +1316,7 @@ def generate_lattice_2D(ltype, volume, thickness=None, minvec=tol_m, minangle=pi
         minangle: minimum allowed lattice angle (among alpha, beta, and gamma)
         max_ratio: largest allowed ratio of two lattice vector lengths
         maxattempts: the maximum number of attempts for generating a lattice
+        rng: an optional numpy.random.Generator to draw from
         kwargs: a dictionary of optional values. These include:
             'unique_axis': the axis ('a', 'b', or 'c') which is not symmetrically
                 equivalent to the other two
@@ -1029,7 +1344,7 @@ def generate_lattice_2D(ltype, volume, thickness=None, minvec=tol_m, minangle=pi
     for n in range(maxattempts):
         abc = np.ones([3])
         if thickness is None:
-            v = random_vector()
+            v = random_vector(rng=rng)
             thickness1 = np.cbrt(volume)*(v[0]/(v[0]*v[1]*v[2]))
         else:
             thickness1 = thickness
@@ -1038,7 +1353,7 @@ def generate_lattice_2D(ltype, volume, thickness=None, minvec=tol_m, minangle=pi
         #Triclinic
         #if num <= 2:
         if ltype == "triclinic":
-            mat = random_shear_matrix(width=0.2)
+            mat = random_shear_matrix(width=0.2, rng=rng)
             a, b, c, alpha, beta, gamma = matrix2para(mat)
             x = sqrt(1-cos(alpha)**2 - cos(beta)**2 - cos(gamma)**2 + 2*(cos(alpha)*cos(beta)*cos(gamma)))
             abc[NPA-1] = abc[NPA-1]/x #scale thickness by outer product of vectors
@@ -1057,15 +1372,15 @@ def generate_lattice_2D(ltype, volume, thickness=None, minvec=tol_m, minangle=pi
         #Monoclinic
         #elif num <= 18:
         elif ltype == "monoclinic":
-            a, b, c = random_vector()
+            a, b, c = random_vector(rng=rng)
             if unique_axis == "a":
-                alpha = gaussian(minangle, maxangle)
+                alpha = gaussian(minangle, maxangle, rng=rng)
                 x = sin(alpha)
             elif unique_axis == "b":
-                beta = gaussian(minangle, maxangle)
+                beta = gaussian(minangle, maxangle, rng=rng)
                 x = sin(beta)
             elif unique_axis == "c":
-                gamma = gaussian(minangle, maxangle)
+                gamma = gaussian(minangle, maxangle, rng=rng)
                 x = sin(gamma)
             ab = volume/(abc[NPA-1]*x)
             ratio = a/b
@@ -1082,7 +1397,7 @@ def generate_lattice_2D(ltype, volume, thickness=None, minvec=tol_m, minangle=pi
         #Orthorhombic
         #elif num <= 48:
         elif ltype == "orthorhombic":
-            vec = random_vector()
+            vec = random_vector(rng=rng)
             if NPA == 3:
                 ratio = abs(vec[0]/vec[1]) #ratio a/b
                 abc[1] = sqrt(volume/(thickness1*ratio))
@@ -1163,7 +1478,7 @@ def generate_lattice_2D(ltype, volume, thickness=None, minvec=tol_m, minangle=pi
     print("Error: Could not generate lattice after "+str(n+1)+" attempts")
     return
 
-def generate_lattice_1D(ltype, volume, area=None, minvec=tol_m, minangle=pi/6, max_ratio=10.0, maxattempts = 100, **kwargs):
+def generate_lattice_1D(ltype, volume, area=None, minvec=tol_m, minangle=pi/6, max_ratio=10.0, maxattempts = 100, rng=None, **kwargs):
     """
     Generates a lattice (3x3 matrix) according to the spacegroup symmetry and
     number of atoms. If the spacegroup has centering, we will transform to
@@ -1183,6 +1498,7 @@ def generate_lattice_1D(ltype, volume, area=None, minvec=tol_m, minangle=pi/6, m
         minangle: minimum allowed lattice angle (among alpha, beta, and gamma)
         max_ratio: largest allowed ratio of two lattice vector lengths
         maxattempts: the maximum number of attempts for generating a lattice
+        rng: an optional numpy.random.Generator to draw from
         kwargs: a dictionary of optional values. These include:
             'unique_axis': the axis ('a', 'b', or 'c') which is not symmetrically
                 equivalent to the other two
@@ -1210,7 +1526,7 @@ def generate_lattice_1D(ltype, volume, area=None, minvec=tol_m, minangle=pi/6, m
     for n in range(maxattempts):
         abc = np.ones([3])
         if area is None:
-            v = random_vector()
+            v = random_vector(rng=rng)
             thickness1 = np.cbrt(volume)*(v[0]/(v[0]*v[1]*v[2]))
         else:
             thickness1 = volume/area
@@ -1219,7 +1535,7 @@ def generate_lattice_1D(ltype, volume, area=None, minvec=tol_m, minangle=pi/6, m
         #Triclinic
         #if num <= 2:
         if ltype == "triclinic":
-            mat = random_shear_matrix(width=0.2)
+            mat = random_shear_matrix(width=0.2, rng=rng)
             a, b, c, alpha, beta, gamma = matrix2para(mat)
             x = sqrt(1-cos(alpha)**2 - cos(beta)**2 - cos(gamma)**2 + 2*(cos(alpha)*cos(beta)*cos(gamma)))
             abc[PA-1] = abc[PA-1]/x #scale thickness by outer product of vectors
@@ -1238,15 +1554,15 @@ def generate_lattice_1D(ltype, volume, area=None, minvec=tol_m, minangle=pi/6, m
         #Monoclinic
         #elif num <= 12:
         elif ltype == "monoclinic":
-            a, b, c = random_vector()
+            a, b, c = random_vector(rng=rng)
             if unique_axis == "a":
-                alhpa = gaussian(minangle, maxangle)
+                alhpa = gaussian(minangle, maxangle, rng=rng)
                 x = sin(alpha)
             elif unique_axis == "b":
-                beta = gaussian(minangle, maxangle)
+                beta = gaussian(minangle, maxangle, rng=rng)
                 x = sin(beta)
             elif unique_axis == "c":
-                gamma = gaussian(minangle, maxangle)
+                gamma = gaussian(minangle, maxangle, rng=rng)
                 x = sin(gamma)
             ab = volume/(abc[PA-1]*x)
             ratio = a/b
@@ -1263,7 +1579,7 @@ def generate_lattice_1D(ltype, volume, area=None, minvec=tol_m, minangle=pi/6, m
         #Orthorhombic
         #lif num <= 22:
         elif ltype == "orthorhombic":
-            vec = random_vector()
+            vec = random_vector(rng=rng)
             if PA == 3:
                 ratio = abs(vec[0]/vec[1]) #ratio a/b
                 abc[1] = sqrt(volume/(thickness1*ratio))
@@ -1344,7 +1660,7 @@ def generate_lattice_1D(ltype, volume, area=None, minvec=tol_m, minangle=pi/6, m
     print("Error: Could not generate lattice after "+str(n+1)+" attempts")
     return
 
-def generate_lattice_0D(ltype, volume, area=None, minvec=tol_m, max_ratio=20.0, maxattempts = 100, **kwargs):
+def generate_lattice_0D(ltype, volume, area=None, minvec=tol_m, max_ratio=20.0, maxattempts = 100, rng=None, **kwargs):
     """
     Generates a lattice (3x3 matrix) according to the spacegroup symmetry and
     number of atoms. If the spacegroup has centering, we will transform to
@@ -1363,6 +1679,7 @@ def generate_lattice_0D(ltype, volume, area=None, minvec=tol_m, max_ratio=20.0,
         minvec: minimum allowed lattice vector length (among a, b, and c)
         max_ratio: largest allowed ratio of two lattice vector lengths
         maxattempts: the maximum number of attempts for generating a lattice
+        rng: an optional numpy.random.Generator to draw from
         kwargs: a dictionary of optional values. Only used for cylindrical
             lattices, which pass the value to generate_lattice. Possible values include:
             'unique_axis': the axis ('a', 'b', or 'c') which is not symmetrically
@@ -1388,9 +1705,258 @@ def generate_lattice_0D(ltype, volume, area=None, minvec=tol_m, max_ratio=20.0,
         return np.array([a, b, c, alpha, beta, gamma])
     if ltype == "cylindrical":
         #Use a tetragonal lattice with altered volume
-        return generate_lattice("tetragonal", volume*4/pi, minvec=minvec, max_ratio=max_ratio, maxattempts=maxattempts, **kwargs)
+        return generate_lattice("tetragonal", volume*4/pi, minvec=minvec, max_ratio=max_ratio, maxattempts=maxattempts, rng=rng, **kwargs)
+
+def gaussian_batch(min, max, size, sigma=3.0, rng=None):
+    """
+    Vectorized version of gaussian. Draws size values at once, redrawing only
+    those which fall outside of (min, max).
+
+    Args:
+        min: the minimum acceptable value
+        max: the maximum acceptable value
+        size: the number of values to draw
+        sigma: the number of standard deviations between the center and min or max
+        rng: an optional numpy.random.Generator to draw from
 
-def choose_wyckoff(group, number):
+    Returns:
+        a numpy array of size values chosen randomly between min and max
+    """
+    rng = get_rng(rng)
+    center = (max+min)*0.5
+    ratio = fabs(max-min)*0.5/sigma
+    x = rng.normal(scale=ratio, loc=center, size=size)
+    bad = (x <= min) | (x >= max)
+    while bad.any():
+        x[bad] = rng.normal(scale=ratio, loc=center, size=bad.sum())
+        bad = (x <= min) | (x >= max)
+    return x
+
+def random_vector_batch(size, width=0.35, rng=None):
+    """
+    Vectorized version of random_vector.
+
+    Args:
+        size: the number of vectors to draw
+        width: the width of the normal distribution of the natural log of the
+            vector components
+        rng: an optional numpy.random.Generator to draw from
+
+    Returns:
+        an nx3 numpy array of floats
+    """
+    return np.exp(get_rng(rng).normal(scale=width, size=(size, 3)))
+
+def random_shear_batch(size, width=0.2, rng=None):
+    """
+    Vectorized version of random_shear_matrix. Singular matrices are not
+    redrawn; they lead to a zero volume, and fail the lattice checks.
+
+    Args:
+        size: the number of matrices to draw
+        width: the width of the normal distribution of the off-diagonal elements
+        rng: an optional numpy.random.Generator to draw from
+
+    Returns:
+        an nx3x3 numpy array of symmetric matrices with unit diagonals
+    """
+    a, b, c = get_rng(rng).normal(scale=width, size=(3, size))
+    one = np.ones(size)
+    return np.stack([np.stack([one, a, b], axis=1),
+                     np.stack([a, one, c], axis=1),
+                     np.stack([b, c, one], axis=1)], axis=1)
+
+def volume_factor_batch(para):
+    """
+    Ratio between the volume of each cell and the product a*b*c of its vector
+    lengths, which only depends on the lattice angles.
+
+    Args:
+        para: an nx6 array of lattice parameters, with angles in radians
+
+    Returns:
+        a numpy array of n values between 0 and 1
+    """
+    ca, cb, cg = np.cos(para[:,3]), np.cos(para[:,4]), np.cos(para[:,5])
+    return np.sqrt(np.maximum(1 - ca**2 - cb**2 - cg**2 + 2*ca*cb*cg, 0))
+
+def matrix2para_batch(matrices):
+    """
+    Vectorized version of matrix2para for a stack of cell matrices.
+
+    Args:
+        matrices: an nx3x3 array, where each 3x3 matrix has the a, b, and c
+            vectors as rows
+
+    Returns:
+        an nx6 array of lattice parameters [a, b, c, alpha, beta, gamma], with
+        angles in radians
+    """
+    matrices = np.asarray(matrices)
+    lengths = np.linalg.norm(matrices, axis=2)
+    para = np.zeros([len(matrices), 6])
+    para[:,:3] = lengths
+    #alpha (b, c), beta (a, c), gamma (a, b)
+    for k, (i, j) in enumerate([(1, 2), (0, 2), (0, 1)]):
+        dot = np.einsum('ij,ij->i', matrices[:,i], matrices[:,j])
+        para[:,3+k] = np.arccos(np.clip(dot/(lengths[:,i]*lengths[:,j]), -1, 1))
+    return para
+
+def check_lattice_batch(para, minvec=tol_m, minangle=pi/6, max_ratio=10.0, **kwargs):
+    """
+    Applies the checks of generate_lattice to many sets of lattice parameters
+    at once.
+
+    Args:
+        para: an nx6 array of lattice parameters [a, b, c, alpha, beta, gamma],
+            with angles in radians
+        minvec: minimum allowed lattice vector length (among a, b, and c)
+        minangle: minimum allowed lattice angle (among alpha, beta, and gamma)
+        max_ratio: largest allowed ratio of two lattice vector lengths
+        kwargs: optional 'min_l', 'mid_l' and 'max_l' limits on the sorted cell
+            vector lengths, as for generate_lattice
+
+    Returns:
+        a boolean array, True for each row of para which passes all checks
+    """
+    maxangle = pi-minangle
+    min_l = kwargs.get('min_l', minvec)
+    mid_l = kwargs.get('mid_l', min_l)
+    max_l = kwargs.get('max_l', mid_l)
+    abc, angles = para[:,:3], para[:,3:]
+    l = np.sort(abc, axis=1)
+    maxvec = np.prod(abc, axis=1)/(minvec**2)
+    #a*cos(max(beta, gamma)), b*cos(max(alpha, gamma)), c*cos(max(alpha, beta))
+    largest = np.stack([np.maximum(angles[:,1], angles[:,2]),
+                        np.maximum(angles[:,0], angles[:,2]),
+                        np.maximum(angles[:,0], angles[:,1])], axis=1)
+    smallvec = (abc*np.cos(largest)).min(axis=1)
+    with np.errstate(invalid='ignore'):
+        return ((l[:,0] >= min_l) & (l[:,1] >= mid_l) & (l[:,2] >= max_l)
+            & (minvec < maxvec)
+            & (abc > minvec).all(axis=1) & (abc < maxvec[:,None]).all(axis=1)
+            & (smallvec < minvec)
+            & (angles > minangle).all(axis=1) & (angles < maxangle).all(axis=1)
+            & (l[:,2]/l[:,0] < max_ratio))
+
+def generate_lattice_batch(ltype, volume, size=lattice_pool_size, dim=3, minvec=tol_m, minangle=pi/6, max_ratio=None, rng=None, **kwargs):
+    """
+    Vectorized counterpart of generate_lattice, generate_lattice_2D,
+    generate_lattice_1D and generate_lattice_0D. Draws size candidate cells at
+    once from the same distributions, and keeps those which pass
+    check_lattice_batch.
+
+    Args:
+        ltype: the lattice type ("triclinic", "monoclinic", etc.)
+        volume: volume of the unit cell
+        size: the number of candidate cells to draw
+        dim: the number of periodic dimensions (0, 1, 2, or 3)
+        minvec: minimum allowed lattice vector length (among a, b, and c)
+        minangle: minimum allowed lattice angle (among alpha, beta, and gamma)
+        max_ratio: largest allowed ratio of two lattice vector lengths. Defaults
+            to 20 for dim=0 and 10 otherwise
+        rng: an optional numpy.random.Generator to draw from
+        kwargs: a dictionary of optional values, as for generate_lattice. These
+            include 'thickness' (dim=2), 'area' (dim=1), 'unique_axis', 'min_l',
+            'mid_l', and 'max_l'
+
+    Returns:
+        an nx6 array of the valid lattice parameters [a, b, c, alpha, beta,
+        gamma] (angles in radians), with n <= size. Empty if no candidate
+        was valid
+    """
+    rng = get_rng(rng)
+    if max_ratio is None:
+        max_ratio = 20.0 if dim == 0 else 10.0
+    if dim == 0:
+        if ltype == "spherical":
+            #Use a cubic lattice with altered volume
+            a = np.cbrt((3 * volume)/(4 * pi))
+            if a < minvec:
+                print("Error: Could not generate spherical lattice; volume too small compared to minvec")
+                return np.zeros([0, 6])
+            return np.array([[a, a, a, pi/2, pi/2, pi/2]])
+        elif ltype == "cylindrical":
+            #Use a tetragonal lattice with altered volume
+            return generate_lattice_batch("tetragonal", volume*4/pi, size=size, minvec=minvec, max_ratio=max_ratio, rng=rng, **kwargs)
+        print("Error: Invalid lattice type for 0D lattice: "+str(ltype))
+        return np.zeros([0, 6])
+
+    maxangle = pi-minangle
+    para = np.zeros([size, 6])
+    para[:,3:] = pi/2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if dim == 3:
+            if ltype in ["triclinic", "monoclinic", "orthorhombic"]:
+                if ltype == "triclinic":
+                    #Derive the angles from random shear matrices
+                    para[:,3:] = matrix2para_batch(random_shear_batch(size, rng=rng))[:,3:]
+                elif ltype == "monoclinic":
+                    para[:,4] = gaussian_batch(minangle, maxangle, size, rng=rng)
+                vec = random_vector_batch(size, rng=rng)
+                x = volume_factor_batch(para)
+                para[:,:3] = vec*np.cbrt(volume/x/np.prod(vec, axis=1))[:,None]
+            elif ltype in ["tetragonal", "hexagonal"]:
+                if ltype == "hexagonal":
+                    para[:,5] = pi/3*2
+                x = volume_factor_batch(para)
+                vec = random_vector_batch(size, rng=rng)
+                c = vec[:,2]/(vec[:,0]*vec[:,1])*np.cbrt(volume/x)
+                para[:,0] = para[:,1] = np.sqrt((volume/x)/c)
+                para[:,2] = c
+            elif ltype == "cubic":
+                para[:,:3] = np.cbrt(volume)
+            else:
+                print("Error: Invalid lattice type for 3D lattice: "+str(ltype))
+                return np.zeros([0, 6])
+
+        elif dim in [1, 2]:
+            #The non-periodic (2D) or periodic (1D) axis is always c
+            if dim == 2:
+                unique_axis = kwargs.get('unique_axis', "c")
+                thickness = kwargs.get('thickness')
+            else:
+                unique_axis = kwargs.get('unique_axis', "a")
+                thickness = None
+                if kwargs.get('area') is not None:
+                    thickness = volume/kwargs['area']
+            if thickness is None:
+                v = random_vector_batch(size, rng=rng)
+                thickness = np.cbrt(volume)*(v[:,0]/np.prod(v, axis=1))
+            para[:,2] = thickness
+            if ltype in ["triclinic", "monoclinic"]:
+                if ltype == "triclinic":
+                    shear = matrix2para_batch(random_shear_batch(size, rng=rng))
+                    para[:,3:] = shear[:,3:]
+                    ratio = shear[:,0]/shear[:,1]
+                    x = volume_factor_batch(para)
+                    #scale thickness by outer product of vectors
+                    para[:,2] = para[:,2]/x
+                else:
+                    vec = random_vector_batch(size, rng=rng)
+                    ratio = vec[:,0]/vec[:,1]
+                    para[:,3+"abc".index(unique_axis)] = gaussian_batch(minangle, maxangle, size, rng=rng)
+                    x = volume_factor_batch(para)
+                ab = volume/(para[:,2]*x)
+                para[:,0] = np.sqrt(ab*ratio)
+                para[:,1] = np.sqrt(ab/ratio)
+            elif ltype == "orthorhombic":
+                vec = random_vector_batch(size, rng=rng)
+                ratio = vec[:,0]/vec[:,1]
+                para[:,1] = np.sqrt(volume/(para[:,2]*ratio))
+                para[:,0] = para[:,1]*ratio
+            elif ltype in ["tetragonal", "hexagonal"]:
+                if ltype == "hexagonal":
+                    para[:,5] = pi/3*2
+                x = volume_factor_batch(para)
+                para[:,0] = para[:,1] = np.sqrt((volume/x)/para[:,2])
+            else:
+                print("Error: Invalid lattice type for "+str(dim)+"D lattice: "+str(ltype))
+                return np.zeros([0, 6])
+
+        return para[check_lattice_batch(para, minvec=minvec, minangle=minangle, max_ratio=max_ratio, **kwargs)]
+
+def choose_wyckoff(group, number, rng=None):
     """
     Choose a Wyckoff position to fill based on the current number of atoms
     needed to be placed within a unit cell
@@ -1401,17 +1967,19 @@ def choose_wyckoff(group, number):
     Args:
         group: a pyxtal.symmetry.Group object
         number: the number of atoms still needed in the unit cell
+        rng: an optional numpy.random.Generator to draw from
 
     Returns:
         a single index for the Wyckoff position. If no position is found,
         returns False
     """
+    rng = get_rng(rng)
     wyckoffs_organized = group.wyckoffs_organized
     
-    if rand_u(0,1)>0.5: #choose from high to low
+    if rng.random()>0.5: #choose from high to low
         for wyckoff in wyckoffs_organized:
             if len(wyckoff[0]) <= number:
-                return choose(wyckoff)
+                return wyckoff[rng.integers(len(wyckoff))]
         return False
     else:
         good_wyckoff = []
@@ -1420,7 +1988,7 @@ def choose_wyckoff(group, number):
                 for w in wyckoff:
                     good_wyckoff.append(w)
         if len(good_wyckoff) > 0:
-            return choose(good_wyckoff)
+            return good_wyckoff[rng.integers(len(good_wyckoff))]
         else:
             return False
 
@@ -1464,16 +2032,13 @@ def verify_distances(coordinates, species, lattice, factor=1.0, PBC=[1,1,1]):
     Returns:
         True if no atoms are too close together, False if any pair is too close
     """
-    for i, c1 in enumerate(coordinates):
-        specie1 = species[i]
-        for j, c2 in enumerate(coordinates):
-            if j > i:
-                specie2 = species[j]
-                diff = np.array(c2) - np.array(c1)
-                d_min = distance(diff, lattice, PBC=PBC)
-                tol = factor*0.5*(Element(specie1).covalent_radius + Element(specie2).covalent_radius)
-                if d_min < tol:
-                    return False
+    radii = np.array([Element(specie).covalent_radius for specie in species])
+    tols = factor*0.5*(radii[:,None] + radii[None,:])
+    i, j, d = find_pairs(coordinates, coordinates, lattice, tols.max(), PBC=PBC)
+    #Only check each pair of different atoms once
+    mask = j > i
+    if (d[mask] < tols[i[mask], j[mask]]).any():
+        return False
     return True
 
 class Lattice():
@@ -1508,6 +2073,11 @@ class Lattice():
                 must be larger than this.
             'max_l': the third smallest allowed cell vector. The largest cell vector must
                 be larger than this.
+
+    Random lattice parameters are drawn in batches by generate_lattice_batch, and
+    kept in a pool which reset_matrix consumes one cell at a time. The pool is
+    refilled when it runs out, or when the volume, kwargs, or random number
+    generator change. Copies of a Lattice start with an empty pool.
     """
     def __init__(self, ltype, volume, PBC=[1,1,1], **kwargs):
         #Set required parameters
@@ -1529,28 +2099,73 @@ class Lattice():
             if key in ["area", "thickness", "unique_axis", "random", "min_l", "mid_l", "max_l"]:
                 setattr(self, key, value)
                 self.kwargs[key] = value
+        self.pool = np.zeros([0, 6])
+        """Valid lattice parameters which have not yet been used"""
+        self.pool_key = None
+        """The generator, volume and kwargs which the pool was drawn with"""
+        self.pool_size = lattice_pool_min
+        """The number of candidate cells to draw for the next refill"""
         self.reset_matrix()
+
+    def __copy__(self):
+        #A copy starts with an empty pool, so that copies do not hand out the
+        #same lattice parameters
+        new = self.__class__.__new__(self.__class__)
+        new.__dict__.update(self.__dict__)
+        new.pool = np.zeros([0, 6])
+        new.pool_key = None
+        new.pool_size = lattice_pool_min
+        return new
         
-    def generate_para(self):
-        if self.dim == 3:
-            return generate_lattice(self.ltype, self.volume, **self.kwargs)
-        elif self.dim == 2:
-            return generate_lattice_2D(self.ltype, self.volume, **self.kwargs)
-        elif self.dim == 1:
-            return generate_lattice_1D(self.ltype, self.volume, **self.kwargs)
-        elif self.dim == 0:
-            return generate_lattice_0D(self.ltype, self.volume, **self.kwargs)
-
-    def generate_matrix(self):
+    def generate_para(self, rng=None):
+        """
+        Takes the next set of lattice parameters from the pool, refilling it
+        with generate_lattice_batch if needed. Each refill draws 4 times as many
+        candidate cells as the last, from lattice_pool_min up to
+        lattice_pool_size.
+
+        Args:
+            rng: an optional numpy.random.Generator to draw from
+
+        Returns:
+            a 1x6 array of lattice parameters (angles in radians), or None if
+            none of the candidate cells were valid
+        """
+        rng = get_rng(rng)
+        key = (rng, self.ltype, self.dim, self.volume, dict(self.kwargs))
+        if key != self.pool_key:
+            self.pool_key = key
+            self.pool = np.zeros([0, 6])
+            self.pool_size = lattice_pool_min
+        #Start with small batches, so that a new generator or volume does
+        #not cost a full batch, and grow them as more cells are used
+        while len(self.pool) == 0:
+            size = self.pool_size
+            self.pool = generate_lattice_batch(self.ltype, self.volume, size=size, dim=self.dim, rng=rng, **self.kwargs)
+            self.pool_size = min(4*size, lattice_pool_size)
+            if size == lattice_pool_size:
+                break
+        if len(self.pool) == 0:
+            return
+        para = self.pool[-1]
+        self.pool = self.pool[:-1]
+        return para
+
+    def generate_matrix(self, rng=None):
         """
         Generates a 3x3 matrix for the lattice based on the lattice type and volume
+
+        Args:
+            rng: an optional numpy.random.Generator to draw from
+
+        Returns:
+            a 3x3 matrix, or None if no valid lattice could be generated
         """
         #Try multiple times in case of failure
         for i in range(10):
-            para = self.generate_para()
+            para = self.generate_para(rng=rng)
             if para is not None:
                 return para2matrix(para)
-        print("Error: Could not generate lattice matrix.")
         return
 
     def get_matrix(self):
@@ -1591,9 +2206,11 @@ class Lattice():
         else:
             self.set_matrix()
 
-    def reset_matrix(self):
+    def reset_matrix(self, rng=None):
         if self.random is True:
-            self.matrix = self.generate_matrix()
+            self.matrix = self.generate_matrix(rng=rng)
+            if self.matrix is None:
+                return
             [a, b, c, alpha, beta, gamma] = matrix2para(self.matrix)
             self.a = a
             self.b = b
@@ -1602,27 +2219,22 @@ class Lattice():
             self.beta = beta
             self.gamma = gamma
 
-    def generate_point(self):
-        point = np.random.random(3)
+    def generate_point(self, rng=None):
+        rng = get_rng(rng)
+        point = rng.random(3)
         if self.ltype == "spherical":
             #Choose a point within an octant of the unit sphere
             while dsquared(point) > 1:
-                point = np.random.random(3)
+                point = rng.random(3)
             #Randomly flip some coordinates
-            for index, x in enumerate(point):
-                #Scale the point by the max radius
-                if rand_u(0,1) < 0.5:
-                    point[index] *= -1
+            point[rng.random(3) < 0.5] *= -1
 
         elif self.ltype == "cylindrical":
             #Choose a point within an octant of the unit sphere
             while dsquared([point[0], point[1], 0]) > 1:
-                point = np.random.random(3)
+                point = rng.random(3)
             #Randomly flip some coordinates
-            for index, x in enumerate(point[:-1]):
-                #Scale the point by the max radius
-                if rand_u(0,1) < 0.5:
-                    point[index] *= -1
+            point[:-1][rng.random(2) < 0.5] *= -1
         else:
             for i, a in enumerate(self.PBC):
                 if not a:
@@ -1764,6 +2376,382 @@ class Lattice():
     def __repr__(self):
         return str(self)
 
+class Observer():
+    """
+    Base class for observing the generation loop of random_crystal,
+    molecular_crystal and their subclasses, for example to show progress or
+    to profile where attempts are rejected. Subclass it, override any of the
+    callbacks, and pass an instance as the observer argument of the crystal
+    class (or of a Generator). The callbacks are only called if an observer
+    is given, so there is no cost otherwise.
+    """
+    def on_lattice(self, matrix):
+        """
+        Called after a new lattice is generated.
+
+        Args:
+            matrix: the 3x3 lattice matrix
+        """
+        pass
+
+    def on_trial(self, wp, point):
+        """
+        Called before a point is placed into a Wyckoff position.
+
+        Args:
+            wp: the chosen Wyckoff_position
+            point: the random fractional 3-vector to place
+        """
+        pass
+
+    def on_reject(self, reason, data):
+        """
+        Called when an attempt is rejected. The reasons are the same as in
+        Generation_stats.
+
+        Args:
+            reason: a string, such as "merge" or "distance:C-O"
+            data: the lattice matrix for "lattice", the Wyckoff_position for
+                "wyckoff" and "merge", the Wyckoff_site or mol_site for
+                "distance" and "orientation", or None
+        """
+        pass
+
+    def on_accept(self, site):
+        """
+        Called when a site is added to the crystal.
+
+        Args:
+            site: a Wyckoff_site or mol_site object
+        """
+        pass
+
+    def on_rollback(self, sites):
+        """
+        Called when sites which were added to the crystal are removed again,
+        because the remaining atoms could not be placed. Every accepted site
+        is either rolled back or part of the final crystal.
+
+        Args:
+            sites: a list of Wyckoff_site or mol_site objects
+        """
+        pass
+
+    def on_finish(self, crystal):
+        """
+        Called when generate_crystal finishes, whether or not it succeeded.
+
+        Args:
+            crystal: the crystal object. Check crystal.valid for the result
+        """
+        pass
+
+    def on_message(self, text):
+        """
+        Called with the error and warning messages of generate_crystal, which
+        are printed if no observer is given.
+
+        Args:
+            text: the message
+        """
+        print(text)
+
+class Generation_stats():
+    """
+    Class for recording where the time and attempts go while generating
+    crystals. Each generated crystal stores one in its stats attribute, and a
+    Generator adds up the stats of every crystal it samples. Useful for tuning
+    max1 - max4 and the volume factor.
+
+    Times are recorded (in seconds) for the stages in Generation_stats.stages.
+    Attempts are counted for each level of the generation loop: cycle1
+    (lattices), cycle2 (attempts per lattice), cycle3 (Wyckoff positions) and
+    cycle4 (molecular orientations). Rejections are counted by reason:
+    "lattice", "wyckoff" (no usable Wyckoff position), "merge",
+    "orientation" (orientation attempts exhausted), and
+    "distance:A-B" for a distance violation between species A and B.
+    """
+    stages = ["lattice", "wyckoff", "merge", "distance", "orientation", "output"]
+
+    def __init__(self):
+        self.structures = 0
+        """The number of generation runs counted"""
+        self.valid = 0
+        """The number of generation runs which produced a valid structure"""
+        self.times = {stage: 0.0 for stage in self.stages}
+        """The total time spent in each stage"""
+        self.attempts = {"cycle1": 0, "cycle2": 0, "cycle3": 0, "cycle4": 0}
+        """The number of attempts at each level of the generation loop"""
+        self.rejections = {}
+        """The number of rejected attempts for each reason"""
+
+    def add_time(self, stage, start):
+        """
+        Adds the time elapsed since start to a stage.
+
+        Args:
+            stage: the name of the stage
+            start: the starting time, from time.time
+
+        Returns:
+            the current time, which may be used as the start of the next stage
+        """
+        now = time()
+        self.times[stage] += now - start
+        return now
+
+    def attempt(self, level):
+        """
+        Counts an attempt at a level ("cycle1" - "cycle4") of the loop.
+        """
+        self.attempts[level] += 1
+
+    def reject(self, reason):
+        """
+        Counts a rejected attempt.
+
+        Args:
+            reason: a string, such as "merge" or "distance:C-O"
+        """
+        self.rejections[reason] = self.rejections.get(reason, 0) + 1
+
+    def add(self, other):
+        """
+        Adds the counts and times of another Generation_stats object to this
+        one.
+
+        Args:
+            other: a Generation_stats object
+        """
+        self.structures += other.structures
+        self.valid += other.valid
+        for key, value in other.times.items():
+            self.times[key] = self.times.get(key, 0.0) + value
+        for key, value in other.attempts.items():
+            self.attempts[key] = self.attempts.get(key, 0) + value
+        for key, value in other.rejections.items():
+            self.rejections[key] = self.rejections.get(key, 0) + value
+
+    def to_dict(self):
+        """
+        Returns the stats as a dictionary.
+        """
+        return {"structures": self.structures, "valid": self.valid,
+            "times": dict(self.times), "attempts": dict(self.attempts),
+            "rejections": dict(sorted(self.rejections.items()))}
+
+    def from_dict(d):
+        """
+        Creates a Generation_stats object from a dictionary made by to_dict.
+        """
+        stats = Generation_stats()
+        stats.structures = d["structures"]
+        stats.valid = d["valid"]
+        stats.times.update(d["times"])
+        stats.attempts.update(d["attempts"])
+        stats.rejections.update(d["rejections"])
+        return stats
+
+    def to_json(self, filename=None):
+        """
+        Exports the stats in JSON format.
+
+        Args:
+            filename: an optional file path to write the JSON to
+
+        Returns:
+            the JSON string
+        """
+        s = json.dumps(self.to_dict(), indent=2)
+        if filename is not None:
+            with open(filename, "w") as f:
+                f.write(s)
+        return s
+
+    def __str__(self):
+        s = "Generated "+str(self.valid)+" of "+str(self.structures)+" structures"
+        s += "\nTime (s): "+", ".join(k+" "+str(round(v, 3)) for k, v in self.times.items())
+        s += "\nAttempts: "+", ".join(k+" "+str(v) for k, v in self.attempts.items())
+        s += "\nRejections: "+", ".join(k+" "+str(v) for k, v in sorted(self.rejections.items()))
+        return s
+
+    def __repr__(self):
+        return str(self)
+
+class Quiet_observer(Observer):
+    """
+    Observer used by Scheduler during each round of generation. Passes every
+    callback except on_message and on_finish on to another observer (if
+    given), and keeps the messages instead of printing them.
+    """
+    def __init__(self, observer=None):
+        self.observer = observer
+        self.messages = []
+
+    def on_lattice(self, matrix):
+        if self.observer is not None:
+            self.observer.on_lattice(matrix)
+
+    def on_trial(self, wp, point):
+        if self.observer is not None:
+            self.observer.on_trial(wp, point)
+
+    def on_reject(self, reason, data):
+        if self.observer is not None:
+            self.observer.on_reject(reason, data)
+
+    def on_accept(self, site):
+        if self.observer is not None:
+            self.observer.on_accept(site)
+
+    def on_rollback(self, sites):
+        if self.observer is not None:
+            self.observer.on_rollback(sites)
+
+    def on_message(self, text):
+        self.messages.append(text)
+
+class Scheduler():
+    """
+    Class for generating a crystal within a budget of time or trials, instead
+    of the fixed numbers of attempts max1, max2 and max3. Generation is split
+    into rounds of one lattice each. After each failed round, the attempts
+    are reallocated based on the round's Generation_stats: if most trials
+    were rejected for distance violations, the lattice is likely too crowded,
+    so fewer attempts are spent per lattice and, after several such rounds,
+    the volume factor is grown. Otherwise, more attempts are spent per
+    lattice. A round is never larger than the remaining budget, so the time
+    per structure is predictable.
+
+    Args:
+        time_limit: the wall-clock budget per structure in seconds, or None
+        max_trials: the budget of trials per structure, or None. Each Wyckoff
+            position trial (cycle3 attempt) and each lattice (cycle1 attempt)
+            counts as one trial
+        max2: the initial number of attempts for a given lattice
+        max3: the number of attempts for a given Wyckoff position
+        growth: the factor by which the volume is grown after repeated
+            distance failures. Use 1.0 to keep the volume fixed
+        max_factor: the largest volume factor to grow to
+        patience: the number of rounds dominated by distance failures before
+            the volume is grown
+        max_empty: the number of rounds in a row which may fail before any
+            Wyckoff position is tried (for example, because no valid lattice
+            was found) before generation stops
+    """
+    def __init__(self, time_limit=None, max_trials=10000, max2=max2, max3=max3, growth=1.1, max_factor=2.0, patience=3, max_empty=max1):
+        self.time_limit = time_limit
+        self.max_trials = max_trials
+        self.max2 = max2
+        self.max3 = max3
+        self.growth = growth
+        self.max_factor = max_factor
+        self.patience = patience
+        self.max_empty = max_empty
+
+    def grow(self, crystal):
+        """
+        Grows the volume of a crystal's random lattice by self.growth, unless
+        the factor would exceed self.max_factor.
+
+        Returns:
+            True if the volume was grown, False otherwise
+        """
+        if crystal.lattice.random is not True:
+            return False
+        if crystal.factor * self.growth > self.max_factor:
+            return False
+        crystal.factor *= self.growth
+        crystal.volume *= self.growth
+        crystal.lattice.volume = crystal.volume
+        return True
+
+    def generate(self, crystal, rng=None, **kwargs):
+        """
+        Generates a crystal (random_crystal, molecular_crystal or one of
+        their subclasses) within the budget. The result is stored in the
+        crystal as with generate_crystal; crystal.factor and crystal.volume
+        reflect any growth of the volume.
+
+        Args:
+            crystal: a crystal object, e.g. created with generate=False
+            rng: an optional numpy.random.Generator to draw from
+            **kwargs: optional arguments passed to generate_crystal, e.g. max4
+
+        Returns:
+            a Generation_stats object for all rounds, also stored in
+            crystal.stats. If the budget ran out, the stats so far are
+            returned, with a "budget" rejection
+        """
+        rng = get_rng(rng)
+        start = time()
+        total = Generation_stats()
+        observer = crystal.observer
+        quiet = Quiet_observer(observer)
+        crystal.observer = quiet
+        nspecies = len(getattr(crystal, "numIons", getattr(crystal, "numMols", [1])))
+        max2 = self.max2
+        failures = 0
+        empty = 0
+        numattempts = 0
+        try:
+            while True:
+                #Limit the size of the round to the remaining budget
+                trials = total.attempts["cycle3"] + total.attempts["cycle1"]
+                budget = max2 * self.max3 * nspecies
+                if self.max_trials is not None:
+                    budget = min(budget, self.max_trials - trials)
+                if self.time_limit is not None:
+                    remaining = self.time_limit - (time() - start)
+                    if trials > 0:
+                        budget = min(budget, remaining * trials / (time() - start))
+                    elif remaining <= 0:
+                        budget = 0
+                    else:
+                        #Start with a single attempt per lattice, to time the trials
+                        budget = min(budget, self.max3 * nspecies)
+                if budget < 1:
+                    total.reject("budget")
+                    crystal.message("Stopped generating after "+str(trials)+" trials and "+str(round(time()-start, 2))+" s.")
+                    break
+                round_max2 = max(1, min(max2, int(budget // (self.max3 * nspecies))))
+                round_max3 = max(1, min(self.max3, int(budget // (round_max2 * nspecies))))
+                crystal.generate_crystal(max1=1, max2=round_max2, max3=round_max3, rng=rng, **kwargs)
+                total.add(crystal.stats)
+                numattempts += crystal.numattempts
+                if crystal.valid or crystal.degrees is False:
+                    break
+                #Stop if no round gets as far as trying a Wyckoff position
+                n = crystal.stats.attempts["cycle3"]
+                if n == 0:
+                    empty += 1
+                    if empty >= self.max_empty:
+                        crystal.message("Stopped generating after "+str(empty)+" rounds without a valid lattice.")
+                        break
+                else:
+                    empty = 0
+                #Reallocate attempts between lattices and sites
+                distance = sum(v for k, v in crystal.stats.rejections.items() if k.startswith("distance"))
+                if n > 0 and distance > 0.5 * n:
+                    max2 = max(1, max2 // 2)
+                    failures += 1
+                    if failures >= self.patience and self.grow(crystal):
+                        failures = 0
+                else:
+                    max2 = min(self.max2 * 4, max2 * 2)
+                    failures = 0
+        finally:
+            crystal.observer = observer
+        if crystal.degrees is False:
+            crystal.message(crystal.Msg1)
+        total.structures = 1
+        total.valid = 1 if crystal.valid else 0
+        crystal.stats = total
+        crystal.numattempts = numattempts
+        if observer is not None:
+            observer.on_finish(crystal)
+        return total
+
 class random_crystal():
     """
     Class for storing and generating atomic crystals based on symmetry
@@ -1781,17 +2769,23 @@ class random_crystal():
         factor: a volume factor used to generate a larger or smaller
             unit cell. Increasing this gives extra space between atoms
         lattice: an optional Lattice object to use for the unit cell
+        generate: whether or not to generate a crystal during initialization.
+            If False, only the setup is done; see Generator
+        observer: an optional Observer object, which is notified as the
+            crystal is generated
     """
-    def init_common(self, species, numIons, factor, group, lattice, tm):
+    def init_common(self, species, numIons, factor, group, lattice, tm, generate=True, observer=None):
         """
         Common init functionality for 0D-3D cases of random_crystal.
         """
+        self.observer = observer
+        """The Observer notified during generation, or None"""
         if type(group) == Group:
             self.group = group
             """A pyxtal.symmetry.Group object storing information about the space/layer
             /Rod/point group, and its Wyckoff positions."""
         else:
-            self.group = Group(group, dim=self.dim)
+            self.group = get_group(group, dim=self.dim)
         self.number = self.group.number
         """The international group number of the crystal:
         1-230 for 3D space groups
@@ -1849,23 +2843,31 @@ class random_crystal():
             try:
                 self.tol_matrix = Tol_matrix(prototype=tm)
             except:
-                print("Error: tm must either be a Tol_matrix object or a prototype string for initializing one.")
+                self.message("Error: tm must either be a Tol_matrix object or a prototype string for initializing one.")
                 self.valid = False
                 self.struct = None
                 return
+        self.combinations = get_wyckoff_combinations(self.group, self.numIons)
+        """The Wyckoff_combinations object for placing numIons into the group.
+        Shared between crystals with the same group and composition."""
+        self.degrees = self.check_compatible()
+        """The result of check_compatible: True if the Wyckoff positions have
+        degrees of freedom, 0 if not, and False if the composition is
+        incompatible with the group."""
         #Generate the crystal
-        self.generate_crystal()
+        if generate:
+            self.generate_crystal()
 
-    def __init__(self, group, species, numIons, factor, lattice=None, tm=Tol_matrix(prototype="atomic")):
+    def __init__(self, group, species, numIons, factor, lattice=None, tm=Tol_matrix(prototype="atomic"), generate=True, observer=None):
         self.dim = 3
         """The number of periodic dimensions of the crystal"""
         if type(group) != Group:
-            group = Group(group, self.dim)
+            group = get_group(group, self.dim)
         self.sg = group.number
         """The international spacegroup number of the crystal."""
         self.PBC = [1,1,1]
         """The periodic boundary axes of the crystal"""
-        self.init_common(species, numIons, factor, group, lattice, tm)
+        self.init_common(species, numIons, factor, group, lattice, tm, generate, observer)
 
     def Msgs(self):
         """
@@ -1881,43 +2883,30 @@ class random_crystal():
         self.Msg5 = 'Finishing: added the specie'
         self.Msg6 = 'Finishing: added the whole structure'
 
+    def message(self, text):
+        """
+        Passes a message to the observer, or prints it if there is none.
+        """
+        if self.observer is not None:
+            self.observer.on_message(text)
+        else:
+            print(text)
+
     def check_compatible(self):
         """
         Checks if the number of atoms is compatible with the Wyckoff
-        positions. Considers the number of degrees of freedom for each Wyckoff
-        position, and makes sure at least one valid combination of WP's exists.
-        """
-        N_site = [len(x[0]) for x in self.group.wyckoffs_organized]
-        has_freedom = False
-        #remove WP's with no freedom once they are filled
-        removed_wyckoffs = []
-        for numIon in self.numIons:
-            #Check that the number of ions is a multiple of the smallest Wyckoff position
-            if numIon % N_site[-1] > 0:
-                return False
-            else:
-                #Check if smallest WP has at least one degree of freedom
-                op = self.group.wyckoffs_organized[-1][-1][0]
-                if op.rotation_matrix.all() != 0.0:
-                    has_freedom = True
-                else:
-                    #Subtract from the number of ions beginning with the smallest Wyckoff positions
-                    remaining = numIon
-                    for x in self.group.wyckoffs_organized:
-                        for wp in x:
-                            removed = False
-                            while remaining >= len(wp) and wp not in removed_wyckoffs:
-                                #Check if WP has at least one degree of freedom
-                                op = wp[0]
-                                remaining -= len(wp)
-                                if np.allclose(op.rotation_matrix, np.zeros([3,3])):
-                                    removed_wyckoffs.append(wp)
-                                    removed = True
-                                else:
-                                    has_freedom = True
-                    if remaining != 0:
-                        return False
-        if has_freedom:
+        positions. Counts the valid combinations of WP's (see
+        symmetry.Wyckoff_combinations), and checks whether any of them use
+        a WP with degrees of freedom.
+
+        Returns:
+            True if a valid combination with degrees of freedom exists, 0 if
+            all valid combinations use only WP's with no degrees of freedom,
+            and False if there is no valid combination
+        """
+        if self.combinations.count == 0:
+            return False
+        elif self.combinations.count > self.combinations.count_fixed:
             return True
         else:
             #Wyckoff Positions have no degrees of freedom
@@ -1972,6 +2961,48 @@ class random_crystal():
         elif self.valid is False:
             print("Cannot create file: structure did not generate.")
 
+    @property
+    def struct(self):
+        """
+        A pymatgen.core.structure.Structure object for the final generated
+        crystal (for clusters, the molecule in a box with 10 Angstroms of
+        padding). Built from lattice_matrix, sites and coordinates the first
+        time it is used. If generation failed, an error message or None.
+        """
+        if "_struct" not in self.__dict__:
+            if self.dim == 0:
+                coords = self.molecule.cart_coords
+                size = coords.max(axis=0) - coords.min(axis=0) + 10
+                self._struct = self.molecule.get_boxed_structure(*size)
+            else:
+                self._struct = Structure(self.lattice_matrix, self.sites, self.coordinates)
+        return self._struct
+
+    @struct.setter
+    def struct(self, value):
+        self._struct = value
+
+    @property
+    def molecule(self):
+        """
+        A pymatgen.core.structure.Molecule object for the final generated
+        cluster, built the first time it is used. None for periodic crystals.
+        """
+        if "_molecule" not in self.__dict__:
+            if self.dim == 0:
+                self._molecule = Molecule(self.sites, np.dot(self.coordinates, self.lattice_matrix))
+            else:
+                self._molecule = None
+        return self._molecule
+
+    @property
+    def spg_struct(self):
+        """
+        A tuple (lattice_matrix, coordinates, numbers) describing the
+        generated crystal, which may be used by spglib for symmetry analysis.
+        """
+        return (self.lattice_matrix, self.coordinates, self.numbers)
+
     def print_all(self):
         """
         Prints useful information about the generated crystal.
@@ -1989,7 +3020,7 @@ class random_crystal():
         elif self.valid is False:
             print("Structure not generated.")
 
-    def generate_crystal(self, max1=max1, max2=max2, max3=max3):
+    def generate_crystal(self, max1=max1, max2=max2, max3=max3, rng=None, merge=True):
         """
         The main code to generate a random atomic crystal. If successful,
         stores a pymatgen.core.structure object in self.struct and sets
@@ -2000,83 +3031,140 @@ class random_crystal():
             max1: the number of attempts for generating a lattice
             max2: the number of attempts for a given lattice
             max3: the number of attempts for a given Wyckoff position
+            rng: an optional numpy.random.Generator to draw from
+            merge: if True, atoms which are too close are merged into special
+                Wyckoff positions (see merge_coordinate). If False, points are
+                placed directly into the chosen Wyckoff position (see
+                sample_wyckoff), and rejected if they are too close
         """
+        rng = get_rng(rng)
+        self.stats = Generation_stats()
+        """A Generation_stats object recording the time and attempts spent
+        in the last call to generate_crystal."""
+        stats = self.stats
+        stats.structures = 1
+        observer = self.observer
         #Check the minimum number of degrees of freedom within the Wyckoff positions
         self.numattempts = 1
-        degrees = self.check_compatible()
+        degrees = self.degrees
         if degrees is False:
-            print(self.Msg1)
+            self.message(self.Msg1)
             self.struct = None
             self.valid = False
+            if observer is not None:
+                observer.on_finish(self)
             return
         else:
-            if degrees is 0:
-                max1 = 5
-                max2 = 5
-                max3 = 5
+            if degrees == 0:
+                max1 = min(max1, 5)
+                max2 = min(max2, 5)
+                max3 = min(max3, 5)
             #Calculate a minimum vector length for generating a lattice
             minvector = max(max(2.0*Element(specie).covalent_radius for specie in self.species), tol_m)
+            #The largest tolerance between any two species
+            cutoff = self.tol_matrix.get_tols(self.species).max()
             for cycle1 in range(max1):
+                stats.attempt("cycle1")
+                t = time()
                 #1, Generate a lattice
-                self.lattice.reset_matrix()           
+                self.lattice.reset_matrix(rng=rng)
                 cell_matrix = self.lattice.get_matrix()
+                t = stats.add_time("lattice", t)
+                if cell_matrix is None:
+                    self.message("Error: Could not generate lattice matrix.")
+                    stats.reject("lattice")
+                    if observer is not None:
+                        observer.on_reject("lattice", None)
+                    continue
                 #Check that the correct volume was generated
                 if self.lattice.random is True:
                     if self.dim != 0 and abs(self.volume - np.linalg.det(cell_matrix)) > 1.0: 
-                        print('Error, volume is not equal to the estimated value: ', self.volume, ' -> ', np.linalg.det(cell_matrix))
-                        print('cell_para:  ', matrix2para(cell_matrix))
-                        sys.exit(0)
-
-                coordinates_total = [] #to store the added coordinates
-                sites_total = []      #to store the corresponding specie
-                wyckoff_sites_total = []
+                        self.message('Error, volume is not equal to the estimated value: '+str(self.volume)+' -> '+str(np.linalg.det(cell_matrix)))
+                        stats.reject("lattice")
+                        if observer is not None:
+                            observer.on_reject("lattice", cell_matrix)
+                        continue
+                if observer is not None:
+                    observer.on_lattice(cell_matrix)
+
+                #to store the added coordinates, species and Wyckoff sites
+                space = Occupied_space(cell_matrix, cutoff, PBC=self.PBC, tm=self.tol_matrix)
                 good_structure = False
 
                 for cycle2 in range(max2):
-                    coordinates_tmp = deepcopy(coordinates_total)
-                    sites_tmp = deepcopy(sites_total)
-                    wyckoff_sites_tmp = deepcopy(wyckoff_sites_total)
+                    stats.attempt("cycle2")
+                    #Remove the sites of an unfinished specie
+                    removed = space.rollback()
+                    if observer is not None and removed:
+                        observer.on_rollback(removed)
                     
                     #Add specie by specie
-                    for numIon, specie in zip(self.numIons, self.species):
+                    for i, (numIon, specie) in enumerate(zip(self.numIons, self.species)):
                         numIon_added = 0
                         tol = max(0.5*Element(specie).covalent_radius, tol_m)
 
                         #Now we start to add the specie to the wyckoff position
                         cycle3 = 0
                         while cycle3 < max3:
+                            stats.attempt("cycle3")
+                            t = time()
                             #Choose a random Wyckoff position for given multiplicity: 2a, 2b, 2c
-                            ops = choose_wyckoff(self.group, numIon-numIon_added) 
+                            ops = choose_wyckoff(self.group, numIon-numIon_added, rng=rng)
+                            t = stats.add_time("wyckoff", t)
                             if ops is not False:
                             #Generate a list of coords from ops
-                                point = self.lattice.generate_point()
-                                coords = np.array([op.operate(point) for op in ops])
-                                #Merge coordinates if the atoms are close
-                                coords_toadd, good_merge, point = merge_coordinate(coords, cell_matrix, self.group, tol)
+                                point = self.lattice.generate_point(rng=rng)
+                                if observer is not None:
+                                    observer.on_trial(ops, point)
+                                if merge:
+                                    coords = ops.operate_many(point)
+                                    #Merge coordinates if the atoms are close
+                                    coords_toadd, good_merge, point = merge_coordinate(coords, cell_matrix, self.group, tol)
+                                else:
+                                    #Place the point directly into the chosen WP
+                                    coords_toadd, point = sample_wyckoff(ops, point, cell_matrix, tol, PBC=self.PBC)
+                                    good_merge = ops.index if coords_toadd is not None else False
+                                t = stats.add_time("merge", t)
                                 if good_merge is not False:
                                     coords_toadd = filtered_coords(coords_toadd, PBC=self.PBC)
-                                    if check_distance(coordinates_tmp, coords_toadd, sites_tmp, [specie]*len(coords_toadd), cell_matrix, tm=self.tol_matrix, PBC=self.PBC):
-                                        if coordinates_tmp == []:
-                                            coordinates_tmp = coords_toadd
-                                        else:
-                                            coordinates_tmp = np.vstack([coordinates_tmp, coords_toadd])
-                                        sites_tmp += [specie]*len(coords_toadd)
-                                        wyckoff_sites_tmp.append(Wyckoff_site(ops, point, specie))
+                                    #Skip sites after which the remaining atoms cannot be placed
+                                    remaining = [0]*i + [numIon-numIon_added-len(coords_toadd)] + list(self.numIons[i+1:])
+                                    used = [site.wp.index for site in space.sites] + [int(good_merge)]
+                                    site = Wyckoff_site(self.group[int(good_merge)], point, specie)
+                                    if not self.combinations.completable(remaining, used):
+                                        stats.reject("wyckoff")
+                                        if observer is not None:
+                                            observer.on_reject("wyckoff", site.wp)
+                                        cycle3 += 1
+                                        self.numattempts += 1
+                                    elif space.test(coords_toadd, [specie]*len(coords_toadd)):
+                                        space.commit(site=site)
+                                        if observer is not None:
+                                            observer.on_accept(site)
                                         numIon_added += len(coords_toadd)
                                     else:
+                                        reason = "distance:"+"-".join(str(x) for x in space.violation)
+                                        stats.reject(reason)
+                                        if observer is not None:
+                                            observer.on_reject(reason, site)
                                         cycle3 += 1
                                         self.numattempts += 1
+                                    stats.add_time("distance", t)
                                     if numIon_added == numIon:
-                                        coordinates_total = deepcopy(coordinates_tmp)
-                                        sites_total = deepcopy(sites_tmp)
-                                        wyckoff_sites_total = deepcopy(wyckoff_sites_tmp)
+                                        space.checkpoint()
                                         break
                                 else:
+                                    stats.reject("merge")
+                                    if observer is not None:
+                                        observer.on_reject("merge", ops)
                                     cycle3 += 1
                                     self.numattempts += 1
                             else:
+                                stats.reject("wyckoff")
+                                if observer is not None:
+                                    observer.on_reject("wyckoff", None)
                                 cycle3 += 1
-                                self.numattempts ++ 1
+                                self.numattempts += 1
 
                         if numIon_added != numIon:
                             break  #need to repeat from the 1st species
@@ -2085,10 +3173,13 @@ class random_crystal():
                         good_structure = True
                         break
                     else: #reset the coordinates and sites
-                        coordinates_total = []
-                        sites_total = []
+                        removed = space.rollback(0)
+                        if observer is not None and removed:
+                            observer.on_rollback(removed)
 
                 if good_structure:
+                    t = time()
+                    coordinates_total, sites_total = space.get_coords_and_species()
                     final_coor = []
                     final_site = []
                     final_number = []
@@ -2110,17 +3201,19 @@ class random_crystal():
                         self.sites = final_site
                         """A list of atomic symbols corresponding to the type
                         of atom for each site in self.coordinates"""
-                        self.struct = Structure(final_lattice, final_site, np.array(final_coor))
-                        """A pymatgen.core.structure.Structure object for the
-                        final generated crystal."""
-                        self.spg_struct = (final_lattice, np.array(final_coor), final_number)
-                        """A list of information describing the generated
-                        crystal, which may be used by spglib for symmetry
-                        analysis."""
-                        self.wyckoff_sites = wyckoff_sites_total
+                        self.numbers = np.array(final_number)
+                        """The atomic numbers for each site in
+                        self.coordinates"""
+                        #struct and spg_struct are built when first used
+                        self.__dict__.pop("_struct", None)
+                        self.wyckoff_sites = space.get_sites()
                         """A list of Wyckoff_site objects describing the Wyckoff positions in
                         the structure."""
+                        stats.add_time("output", t)
+                        stats.valid = 1
                         self.valid = True
+                        if observer is not None:
+                            observer.on_finish(self)
                         return
                     elif self.dim == 0:
                         if verify_distances(final_coor, final_site, cell_matrix, PBC=self.PBC):
@@ -2136,29 +3229,31 @@ class random_crystal():
                             self.species = final_site
                             """A list of atomic symbols corresponding to the type
                             of atom for each site in self.coordinates"""
-                            absolute_coords = np.dot(self.coordinates, cell_matrix)
-                            self.molecule = Molecule(self.species, absolute_coords)
-                            """A pymatgen.core.structure.Molecule object for the
-                            final generated cluster."""
-                            #Calculate binding box
-                            maxx = max(absolute_coords[:,0])
-                            minx = min(absolute_coords[:,0])
-                            maxy = max(absolute_coords[:,1])
-                            miny = min(absolute_coords[:,1])
-                            maxz = max(absolute_coords[:,2])
-                            minz = min(absolute_coords[:,2])
-                            self.struct = self.molecule.get_boxed_structure(maxx-minx+10, maxy-miny+10, maxz-minz+10)
-                            """A pymatgen.core.structure.Structure object for the
-                            final generated object."""
-                            self.wyckoff_sites = wyckoff_sites_total
+                            self.numbers = np.array(final_number)
+                            """The atomic numbers for each site in
+                            self.coordinates"""
+                            #molecule and struct are built when first used
+                            self.__dict__.pop("_molecule", None)
+                            self.__dict__.pop("_struct", None)
+                            self.wyckoff_sites = space.get_sites()
                             """A list of Wyckoff_site objects describing the Wyckoff positions in
                             the structure."""
+                            stats.add_time("output", t)
+                            stats.valid = 1
                             self.valid = True
                             """Whether or not a valid crystal was generated."""
+                            if observer is not None:
+                                observer.on_finish(self)
                             return
-        if degrees == 0: print("Wyckoff positions have no degrees of freedom.")
+                        else:
+                            removed = space.rollback(0)
+                            if observer is not None and removed:
+                                observer.on_rollback(removed)
+        if degrees == 0: self.message("Wyckoff positions have no degrees of freedom.")
         self.struct = self.Msg2
         self.valid = False
+        if observer is not None:
+            observer.on_finish(self)
         return self.Msg2
 
 class random_crystal_2D(random_crystal):
@@ -2181,14 +3276,17 @@ class random_crystal_2D(random_crystal):
             unit cell. Increasing this gives extra space between atoms
         lattice: an optional Lattice object to use for the unit cell
         tm: the Tol_matrix object used to generate the crystal
+        generate: whether or not to generate a crystal during initialization
+        observer: an optional Observer object, which is notified as the
+            crystal is generated
     """
-    def __init__(self, group, species, numIons, factor, thickness=None, lattice=None, tm=Tol_matrix(prototype="atomic")):
+    def __init__(self, group, species, numIons, factor, thickness=None, lattice=None, tm=Tol_matrix(prototype="atomic"), generate=True, observer=None):
         self.dim = 2
         """The number of periodic dimensions of the crystal"""
         self.PBC = [1,1,0]
         """The periodic boundary axes of the crystal"""
         if type(group) != Group:
-            group = Group(group, self.dim)
+            group = get_group(group, self.dim)
         number = group.number
         """The layer group number of the crystal."""
         self.lgp = Layergroup(number)
@@ -2198,7 +3296,7 @@ class random_crystal_2D(random_crystal):
         self.thickness = thickness
         """the thickness, in Angstroms, of the unit cell in the 3rd
         dimension."""
-        self.init_common(species, numIons, factor, number, lattice, tm)
+        self.init_common(species, numIons, factor, number, lattice, tm, generate, observer)
 
 class random_crystal_1D(random_crystal):
     """
@@ -2219,8 +3317,11 @@ class random_crystal_1D(random_crystal):
             unit cell. Increasing this gives extra space between atoms
         lattice: an optional Lattice object to use for the unit cell
         tm: the Tol_matrix object used to generate the crystal
+        generate: whether or not to generate a crystal during initialization
+        observer: an optional Observer object, which is notified as the
+            crystal is generated
     """
-    def __init__(self, group, species, numIons, factor, area=None, lattice=None, tm=Tol_matrix(prototype="atomic")):
+    def __init__(self, group, species, numIons, factor, area=None, lattice=None, tm=Tol_matrix(prototype="atomic"), generate=True, observer=None):
         self.dim = 1
         """The number of periodic dimensions of the crystal"""
         self.PBC = [0,0,1]
@@ -2231,7 +3332,7 @@ class random_crystal_1D(random_crystal):
         self.area = area
         """the effective cross-sectional area, in Angstroms squared, of the
         unit cell."""
-        self.init_common(species, numIons, factor, group, lattice, tm)
+        self.init_common(species, numIons, factor, group, lattice, tm, generate, observer)
 
 class random_cluster(random_crystal):
     """
@@ -2253,8 +3354,11 @@ class random_cluster(random_crystal):
             unit cell. Increasing this gives extra space between atoms
         lattice: an optional Lattice object to use for the unit cell
         tm: the Tol_matrix object used to generate the crystal
+        generate: whether or not to generate a crystal during initialization
+        observer: an optional Observer object, which is notified as the
+            crystal is generated
     """
-    def __init__(self, group, species, numIons, factor, lattice=None, tm=Tol_matrix(prototype="atomic")):
+    def __init__(self, group, species, numIons, factor, lattice=None, tm=Tol_matrix(prototype="atomic"), generate=True, observer=None):
         self.dim = 0
         """The number of periodic dimensions of the crystal"""
         self.PBC = [0,0,0]
@@ -2262,7 +3366,503 @@ class random_cluster(random_crystal):
         self.sg = None
         """The international space group number (there is not a 1-1 correspondence
         with Point groups)."""
-        self.init_common(species, numIons, factor, group, lattice, tm)
+        self.init_common(species, numIons, factor, group, lattice, tm, generate, observer)
+
+class Fingerprint_filter():
+    """
+    Drops duplicate structures from a stream of generated crystals without
+    comparing every pair of structures. Each crystal is reduced to a cheap
+    fingerprint (see fingerprint). Crystals with identical fingerprints are
+    found with a hash lookup. Otherwise, the fingerprint is compared with
+    those of the last max_bucket crystals with the same group, composition
+    and Wyckoff positions, to also catch near duplicates.
+
+    Args:
+        rmax: the largest interatomic distance (in Angstroms) included in the
+            distance histogram
+        bins: the number of bins of the distance histogram
+        ltol: the largest relative difference between cell lengths, and the
+            largest difference between cosines of cell angles, of near
+            duplicates
+        dtol: the largest difference between the distance histograms of near
+            duplicates, as the sum of the absolute differences in pairs per
+            atom over all bins
+        max_bucket: the number of crystals per group, composition and
+            Wyckoff positions kept for the near-duplicate comparison
+    """
+    def __init__(self, rmax=6.0, bins=60, ltol=0.01, dtol=0.5, max_bucket=1000):
+        self.rmax = rmax
+        self.bins = bins
+        self.ltol = ltol
+        self.dtol = dtol
+        self.max_bucket = max_bucket
+        self.index = set()
+        """The exact fingerprints of all crystals added so far"""
+        self.buckets = {}
+        """The cell parameters and distance histograms of the last max_bucket
+        crystals added for each key"""
+        self.count = 0
+        """The number of unique crystals added"""
+        self.duplicates = 0
+        """The number of crystals found to be duplicates"""
+
+    def fingerprint(self, crystal):
+        """
+        Computes the fingerprint of a generated crystal, from data which the
+        generator already stores.
+
+        Args:
+            crystal: a valid random_crystal or molecular_crystal object
+
+        Returns:
+            key: a tuple of the dimension, group number, sorted species and
+                sorted Wyckoff sites (specie or molecular formula, with the
+                multiplicity and letter of the Wyckoff position)
+            cell: the sorted cell lengths and the sorted absolute cosines of
+                the cell angles. For 3D crystals, these are taken from the
+                Niggli reduced cell, so that different choices of the same
+                cell give the same values
+            hist: the number of atom pairs in each bin of distances between 0
+                and rmax
+        """
+        sites = getattr(crystal, "wyckoff_sites", None)
+        if sites is None:
+            sites = crystal.mol_generators
+        labels = []
+        for site in sites:
+            if hasattr(site, "specie"):
+                name = site.specie
+            else:
+                name = site.mol.formula
+            labels.append(name+" "+str(site.wp.multiplicity)+site.wp.letter)
+        key = (crystal.dim, crystal.group.number, tuple(sorted(crystal.sites)), tuple(sorted(labels)))
+
+        matrix = crystal.lattice_matrix
+        if all(crystal.PBC):
+            para = matrix2para(pmg_Lattice(matrix).get_niggli_reduced_lattice().matrix)
+        else:
+            para = matrix2para(matrix)
+        cell = np.concatenate([np.sort(para[:3]), np.sort(np.abs(np.cos(para[3:])))])
+        i, j, d = find_pairs(crystal.coordinates, crystal.coordinates, matrix, self.rmax, PBC=crystal.PBC)
+        hist = np.histogram(d[j > i], bins=self.bins, range=(0, self.rmax))[0]
+        return key, cell, hist
+
+    def add(self, crystal):
+        """
+        Adds a crystal to the filter, unless it is a duplicate of a crystal
+        added before.
+
+        Args:
+            crystal: a valid random_crystal or molecular_crystal object
+
+        Returns:
+            True if the crystal was added, False if it is a duplicate
+        """
+        key, cell, hist = self.fingerprint(crystal)
+        exact = key + tuple(np.round(cell, 3)) + tuple(hist)
+        if exact in self.index:
+            self.duplicates += 1
+            return False
+        n = len(crystal.sites)
+        if key in self.buckets:
+            cells, hists = self.buckets[key]
+            if len(cells) > 0:
+                close = (np.abs(cells[:,:3] - cell[:3]) <= self.ltol*cell[:3]).all(axis=1)
+                close &= (np.abs(cells[:,3:] - cell[3:]) <= self.ltol).all(axis=1)
+                close &= np.abs(hists - hist/n).sum(axis=1) <= self.dtol
+                if close.any():
+                    self.duplicates += 1
+                    return False
+        else:
+            cells, hists = np.zeros([0, 6]), np.zeros([0, self.bins])
+        self.buckets[key] = (np.vstack([cells, cell])[-self.max_bucket:],
+                             np.vstack([hists, hist/n])[-self.max_bucket:])
+        self.index.add(exact)
+        self.count += 1
+        return True
+
+    def filter(self, crystals):
+        """
+        Iterates over the crystals which are not duplicates. Invalid crystals
+        are passed through unchanged.
+
+        Args:
+            crystals: an iterable of crystal objects
+
+        Returns:
+            a generator of the crystals which are invalid or were added
+        """
+        for crystal in crystals:
+            if crystal.valid is False or self.add(crystal):
+                yield crystal
+
+    def __len__(self):
+        return self.count
+
+class Structure_writer():
+    """
+    Streams many generated crystals into a single file, instead of one file
+    per structure. Supports extended xyz ("extxyz") files and multi-block cif
+    files, optionally compressed with gzip. Output is buffered, and the offset
+    (in the uncompressed text) at which each structure starts is recorded, so
+    that single structures can be found again without parsing the whole file.
+
+    For 3D atomic crystals, the cif blocks list the symmetry operations of
+    the known space group and one atom per Wyckoff site, so no symmetry
+    analysis is needed. Other structures are written in P1.
+
+    Args:
+        filename: the output file path. If it ends with ".gz", the output is
+            compressed with gzip
+        fmt: "extxyz" or "cif". By default, chosen from the file extension
+            (".cif" for cif, anything else for extxyz). Other values raise a
+            ValueError
+        index: whether to write the offsets of all structures to
+            filename + ".idx", one per line, when the writer is closed
+        buffering: the size of the output buffer in bytes
+    """
+    def __init__(self, filename, fmt=None, index=True, buffering=2**20):
+        self.filename = filename
+        compress = filename.endswith(".gz")
+        if fmt is None:
+            name = filename[:-3] if compress else filename
+            fmt = "cif" if name.endswith(".cif") else "extxyz"
+        if fmt not in ["extxyz", "cif"]:
+            raise ValueError("Unsupported format for Structure_writer: "+str(fmt))
+        self.fmt = fmt
+        self.index = index
+        if compress:
+            raw = io.BufferedWriter(gzip.GzipFile(filename, "wb"), buffering)
+            self.file = io.TextIOWrapper(raw, encoding="ascii")
+        else:
+            self.file = open(filename, "w", buffering=buffering, encoding="ascii")
+        self.position = 0
+        """The number of characters written so far"""
+        self.offsets = []
+        """The offset in the uncompressed text at which each structure starts"""
+
+    def write(self, crystal, name=None):
+        """
+        Appends a valid crystal to the file. Invalid crystals are skipped.
+
+        Args:
+            crystal: a random_crystal or molecular_crystal object
+            name: an optional name for the structure. Defaults to the
+                composition and the structure's number in the file
+
+        Returns:
+            the number of the structure within the file, or None if the
+            crystal was skipped
+        """
+        if not crystal.valid:
+            return
+        if name is None:
+            counts = {}
+            for s in crystal.sites:
+                counts[s] = counts.get(s, 0) + 1
+            name = "".join(s+str(n) for s, n in counts.items())+"_"+str(len(self.offsets)+1)
+        if self.fmt == "cif":
+            text = self.cif_block(crystal, name)
+        else:
+            text = self.extxyz_block(crystal, name)
+        self.offsets.append(self.position)
+        self.file.write(text)
+        self.position += len(text)
+        return len(self.offsets) - 1
+
+    def extxyz_block(self, crystal, name):
+        """
+        Returns the extended xyz text for a crystal, with Cartesian coordinates.
+        """
+        matrix = crystal.lattice_matrix
+        coords = np.dot(crystal.coordinates, matrix)
+        pbc = " ".join("T" if p else "F" for p in crystal.PBC)
+        lines = [str(len(coords))]
+        info = 'Lattice="'+" ".join("%.6f" % x for x in np.ravel(matrix))+'"'
+        info += ' Properties=species:S:1:pos:R:3 pbc="'+pbc+'"'
+        info += " name="+name+" group="+str(crystal.group.number)+" dim="+str(crystal.dim)
+        if getattr(crystal, "seed", None) is not None:
+            info += " seed="+str(crystal.seed)
+        lines.append(info)
+        for specie, xyz in zip(crystal.sites, coords):
+            lines.append("%-3s %14.8f %14.8f %14.8f" % (specie, xyz[0], xyz[1], xyz[2]))
+        return "\n".join(lines)+"\n"
+
+    def cif_block(self, crystal, name):
+        """
+        Returns a cif data block for a crystal. 3D atomic crystals are written
+        with their space group's operations and Wyckoff sites, others in P1.
+        """
+        sites = getattr(crystal, "wyckoff_sites", None)
+        if crystal.dim == 3 and sites is not None:
+            matrix = crystal.lattice_matrix
+            number = crystal.group.number
+            ops = crystal.group[0]
+            atoms = [(site.specie, site.wp.multiplicity, site.wp.letter, site.position) for site in sites]
+        else:
+            if crystal.dim == 0:
+                #Use the cluster in its padded box
+                matrix = crystal.struct.lattice.matrix
+                coords = crystal.struct.frac_coords
+            else:
+                matrix = crystal.lattice_matrix
+                coords = crystal.coordinates
+            number = 1
+            ops = None
+            atoms = [(specie, 1, "a", xyz) for specie, xyz in zip(crystal.sites, coords)]
+        a, b, c, alpha, beta, gamma = matrix2para(matrix, radians=False)
+        lines = ["data_"+name,
+                 "_symmetry_space_group_name_H-M   'P 1'" if number == 1 else "_symmetry_Int_Tables_number      "+str(number),
+                 "_cell_length_a     %.6f" % a,
+                 "_cell_length_b     %.6f" % b,
+                 "_cell_length_c     %.6f" % c,
+                 "_cell_angle_alpha  %.6f" % alpha,
+                 "_cell_angle_beta   %.6f" % beta,
+                 "_cell_angle_gamma  %.6f" % gamma,
+                 "_cell_volume       %.6f" % abs(np.linalg.det(matrix)),
+                 "loop_",
+                 " _symmetry_equiv_pos_site_id",
+                 " _symmetry_equiv_pos_as_xyz"]
+        if ops is None:
+            lines.append("  1  'x, y, z'")
+        else:
+            for i, op in enumerate(ops):
+                lines.append("  "+str(i+1)+"  '"+op.as_xyz_string()+"'")
+        lines += ["loop_",
+                  " _atom_site_label",
+                  " _atom_site_type_symbol",
+                  " _atom_site_symmetry_multiplicity",
+                  " _atom_site_Wyckoff_symbol",
+                  " _atom_site_fract_x",
+                  " _atom_site_fract_y",
+                  " _atom_site_fract_z",
+                  " _atom_site_occupancy"]
+        counts = {}
+        for specie, multiplicity, letter, xyz in atoms:
+            counts[specie] = counts.get(specie, 0) + 1
+            xyz = np.mod(xyz, 1)
+            lines.append("  %-5s %-3s %3d %s %10.6f %10.6f %10.6f 1" % (specie+str(counts[specie]), specie, multiplicity, letter, xyz[0], xyz[1], xyz[2]))
+        return "\n".join(lines)+"\n\n"
+
+    def close(self):
+        """
+        Flushes and closes the file, and writes the index of offsets.
+        """
+        self.file.close()
+        if self.index:
+            with open(self.filename+".idx", "w") as f:
+                f.write("".join(str(offset)+"\n" for offset in self.offsets))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __len__(self):
+        return len(self.offsets)
+
+class Generator():
+    """
+    Class for generating many random crystals with the same group and
+    composition. The group, tolerance matrix, volume estimate, Lattice and
+    Wyckoff compatibility check (and, for molecular crystals, the molecular
+    symmetrization, boxes and valid orientations) are prepared once, and each
+    call to sample only runs generate_crystal on a shallow copy of the
+    prepared crystal.
+
+    Args:
+        crystal_class: the class used to generate each structure, e.g.
+            random_crystal, random_crystal_2D, random_cluster or
+            pyxtal.molecular_crystal.molecular_crystal
+        *args: the positional arguments passed to crystal_class
+        **kwargs: the keyword arguments passed to crystal_class
+    """
+    def __init__(self, crystal_class, *args, **kwargs):
+        kwargs["generate"] = False
+        self.crystal_class = crystal_class
+        """The class used to generate each structure."""
+        self.template = crystal_class(*args, **kwargs)
+        """The prepared (but not generated) crystal which is copied for each
+        new structure."""
+        self.lattice = self.template.lattice
+        """The Lattice object used to generate lattice matrices."""
+        self.stats = Generation_stats()
+        """A Generation_stats object adding up the stats of every crystal
+        generated from this Generator, including by generate_parallel."""
+
+    def sample(self, seed=None, scheduler=None, **kwargs):
+        """
+        Generates a single random crystal from the prepared setup.
+
+        Args:
+            seed: an optional integer seed, used to create the
+                numpy.random.Generator passed to generate_crystal. Generating
+                with the same seed reproduces the same crystal
+            scheduler: an optional Scheduler object, used to generate the
+                crystal within a time or trial budget
+            **kwargs: optional arguments passed to generate_crystal, e.g. max1
+
+        Returns:
+            a crystal_class object. Check its valid attribute to see whether
+            the generation succeeded
+        """
+        crystal = copy(self.template)
+        crystal.seed = seed
+        """The seed used to generate the crystal, or None."""
+        if getattr(self.template, "valid", None) is False:
+            return crystal
+        if seed is not None:
+            kwargs["rng"] = np.random.default_rng(seed)
+        #Each structure needs its own Lattice, since generate_crystal resets
+        #the matrix in place
+        crystal.lattice = copy(self.lattice)
+        if scheduler is not None:
+            scheduler.generate(crystal, **kwargs)
+        else:
+            crystal.generate_crystal(**kwargs)
+        self.stats.add(crystal.stats)
+        return crystal
+
+    def sample_many(self, n, unique=None, **kwargs):
+        """
+        Iterates over n random crystals generated from the prepared setup.
+        Failed attempts are also yielded, with valid set to False.
+
+        Args:
+            n: the number of crystals to generate
+            unique: an optional Fingerprint_filter. Valid crystals which it
+                finds to be duplicates are not yielded, and are counted as
+                "duplicate" rejections in self.stats
+            **kwargs: optional arguments passed to generate_crystal
+
+        Returns:
+            a generator of crystal_class objects
+        """
+        for i in range(n):
+            crystal = self.sample(**kwargs)
+            if unique is not None and crystal.valid and not unique.add(crystal):
+                self.stats.reject("duplicate")
+                continue
+            yield crystal
+
+    def strip(self, crystal):
+        """
+        Removes the attributes a crystal shares with the template, so that
+        it can be sent between processes cheaply. Use restore to add them
+        back.
+
+        Args:
+            crystal: a crystal generated by sample
+
+        Returns:
+            the same crystal, without the shared attributes
+        """
+        for key, value in list(vars(crystal).items()):
+            if value is getattr(self.template, key, None):
+                if type(value) not in [bool, int, float, str, type(None)]:
+                    delattr(crystal, key)
+        return crystal
+
+    def restore(self, crystal):
+        """
+        Adds back the attributes removed by strip.
+
+        Args:
+            crystal: a crystal returned by strip
+
+        Returns:
+            the same crystal, with the shared attributes of the template
+        """
+        for key, value in vars(self.template).items():
+            if not hasattr(crystal, key):
+                setattr(crystal, key, value)
+        return crystal
+
+def get_seeds(seed, n):
+    """
+    Derives independent per-structure seeds from a master seed, using numpy's
+    SeedSequence. The i-th seed depends only on the master seed and i, so any
+    single structure of a run can be regenerated with Generator.sample.
+
+    Args:
+        seed: the master seed (an integer), or None to draw one from the OS
+        n: the number of seeds to derive
+
+    Returns:
+        a list of n integers between 0 and 2**32-1
+    """
+    children = np.random.SeedSequence(seed).spawn(n)
+    return [int(child.generate_state(1)[0]) for child in children]
+
+#The Generator used by each worker process of generate_parallel
+worker_generator = None
+
+def init_worker(generator):
+    """
+    Stores the Generator in a worker process of generate_parallel. Called
+    once per worker, so the setup is unpickled only once.
+    """
+    global worker_generator
+    worker_generator = generator
+
+def sample_worker(args):
+    """
+    Generates a single crystal in a worker process of generate_parallel.
+
+    Args:
+        args: a tuple (index, seed, kwargs)
+
+    Returns:
+        a tuple (index, crystal), where the crystal has been stripped of
+        the attributes it shares with the Generator's template
+    """
+    index, seed, kwargs = args
+    crystal = worker_generator.sample(seed=seed, **kwargs)
+    return index, worker_generator.strip(crystal)
+
+def generate_parallel(generator, n, workers=None, seed=None, unique=None, **kwargs):
+    """
+    Generates n random crystals from a Generator using a pool of processes.
+    Results are yielded in the order in which they finish, not in the order
+    of their indices. Each crystal is generated with its own seed (stored in
+    crystal.seed), derived from the master seed by get_seeds.
+
+    Args:
+        generator: a Generator object
+        n: the number of crystals to generate
+        workers: the number of processes to use. Defaults to the number of
+            CPUs. If 1, the crystals are generated in the current process
+        seed: the master seed for the run, or None for a random one
+        unique: an optional Fingerprint_filter. Valid crystals which it finds
+            to be duplicates are dropped before being yielded, and are counted
+            as "duplicate" rejections in generator.stats
+        **kwargs: optional arguments passed to generate_crystal
+
+    Returns:
+        a generator of (index, crystal) tuples, where index is the
+        position of the crystal's seed in get_seeds(seed, n)
+    """
+    seeds = get_seeds(seed, n)
+    if workers == 1:
+        results = ((index, generator.sample(seed=s, **kwargs)) for index, s in enumerate(seeds))
+    else:
+        pool = Pool(workers, initializer=init_worker, initargs=(generator,))
+        tasks = [(index, s, kwargs) for index, s in enumerate(seeds)]
+        results = pool.imap_unordered(sample_worker, tasks)
+    try:
+        for index, crystal in results:
+            if workers != 1:
+                if hasattr(crystal, "stats"):
+                    generator.stats.add(crystal.stats)
+                crystal = generator.restore(crystal)
+            if unique is not None and crystal.valid and not unique.add(crystal):
+                generator.stats.reject("duplicate")
+                continue
+            yield index, crystal
+    finally:
+        if workers != 1:
+            pool.terminate()
 
 
 if __name__ == "__main__":
@@ -2287,6 +3887,14 @@ if __name__ == "__main__":
             help="desired dimension: (3, 2, or 1 for 3d, 2d, or 1D respectively): default 3")
     parser.add_option("-t", "--thickness", dest="thickness", metavar='thickness', default=None, type=float,
             help="Thickness, in Angstroms, of a 2D crystal, or area of a 1D crystal, None generates a value automatically: default None")
+    parser.add_option("-j", "--jobs", dest="jobs", metavar='jobs', default=1, type=int,
+            help="number of processes to generate crystals with; 0 uses all CPUs: default 1")
+    parser.add_option("-r", "--seed", dest="seed", metavar='seed', default=None, type=int,
+            help="master random seed, for reproducing a run: default None")
+    parser.add_option("-u", "--unique", dest="unique", action="store_true", default=False,
+            help="skip structures which duplicate an earlier one: default False")
+    parser.add_option("-w", "--write", dest="write", metavar='write', default=None, type=str,
+            help="single file (.cif or .extxyz, optionally .gz) to write all structures to, instead of one cif file each: default None")
 
     (options, args) = parser.parse_args()
     sg = options.sg
@@ -2334,44 +3942,58 @@ if __name__ == "__main__":
     except: pass
 
     filecount = 1 #To check whether a file already exists
-    for i in range(attempts):
-        numIons0 = np.array(numIons)
-        sg = options.sg
-        start = time()
-        if dimension == 3:
-            rand_crystal = random_crystal(options.sg, system, numIons0, factor)
-            sg1 = sg
-        elif dimension == 2:
-            rand_crystal = random_crystal_2D(options.sg, system, numIons0, thickness, factor)
-            sg1 = rand_crystal.sg
-        elif dimension == 1:
-            rand_crystal = random_crystal_1D(options.sg, system, numIons0, thickness, factor)
-            sg1 = "?"
-        if dimension == 0:
-            rand_crystal = random_cluster(options.sg, system, numIons0, factor)
-            sg1 = sg
+    numIons0 = np.array(numIons)
+    sg = options.sg
+    if dimension == 3:
+        generator = Generator(random_crystal, options.sg, system, numIons0, factor)
+        sg1 = sg
+    elif dimension == 2:
+        generator = Generator(random_crystal_2D, options.sg, system, numIons0, factor, thickness=thickness)
+        sg1 = generator.template.sg
+    elif dimension == 1:
+        generator = Generator(random_crystal_1D, options.sg, system, numIons0, factor, area=thickness)
+        sg1 = "?"
+    if dimension == 0:
+        generator = Generator(random_cluster, options.sg, system, numIons0, factor)
+        sg1 = sg
+    jobs = options.jobs
+    if jobs < 1:
+        jobs = None
+    unique = None
+    if options.unique:
+        unique = Fingerprint_filter()
+    writer = None
+    if options.write is not None:
+        writer = Structure_writer(options.write)
+    start = time()
+    for i, rand_crystal in generate_parallel(generator, attempts, workers=jobs, seed=options.seed, unique=unique):
         end = time()
         timespent = np.around((end - start), decimals=2)
+        start = end
 
         if rand_crystal.valid:
             #Output a cif file
             written = False
-            try:
-                comp = str(rand_crystal.struct.composition)
-                comp = comp.replace(" ", "")
-                cifpath = outdir + '/' + comp + "_" + str(filecount) + '.cif'
-                while os.path.isfile(cifpath):
-                    filecount += 1
-                    cifpath = outdir + '/' + comp + "_" + str(filecount) + '.cif'
-                CifWriter(rand_crystal.struct, symprec=0.1).write_file(filename = cifpath)
+            if writer is not None:
+                cifpath = options.write + ", structure " + str(writer.write(rand_crystal) + 1)
                 written = True
-            except: pass
+            else:
+                try:
+                    comp = str(rand_crystal.struct.composition)
+                    comp = comp.replace(" ", "")
+                    cifpath = outdir + '/' + comp + "_" + str(filecount) + '.cif'
+                    while os.path.isfile(cifpath):
+                        filecount += 1
+                        cifpath = outdir + '/' + comp + "_" + str(filecount) + '.cif'
+                    CifWriter(rand_crystal.struct, symprec=0.1).write_file(filename = cifpath)
+                    written = True
+                except: pass
             #POSCAR output
             #rand_crystal.struct.to(fmt="poscar", filename = '1.vasp')
 
             #spglib style structure called cell
             ans = get_symmetry_dataset(rand_crystal.spg_struct, symprec=1e-1)['number']
-            print('Space group  requested:', sg1, ' generated:', ans)
+            print('Space group  requested:', sg1, ' generated:', ans, ' seed:', rand_crystal.seed)
             if written is True:
                 print("    Output to "+cifpath)
             else:
@@ -2387,3 +4009,8 @@ if __name__ == "__main__":
         else: 
             print('something is wrong')
             print('Time spent during generation attempt: ' + str(timespent) + "s")
+
+    if writer is not None:
+        writer.close()
+    if verbosity > 0:
+        print(generator.stats)
@@ -63,6 +63,26 @@ command-line usage of the module:
         periodic direction. For 1D, this value will be used for the crystal's
         cross-sectional area. If set to None, chooses a value automatically.
         Defaults to None  
+
+    jobs (-j): the number of processes used to generate the structures in
+        parallel. If 0, uses all available CPUs. Defaults to 1  
+
+    seed (-r): the master random seed. Each structure gets its own seed
+        derived from it (printed with the structure), so a run or any single
+        structure can be reproduced. Defaults to None  
+
+    unique (-u): skip structures which are duplicates of an earlier one, as
+        found by Fingerprint_filter. Defaults to False  
+
+    write (-w): a single file to write all structures to, using
+        Structure_writer. The format is chosen from the extension (.cif or
+        .extxyz, optionally followed by .gz). If not set, each structure is
+        written to its own cif file in outdir. Defaults to None  
+
+    prewarm (-p): instead of generating structures, compute the valid
+        orientations of the molecules in every group of the given dimension
+        and store them in the disk cache, using jobs processes. Defaults to
+        False  
 """
 from pyxtal.symmetry import *
 from pyxtal.crystal import *
@@ -70,6 +90,10 @@ from pyxtal.molecule import *
 from pyxtal.operations import *
 from pyxtal.database.collection import Collection
 from time import time
+import os
+import json
+import hashlib
+import threading
 
 molecule_collection = Collection('molecules')
 max1 = 30 #Attempts for generating lattices
@@ -79,41 +103,123 @@ max4 = 10 #Attempts for a given mol_site (changning orientation)
 
 tol_m = 1.0 #minimum distance between atoms for distance check
 
+def ellipsoids_overlap(axes1, axes2, vectors, samples=32):
+    """
+    Checks many pairs of ellipsoids for overlap at once. Pairs whose bounding
+    spheres are apart, or whose inscribed spheres overlap, are decided
+    directly. The others are decided with the Perram-Wertheim contact
+    function F(l) = l(1-l) r.[(1-l)S1 + l S2]^-1.r, where r joins the centers
+    and S = axes.axes^T: the ellipsoids overlap if F(l) < 1 for all l in
+    (0,1). F is evaluated at a fixed number of values of l, so ellipsoids
+    which almost touch may be reported as overlapping.
+
+    Args:
+        axes1: an (n,3,3) array, whose columns are the semi-axes of the first
+            ellipsoid in each pair
+        axes2: an (n,3,3) array of the semi-axes of the second ellipsoids
+        vectors: an (n,3) array of the vectors from the center of the first
+            ellipsoid to the center of the second, for each pair
+        samples: the number of values of l at which F is evaluated
+
+    Returns:
+        a boolean array, True for the pairs which overlap
+    """
+    dist = np.linalg.norm(vectors, axis=1)
+    lengths1 = np.linalg.norm(axes1, axis=1)
+    lengths2 = np.linalg.norm(axes2, axis=1)
+    overlap = dist < lengths1.min(axis=1) + lengths2.min(axis=1)
+    unknown = ~overlap & (dist < lengths1.max(axis=1) + lengths2.max(axis=1))
+    if unknown.any():
+        r = vectors[unknown]
+        S1 = np.einsum('nij,nkj->nik', axes1[unknown], axes1[unknown])
+        S2 = np.einsum('nij,nkj->nik', axes2[unknown], axes2[unknown])
+        l = (np.arange(samples) + 0.5) / samples
+        S = (1-l)[None,:,None,None] * S1[:,None] + l[None,:,None,None] * S2[:,None]
+        rs = np.broadcast_to(r[:,None,:,None], S.shape[:2]+(3,1))
+        F = l*(1-l) * np.einsum('nli,ni->nl', np.linalg.solve(S, rs)[...,0], r)
+        overlap[unknown] = F.max(axis=1) < 1
+    return overlap
+
+def find_ellipsoid_overlaps(axes1, centers1, axes2, centers2, lattice, PBC=[1,1,1], same=False):
+    """
+    Finds the ellipsoids from one set which overlap with any periodic image of
+    an ellipsoid from another set.
+
+    Args:
+        axes1: an (n,3,3) array of semi-axes (as columns) for the first set
+        centers1: an (n,3) array of absolute centers for the first set
+        axes2: an (m,3,3) array of semi-axes for the second set
+        centers2: an (m,3) array of absolute centers for the second set
+        lattice: the 3x3 lattice matrix
+        PBC: the periodic axes
+        same: whether the second set is the start of the first set, in which
+            case an ellipsoid is not compared with itself (but still with its
+            periodic images)
+
+    Returns:
+        a boolean array of length n, True for the ellipsoids of the first set
+        which may overlap with the second set
+    """
+    inverse = np.linalg.inv(lattice)
+    periodic = np.array(PBC, dtype=bool)
+    #Fractional vectors between the centers, moved to the nearest image
+    f = np.dot(centers2[None,:,:] - centers1[:,None,:], inverse)
+    f[...,periodic] -= np.round(f[...,periodic])
+    #Images shifted by more than k cells along an axis are at least (k+0.5)
+    #cell heights apart, so k is chosen so that they cannot overlap
+    heights = 1.0 / np.linalg.norm(inverse, axis=0)
+    size = np.linalg.norm(axes1, axis=1).max() + np.linalg.norm(axes2, axis=1).max()
+    ranges = []
+    for axis in range(3):
+        k = max(1, int(np.ceil(size / heights[axis] - 0.5))) if periodic[axis] else 0
+        ranges.append(np.arange(-k, k+1))
+    images = np.array(np.meshgrid(*ranges, indexing='ij'), dtype=float).reshape((3,-1)).T
+    vectors = np.dot(f[:,:,None,:] + images[None,None,:,:], lattice)
+    n, m, k = vectors.shape[:3]
+    i, j, v = np.meshgrid(np.arange(n), np.arange(m), np.arange(k), indexing='ij')
+    keep = np.ones((n,m,k), dtype=bool)
+    if same:
+        zero = np.where(~images.any(axis=1))[0][0]
+        for x in range(m):
+            keep[x,x,zero] = False
+    i, j = i[keep], j[keep]
+    found = np.zeros(n, dtype=bool)
+    found[i[ellipsoids_overlap(axes1[i], axes2[j], vectors[keep])]] = True
+    return found
+
+def check_ellipsoids(axes1, centers1, axes2, centers2, lattice, PBC=[1,1,1], same=False):
+    """
+    Checks whether or not any ellipsoid from one set overlaps with any periodic
+    image of an ellipsoid from another set. Takes the same arguments as
+    find_ellipsoid_overlaps.
+
+    Returns:
+        False if the ellipsoids may overlap. True if they do not
+    """
+    return not find_ellipsoid_overlaps(axes1, centers1, axes2, centers2, lattice, PBC=PBC, same=same).any()
+
 def check_intersection(ellipsoid1, ellipsoid2):
     """
     Given SymmOp's for 2 ellipsoids, checks whether or not they overlap
 
     Args:
-        ellipsoid1: a SymmOp representing the first ellipsoid
+        ellipsoid1: a SymmOp representing the first ellipsoid, as returned by
+            find_ellipsoid
         ellipsoid2: a SymmOp representing the second ellipsoid
 
     Returns:
         False if the ellipsoids overlap.
         True if they do not overlap.
     """
-    #Transform so that one ellipsoid becomes a unit sphere at (0,0,0)
-    Op = ellipsoid1.inverse * ellipsoid2
-    #We define a new ellipsoid by moving the sphere around the old ellipsoid
-    M = Op.rotation_matrix
-    a = 1.0 /(1.0 / np.linalg.norm(M[0]) + 1)
-    M[0] = M[0] / np.linalg.norm(M[0]) * a
-    b = 1.0 / (1.0 / np.linalg.norm(M[1]) + 1)
-    M[1] = M[1] / np.linalg.norm(M[1]) * b
-    c = 1.0 / (1.0 / np.linalg.norm(M[2]) + 1)
-    M[2] = M[2] / np.linalg.norm(M[2]) * c
-    p = Op.translation_vector
-    #Calculate the transformed distance from the sphere's center to the new ellipsoid
-    dsq = np.dot(p, M[0])**2 + np.dot(p, M[1])**2 + np.dot(p, M[2])**2
-    if dsq < 2:
-        return False
-    else:
-        return True
+    vector = ellipsoid2.translation_vector - ellipsoid1.translation_vector
+    return not ellipsoids_overlap(ellipsoid1.rotation_matrix[None], ellipsoid2.rotation_matrix[None], vector[None])[0]
 
 def check_mol_sites(ms1, ms2, atomic=False, factor=1.0, tm=Tol_matrix(prototype="molecular")):
     """
     Checks whether or not the molecules of two mol sites overlap. Uses
     ellipsoid overlapping approximation to check. Takes PBC and lattice
-    into consideration.
+    into consideration. If ms1 and ms2 are the same site, checks the
+    molecules of the site against each other.
 
     Args:
         ms1: a mol_site object
@@ -127,24 +233,90 @@ def check_mol_sites(ms1, ms2, atomic=False, factor=1.0, tm=Tol_matrix(prototype=
     Returns:
         False if the Wyckoff positions overlap. True otherwise
     """
+    same = ms1 is ms2
     if atomic is False:
-        es0 = ms1.get_ellipsoids()
-        PBC_vectors = np.dot(create_matrix(PBC=ms1.PBC), ms1.lattice)
-        PBC_ops = [SymmOp.from_rotation_and_translation(Euclidean_lattice, v) for v in PBC_vectors]
-        es1 = []
-        for op in PBC_ops:
-            es1.append(np.dot(es0, op))
-        es1 = np.squeeze(es1)
-        truth_values = np.vectorize(check_intersection)(es1, ms2.get_ellipsoid())
-        if np.sum(truth_values) < len(truth_values):
-            return False
-        else:
-            return True
+        #By symmetry, it is enough to check the first molecule of ms2
+        axes1, centers1 = ms1.get_ellipsoid_arrays()
+        axes2, centers2 = ms2.get_ellipsoid_arrays()
+        return check_ellipsoids(axes1, centers1, axes2[:1], centers2[:1], ms1.lattice, PBC=ms1.PBC, same=same)
 
     elif atomic is True:
+        if type(tm) == str:
+            tm = Tol_matrix(prototype=tm)
+        cutoff = max(factor, 1.0) * tm.get_tols(ms1.numbers, ms2.numbers).max()
+        #Molecules whose ellipsoids, padded by half the largest tolerance,
+        #are apart cannot have atoms which are too close
+        axes1, centers1 = ms1.get_ellipsoid_arrays(padding=0.5*cutoff)
+        axes2, centers2 = ms2.get_ellipsoid_arrays(padding=0.5*cutoff)
+        if check_ellipsoids(axes1, centers1, axes2[:1], centers2[:1], ms1.lattice, PBC=ms1.PBC, same=same):
+            return True
+        #Check the atoms of ms2 against a spatial index of the atoms of ms1,
+        #ignoring pairs of atoms in the same molecule
+        space = Occupied_space(ms1.lattice, cutoff, PBC=ms1.PBC, tm=tm, factor=factor)
         c1, s1 = ms1.get_coords_and_species()
-        c2, s2 = ms1.get_coords_and_species()
-        return check_distance(c1, c2, s1, s2, ms1.lattice, PBC=ms1.PBC, tm=tm, d_factor=factor)
+        space.commit(c1, s1, labels=ms1.get_labels())
+        c2, s2 = ms2.get_coords_and_species()
+        return space.test(c2, s2, labels=ms2.get_labels() if same else None)
+
+def find_overlapping_mol_site(ms, sites):
+    """
+    Checks the ellipsoids of the molecules in a mol_site against those of a
+    list of other mol_sites, in a single vectorized check.
+
+    Args:
+        ms: a mol_site object
+        sites: a list of mol_site objects in the same lattice
+
+    Returns:
+        the index in sites of a mol_site whose ellipsoids overlap with those
+        of ms, or None if there is no overlap
+    """
+    if len(sites) == 0:
+        return None
+    arrays = [ms1.get_ellipsoid_arrays() for ms1 in sites]
+    axes, centers = ms.get_ellipsoid_arrays()
+    found = find_ellipsoid_overlaps(np.vstack([a[0] for a in arrays]), np.vstack([a[1] for a in arrays]), axes[:1], centers[:1], ms.lattice, PBC=ms.PBC)
+    if not found.any():
+        return None
+    #Map the first overlapping ellipsoid back to its mol_site
+    ends = np.cumsum([len(a[0]) for a in arrays])
+    return int(np.searchsorted(ends, np.argmax(found), side='right'))
+
+def check_mol_crystal(sites, lattice, PBC=[1,1,1], tm=Tol_matrix(prototype="molecular"), factor=1.0):
+    """
+    Checks the inter-atomic distances between all molecules of a set of
+    mol_sites. The atoms of every molecule are stored in one Occupied_space,
+    labeled by molecule, and each site is checked against it in one query
+    which ignores pairs of atoms in the same molecule. Distances between a
+    molecule and its own periodic images are not checked.
+
+    Args:
+        sites: a list of mol_site objects
+        lattice: the 3x3 lattice matrix of the sites
+        PBC: the periodic axes
+        tm: a Tol_matrix object (or prototype string) for distance checking
+        factor: the tolerances are multiplied by this amount
+
+    Returns:
+        False if any two molecules have atoms which are too close. True
+        otherwise
+    """
+    if type(tm) == str:
+        tm = Tol_matrix(prototype=tm)
+    numbers = np.unique(np.concatenate([ms.numbers for ms in sites]))
+    space = Occupied_space(lattice, factor * tm.get_tols(numbers).max(), PBC=PBC, tm=tm, factor=factor)
+    labels = []
+    start = 0
+    for ms in sites:
+        labels.append(ms.get_labels() + start)
+        start += ms.multiplicity
+        c, s = ms.get_coords_and_species()
+        space.commit(c, s, labels=labels[-1])
+    for ms, l in zip(sites, labels):
+        c, s = ms.get_coords_and_species()
+        if not space.test(c, s, labels=l):
+            return False
+    return True
 
 def estimate_volume_molecular(molecules, numMols, factor=2.0, boxes=None):
     """
@@ -268,6 +440,275 @@ def get_box(mol):
         if z+r > maxz: maxz = z+r
     return Box(minx,maxx,miny,maxy,minz,maxz)
 
+#Prepared molecules
+#------------------------------
+prepared_molecule_version = 1
+"""The version of the molecule analysis (see Prepared_molecule.to_dict) stored
+in the disk cache. Increase it whenever the symmetrization, bounding box,
+radius or bounding ellipsoid change, so that stored files are recomputed."""
+orientations_version = 1
+"""The version of the orientations stored in the disk cache. Increase it
+whenever the valid orientations are computed differently, so that stored
+files are recomputed. Files are also recomputed when symmetry_db_version
+changes."""
+prepared_molecules = {}
+"""Prepared_molecule objects, keyed by molecule_fingerprint"""
+prepared_molecules_lock = threading.Lock()
+
+def molecule_fingerprint(mol, decimals=3):
+    """
+    Returns a hash identifying a molecule by its species and coordinates.
+
+    Args:
+        mol: a pymatgen Molecule object
+        decimals: the number of decimals the Cartesian coordinates are
+            rounded to
+
+    Returns:
+        a hexadecimal string
+    """
+    #Adding 0 turns -0.0 into 0.0
+    coords = np.round(mol.cart_coords, decimals) + 0.
+    text = " ".join(site.species_string for site in mol) + "\n" + np.array2string(coords, threshold=np.inf, precision=decimals)
+    return hashlib.sha1(text.encode()).hexdigest()
+
+class Prepared_molecule():
+    """
+    Class for the analysis of a molecule which molecular_crystal needs: the
+    symmetrized molecule, its point group operations, bounding box, radius
+    and bounding ellipsoid, and its valid orientations in the Wyckoff positions of each group. Use
+    prepare_molecule to get the shared Prepared_molecule for a molecule, so
+    that the analysis is done once rather than once per crystal. Orientations
+    are also kept in the disk cache (see symmetry.cache_dir), as one .npz file
+    per molecule, group, dimension and allow_inversion.
+
+    Args:
+        mol: a pymatgen Molecule object
+        data: an optional dictionary from to_dict, which is used instead of
+            analyzing mol
+    """
+    def __init__(self, mol=None, data=None):
+        if data is None:
+            pga = PointGroupAnalyzer(mol)
+            self.mol = pga.symmetrize_molecule()['sym_mol']
+            self.box = get_box(reoriented_molecule(self.mol)[0])
+            self.radius = float(max(np.linalg.norm(self.mol.cart_coords, axis=1).max(), 0)) + 1.0
+            self.symm_m = get_symmetry(self.mol, already_oriented=True)
+            self.ellipsoid = find_ellipsoid(self.mol)
+        else:
+            self.mol = Molecule(data["species"], data["coords"])
+            self.box = Box(*data["box"])
+            self.radius = data["radius"]
+            self.symm_m = [SymmOp(np.array(m)) for m in data["symm_m"]]
+            self.ellipsoid = SymmOp(np.array(data["ellipsoid"]))
+        """The symmetrized molecule, oriented along its symmetry axes"""
+        self.fingerprint = molecule_fingerprint(self.mol)
+        """The molecule_fingerprint of the symmetrized molecule, which names
+        its orientation files in the disk cache"""
+        self.orientations = {}
+        """The valid orientations, keyed by (dim, group number, allow_inversion)"""
+        self.pga = None
+        """A PointGroupAnalyzer for mol, created when orientations are needed"""
+
+    def get_orientations(self, group, allow_inversion=False):
+        """
+        Returns the valid orientations of the molecule in each Wyckoff
+        position of a group. They are read from the disk cache if possible
+        (and stored with the same orientations_version), and otherwise
+        computed and stored there.
+
+        Args:
+            group: a Group object
+            allow_inversion: whether or not to allow chiral molecules to be
+                inverted
+
+        Returns:
+            a list of lists, where element [j][k] is a list of valid
+            Orientation objects in group.wyckoffs_organized[j][k]
+        """
+        key = (group.dim, group.number, allow_inversion)
+        if group.number is None:
+            return self.find_orientations(group, allow_inversion)
+        if key in self.orientations:
+            return self.orientations[key]
+        path = self.orientations_path(group, allow_inversion)
+        orientations = None
+        if path is not None and os.path.exists(path):
+            try:
+                with np.load(path) as data:
+                    orientations = self.orientations_from_arrays(group, data)
+            except (OSError, ValueError, KeyError):
+                orientations = None
+        if orientations is None:
+            orientations = self.find_orientations(group, allow_inversion)
+            arrays = self.orientations_to_arrays(orientations)
+            write_cache_file(path, lambda f: np.savez_compressed(f, **arrays))
+        return self.orientations.setdefault(key, orientations)
+
+    def find_orientations(self, group, allow_inversion=False):
+        """
+        Computes the valid orientations of the molecule in each Wyckoff
+        position of a group, without using the caches. Takes the same
+        arguments, and returns the same list, as get_orientations.
+        """
+        if self.pga is None:
+            self.pga = PointGroupAnalyzer(self.mol)
+        orientations = []
+        for x in group.wyckoffs_organized:
+            orientations.append([])
+            for wp in x:
+                allowed = orientation_in_wyckoff_position(self.mol, wp, already_oriented=True, allow_inversion=allow_inversion, pga=self.pga, symm_m=self.symm_m)
+                if allowed is not False:
+                    orientations[-1].append(allowed)
+                else:
+                    orientations[-1].append([])
+        return orientations
+
+    def orientations_path(self, group, allow_inversion=False):
+        """
+        Returns the path of the file storing the molecule's orientations for a
+        group in the disk cache, or None if the disk cache is disabled.
+        """
+        name = "{:d}d_{:d}_{:d}.npz".format(group.dim, group.number, bool(allow_inversion))
+        return cache_path("orientations", self.fingerprint, name)
+
+    def orientations_to_arrays(self, orientations):
+        """
+        Converts a list of orientations, as returned by get_orientations, into
+        a dictionary of numpy arrays which can be stored with numpy.savez.
+        Rotation axes are found as eigenvectors, and may have a (zero)
+        imaginary part, which is dropped.
+        """
+        flat = [o for x in orientations for y in x for o in y]
+        return {"version": np.array([symmetry_db_version, orientations_version]),
+                "counts": np.array([len(y) for x in orientations for y in x], dtype=int),
+                "matrices": np.real(np.array([o.matrix for o in flat])).reshape((-1,3,3)),
+                "degrees": np.array([o.degrees for o in flat], dtype=int),
+                "axes": np.real(np.array([o.axis if o.axis is not None else np.zeros(3) for o in flat])).reshape((-1,3))}
+
+    def orientations_from_arrays(self, group, data):
+        """
+        Rebuilds a list of orientations for a group from the arrays created by
+        orientations_to_arrays. Raises a ValueError if the arrays are from
+        another version, or do not match the group.
+        """
+        if list(data["version"]) != [symmetry_db_version, orientations_version]:
+            raise ValueError("Stored orientations are from another version")
+        counts = data["counts"]
+        if len(counts) != sum(len(x) for x in group.wyckoffs_organized):
+            raise ValueError("Stored orientations do not match the group")
+        matrices, degrees, axes = data["matrices"], data["degrees"], data["axes"]
+        orientations = []
+        i = j = 0
+        for x in group.wyckoffs_organized:
+            orientations.append([])
+            for wp in x:
+                orientations[-1].append([Orientation(matrices[k], degrees=int(degrees[k]), axis=axes[k] if degrees[k] == 1 else None) for k in range(j, j+counts[i])])
+                j += counts[i]
+                i += 1
+        return orientations
+
+    def to_dict(self):
+        """
+        Returns a JSON-serializable dictionary of the molecule's analysis,
+        without the orientations.
+        """
+        b = self.box
+        return {"version": prepared_molecule_version,
+                "species": [site.species_string for site in self.mol],
+                "coords": self.mol.cart_coords.tolist(),
+                "box": [b.minx, b.maxx, b.miny, b.maxy, b.minz, b.maxz],
+                "radius": self.radius,
+                "symm_m": [op.affine_matrix.tolist() for op in self.symm_m],
+                "ellipsoid": self.ellipsoid.affine_matrix.tolist()}
+
+def prepare_molecule(mol):
+    """
+    Returns the Prepared_molecule for a molecule. Results are memoized in
+    memory by molecule_fingerprint, and on disk (see symmetry.cache_dir),
+    so each molecule is only analyzed once per run, or once per cache. Stored
+    files from another prepared_molecule_version are recomputed.
+
+    Args:
+        mol: a pymatgen Molecule object
+
+    Returns:
+        a Prepared_molecule object
+    """
+    key = molecule_fingerprint(mol)
+    with prepared_molecules_lock:
+        if key in prepared_molecules:
+            return prepared_molecules[key]
+    path = cache_path("molecules", key + ".json")
+    prepared = None
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") == prepared_molecule_version:
+                prepared = Prepared_molecule(data=data)
+        except (OSError, ValueError, KeyError, AttributeError):
+            prepared = None
+    if prepared is None:
+        prepared = Prepared_molecule(mol)
+        data = json.dumps(prepared.to_dict()).encode()
+        write_cache_file(path, lambda f: f.write(data))
+    with prepared_molecules_lock:
+        return prepared_molecules.setdefault(key, prepared)
+
+def prewarm_worker(task):
+    """
+    Stores the orientations of a molecule in one group in the disk cache.
+    Used by prewarm_orientations.
+
+    Args:
+        task: a tuple (mol, number, dim, allow_inversion)
+
+    Returns:
+        the group number
+    """
+    mol, number, dim, allow_inversion = task
+    prepare_molecule(mol).get_orientations(get_group(number, dim=dim), allow_inversion)
+    return number
+
+def prewarm_orientations(molecules, dim=3, allow_inversion=False, workers=1):
+    """
+    Computes the valid orientations of each molecule in every space group
+    (or layer group for dim=2, Rod group for dim=1), and stores them in the
+    disk cache, so that later runs do not need to compute them. Since cache
+    files are written atomically, several processes may fill the cache at
+    once.
+
+    Args:
+        molecules: a list of pymatgen Molecule objects or molecule names
+            from the collection
+        dim: the periodic dimension of the groups
+        allow_inversion: whether or not to allow chiral molecules to be
+            inverted
+        workers: the number of processes to use. If 1 (the default), the
+            orientations are computed in the current process. If None, one
+            process is used per CPU
+
+    Returns:
+        the number of (molecule, group) pairs computed
+    """
+    if cache_path() is None:
+        print("Warning: the disk cache is disabled, so orientations will not be stored.")
+    molecules = [molecule_collection[mol] if type(mol) == str else mol for mol in molecules]
+    numbers = {3: 230, 2: 80, 1: 75}[dim]
+    tasks = [(mol, n, dim, allow_inversion) for mol in molecules for n in range(1, numbers+1)]
+    if workers == 1:
+        for task in tasks:
+            prewarm_worker(task)
+    else:
+        pool = Pool(workers)
+        try:
+            for number in pool.imap_unordered(prewarm_worker, tasks):
+                pass
+        finally:
+            pool.terminate()
+    return len(tasks)
+
 def check_distance_molecular(coord1, coord2, indices1, index2, lattice, radii, d_factor=1.0, PBC=[1,1,1]):
     """
     Check the distances between two set of molecules. The first set is generally
@@ -353,7 +794,7 @@ def check_wyckoff_position_molecular(points, group, orientations, tol=1e-3):
         #Check site symmetry of points
         for p in points:
             #Calculate distance between original and generated points
-            ps = np.array([op.operate(p) for op in w_symm_all[i][0]])
+            ps = apply_ops(p, w_symm_all[i][0])
             #ds = distance_matrix([p], ps, Euclidean_lattice, PBC=PBC, metric='sqeuclidean')
             ds = distance_matrix_euclidean([p], ps, PBC=PBC)
             #Check whether any generated points are too far away
@@ -370,7 +811,7 @@ def check_wyckoff_position_molecular(points, group, orientations, tol=1e-3):
             xyz = filtered_coords_euclidean(wp[0].operate(p) - p, PBC=PBC)
             if dsquared(xyz) > t: continue
             #Calculate distances between original and generated points
-            pw = np.array([op.operate(p) for op in wp])
+            pw = operate_many(p, group.rotations[i], group.translations[i])
             #dw = distance_matrix(points, pw, Euclidean_lattice, PBC=PBC, metric='sqeuclidean')
             dw = distance_matrix_euclidean(points, pw, PBC=PBC)
             
@@ -446,7 +887,7 @@ def merge_coordinate_molecular(coor, lattice, group, tol, orientations):
                 index, point = check_wyckoff_position_molecular(coor, group, orientations)
             return coor, index, point
 
-def choose_wyckoff_molecular(group, number, orientations):
+def choose_wyckoff_molecular(group, number, orientations, rng=None):
     """
     Choose a Wyckoff position to fill based on the current number of molecules
     needed to be placed within a unit cell
@@ -462,14 +903,16 @@ def choose_wyckoff_molecular(group, number, orientations):
         number: the number of molecules still needed in the unit cell
         orientations: the valid orientations for a given molecule. Obtained
             from get_sg_orientations, which is called within molecular_crystal
+        rng: an optional numpy.random.Generator to draw from
 
     Returns:
         a single index for the Wyckoff position. If no position is found,
         returns False
     """
+    rng = get_rng(rng)
     wyckoffs = group.wyckoffs_organized
     
-    if np.random.random()>0.5: #choose from high to low
+    if rng.random()>0.5: #choose from high to low
         for j, wyckoff in enumerate(wyckoffs):
             if len(wyckoff[0]) <= number:
                 good_wyckoff = []
@@ -477,7 +920,7 @@ def choose_wyckoff_molecular(group, number, orientations):
                     if orientations[j][k] != []:
                         good_wyckoff.append(w)
                 if len(good_wyckoff) > 0:
-                    return choose(good_wyckoff)
+                    return good_wyckoff[rng.integers(len(good_wyckoff))]
         return False
     else:
         good_wyckoff = []
@@ -487,7 +930,7 @@ def choose_wyckoff_molecular(group, number, orientations):
                     if orientations[j][k] != []:
                         good_wyckoff.append(w)
         if len(good_wyckoff) > 0:
-            return choose(good_wyckoff)
+            return good_wyckoff[rng.integers(len(good_wyckoff))]
         else:
             return False
 
@@ -504,12 +947,19 @@ class mol_site():
         orientation: an Orientation object for the generating molecule
         wyckoff_position: a Wyckoff_position object
         lattice: a Lattice object for the crystal
-        ellipsoid: an optional binding Ellipsoid object for checking distances.
+        ellipsoid: an optional bounding ellipsoid (a SymmOp from
+            find_ellipsoid) for the molecule. Computed when needed if not given
         tm: a Tol_matrix object for distance checking
     """
     def __init__(self, mol, position, orientation, wyckoff_position, lattice, ellipsoid=None, tm=Tol_matrix(prototype="molecular")):
         self.mol = mol
         """A Pymatgen molecule object"""
+        self.mol_coords = np.array(mol.cart_coords)
+        """An (n,3) array of the molecule's Cartesian coordinates"""
+        self.numbers = Tol_matrix.numbers_from_species(mol.species)
+        """An array of the molecule's atomic numbers"""
+        self.symbols = [specie.name for specie in mol.species]
+        """A list of the molecule's atomic symbols"""
         self.position = position
         """Relative coordinates of the molecule's center within the unit cell"""
         self.orientation = orientation
@@ -538,14 +988,8 @@ class mol_site():
         """
         Returns: a 2D matrix which is used internally for distance checking.
         """
-        species = self.mol.species * self.multiplicity
         #Create tolerance matrix from subset of tm
-        tm = self.tol_matrix
-        tols = np.zeros((len(species),len(species)))
-        for i1, specie1 in enumerate(species):
-            for i2, specie2 in enumerate(species):
-                tols[i1][i2] = tm.get_tol(specie1, specie2)
-        return tols
+        return self.tol_matrix.get_tols(np.tile(self.numbers, self.multiplicity))
 
     def get_ellipsoid(self):
         """
@@ -555,12 +999,12 @@ class mol_site():
         Returns:
             a re-orientated SymmOp representing the molecule's bounding ellipsoid
         """
-        if self.ellipsoid == None:
+        if self.ellipsoid is None:
             self.ellipsoid = find_ellipsoid(self.mol)
         e = self.ellipsoid
         #Appy orientation
-        m = np.dot(e.rotation_matrix, self.orientation.get_matrix(angle=0))
-        return SymmOp.from_rotation_and_translation(m, e.translation_vector)
+        m = self.orientation.get_matrix(angle=0)
+        return SymmOp.from_rotation_and_translation(np.dot(m, e.rotation_matrix), np.dot(m, e.translation_vector))
 
     def get_ellipsoids(self):
         """
@@ -570,67 +1014,73 @@ class mol_site():
         Returns:
             an array of re-orientated SymmOp's representing the molecule's bounding ellipsoids
         """
-        #Get molecular centers
-        centers0 = apply_ops(self.position, self.wp.generators)
-        centers1 = np.dot(centers0, self.lattice)
-        #Rotate ellipsoids
-        e1 = self.get_ellipsoid()
-        es = np.dot(self.wp.generators_m, e1)
-        #Add centers to ellipsoids
-        center_ops = [SymmOp.from_rotation_and_translation(Euclidean_lattice, c) for c in centers1]
-        es_final = []
-        for e, c in zip(es, center_ops):
-            es_final.append(e*c)
-        return np.array(es_final)
-
-    def _get_coords_and_species(self, absolute=False):
+        axes, centers = self.get_ellipsoid_arrays()
+        return np.array([SymmOp.from_rotation_and_translation(a, c) for a, c in zip(axes, centers)])
+
+    def get_ellipsoid_arrays(self, padding=0.0):
         """
-        Used to generate coords and species for get_coords_and_species
+        Returns the bounding ellipsoids for the molecules in the WP as arrays,
+        in absolute coordinates.
 
         Args:
-            absolute: whether or not to return absolute (Euclidean)
-                coordinates. If false, return relative coordinates instead
-        
+            padding: a distance (in Angstroms) added to each semi-axis
+
+        Returns:
+            axes, centers: an (m,3,3) array whose columns are the semi-axes of
+                each ellipsoid, and an (m,3) array of their centers
+        """
+        if self.ellipsoid is None:
+            self.ellipsoid = find_ellipsoid(self.mol)
+        axes = self.ellipsoid.rotation_matrix
+        if padding:
+            lengths = np.linalg.norm(axes, axis=0)
+            axes = axes * ((lengths + padding) / lengths)
+        rotations, centers = self._get_orbit()
+        centers = centers + np.dot(rotations, self.ellipsoid.translation_vector)
+        return np.einsum('kij,jl->kil', rotations, axes), centers
+
+    def _get_orbit(self):
+        """
+        Returns the rotations (the orientation, followed by each Euclidean
+        Wyckoff generator) and the absolute centers of the molecules in the
+        Wyckoff position.
+
+        Returns:
+            rotations, centers: an (m,3,3) array and an (m,3) array
+        """
+        #Orient the molecule, then rotate it by each generator (Euclidean metric)
+        rotations = np.einsum('kij,jl->kil', self.wp.generator_rotations_m, self.orientation.get_matrix(angle=0))
+        #Obtain the centers in absolute coords
+        centers = np.dot(self.wp.operate_many(self.position, generators=True), self.lattice)
+        centers += self.wp.generator_translations_m
+        return rotations, centers
+
+    def _get_coords_and_species(self):
+        """
+        Used to generate coords and species for get_coords_and_species. The
+        atoms of every molecule in the Wyckoff position are placed at once:
+        each molecule is the oriented molecule, rotated by a Euclidean Wyckoff
+        generator and moved to its center.
+
         Returns:
-            atomic coords: a numpy array of fractional coordinates for the atoms in the site
+            absolute coords: a numpy array of Euclidean coordinates for the atoms in the site
+            relative coords: a numpy array of fractional coordinates for the atoms in the site
             species: a list of atomic species for the atomic coords
         """
-        mo = deepcopy(self.mol)
-        mo.apply_operation(self.orientation.get_op(angle=0))
-        wp_atomic_sites = []
-        wp_atomic_coords = []
-        for point_index, op2 in enumerate(self.wp.generators):
-            current_atomic_sites = []
-            current_atomic_coords = []
-
-            #Rotate the molecule (Euclidean metric)
-            op2_m = self.wp.generators_m[point_index]
-            mo2 = deepcopy(mo)
-            mo2.apply_operation(op2_m)
-            #Obtain the center in absolute coords
-            center_relative = op2.operate(self.position)
-            center_absolute = np.dot(center_relative, self.lattice)
-            #Add absolute center to molecule
-            mo2.apply_operation(SymmOp.from_rotation_and_translation(np.identity(3),center_absolute))
-
-            for site in mo2:
-                #Place molecular coordinates in relative coordinates
-                relative_coords = np.dot(site.coords, np.linalg.inv(self.lattice))
-                #Do not filter: interferes with periodic image check
-                #relative_coords = filtered_coords(relative_coords, PBC=self.PBC)
-                current_atomic_sites.append(site.specie.name)
-                current_atomic_coords.append(relative_coords)
-            for s in current_atomic_sites:
-                wp_atomic_sites.append(s)
-            for c in current_atomic_coords:
-                wp_atomic_coords.append(c)
-        return np.array(wp_atomic_coords), wp_atomic_sites
+        rotations, centers = self._get_orbit()
+        absolute_coords = np.einsum('kij,nj->kni', rotations, self.mol_coords) + centers[:,None,:]
+        absolute_coords = absolute_coords.reshape((-1,3))
+        #Place molecular coordinates in relative coordinates
+        #Do not filter: interferes with periodic image check
+        relative_coords = np.dot(absolute_coords, np.linalg.inv(self.lattice))
+        return absolute_coords, relative_coords, self.symbols * self.multiplicity
 
     def get_coords_and_species(self, absolute=False):
         """
         Lazily generates and returns the atomic coordinate and species for the
         Wyckoff position. Plugs the molecule into the provided orientation
-        (with angle=0), and calculates the new positions.
+        (with angle=0), and calculates the new positions. The result is
+        stored, so later calls are free.
 
         Args:
             absolute: whether or not to return absolute (Euclidean)
@@ -641,21 +1091,26 @@ class mol_site():
                 a list of atomic species names, for example
                 ['H', 'H', 'O', 'H', 'H', 'O']
         """
-        if absolute is True:
-            try:
-                return self.absolute_coords, self.species
-            except:
-                self.absolute_coords, self.species = self._get_coords_and_species(absolute=absolute)
-            return self.absolute_coords, self.species
-        elif absolute is False:
-            try:
-                return self.relative_coords, self.species
-            except:
-                self.relative_coords, self.species = self._get_coords_and_species(absolute=absolute)
-            return self.relative_coords, self.species
-        else:
+        if absolute is not True and absolute is not False:
             print("Error: parameter absolute must be True or False")
             return
+        try:
+            self.relative_coords
+        except AttributeError:
+            self.absolute_coords, self.relative_coords, self.species = self._get_coords_and_species()
+        if absolute is True:
+            return self.absolute_coords, self.species
+        return self.relative_coords, self.species
+
+    def get_labels(self):
+        """
+        Returns the number of the molecule which each atom of
+        get_coords_and_species belongs to.
+
+        Returns:
+            a numpy array of integers from 0 to multiplicity-1
+        """
+        return np.repeat(np.arange(self.multiplicity), len(self.numbers))
 
     def get_centers(self):
         """
@@ -665,7 +1120,7 @@ class mol_site():
         Returns:
             A numpy array of fractional 3-vectors
         """
-        centers0 = apply_ops(self.position, self.wp.generators)
+        centers0 = self.wp.operate_many(self.position, generators=True)
         centers1 = filtered_coords(centers0, self.PBC)
         return np.array(centers1)
 
@@ -685,18 +1140,21 @@ class mol_site():
             True if the atoms are not too close together, False otherwise
         """
         if atomic is True:
+            tols = self.tols_matrix
+            #Molecules whose ellipsoids, padded by half the largest tolerance,
+            #are apart cannot have atoms which are too close
+            axes, centers = self.get_ellipsoid_arrays(padding=0.5*max(factor, 1.0)*tols.max())
+            if check_ellipsoids(axes, centers, axes[:1], centers[:1], self.lattice, PBC=self.PBC, same=True):
+                return True
             #TODO: Use tm instead of tols lists
             #Check inter-atomic distances
-            coords, species = self._get_coords_and_species()
-            #Store the coords and species for a single molecule
-            d = distance_matrix(coords, coords, self.lattice, PBC=self.PBC)
-
-            tols = self.tols_matrix
+            coords, species = self.get_coords_and_species()
 
             #Find pairs which are closer than the tolerance
-            x = np.where(d<tols)
-            list1 = x[0]
-            list2 = x[1]
+            i, j, d = find_pairs(coords, coords, self.lattice, tols.max(), PBC=self.PBC)
+            close = d < tols[i, j]
+            list1 = i[close]
+            list2 = j[close]
             m_length = len(self.mol)
             #Check intermolecular distances, ignore intramolecular
             for i, j in zip(list1, list2):
@@ -714,21 +1172,10 @@ class mol_site():
             return True
 
         elif atomic is False:
-            #Check molecular ellipsoid overlap
-            if self.multiplicity == 1:
-                return True
-            es0 = self.get_ellipsoids()[1:]
-            PBC_vectors = np.dot(create_matrix(PBC=self.PBC), self.lattice)
-            PBC_ops = [SymmOp.from_rotation_and_translation(Euclidean_lattice, v) for v in PBC_vectors]
-            es1 = []
-            for op in PBC_ops:
-                es1.append(np.dot(es0, op))
-            es1 = np.squeeze(es1)
-            truth_values = np.vectorize(check_intersection)(es1, self.get_ellipsoid())
-            if np.sum(truth_values) < len(truth_values):
-                return False
-            else:
-                return True
+            #Check molecular ellipsoid overlap. By symmetry, it is enough to
+            #check the first molecule against the others and all images
+            axes, centers = self.get_ellipsoid_arrays()
+            return check_ellipsoids(axes, centers, axes[:1], centers[:1], self.lattice, PBC=self.PBC, same=True)
 
 class molecular_crystal():
     """
@@ -765,12 +1212,18 @@ class molecular_crystal():
             when molecule values are strings
         lattice: an optional Lattice object to use for the unit cell
         tm: the Tol_matrix object used to generate the crystal
+        generate: whether or not to generate a crystal during initialization.
+            If False, only the setup is done; see crystal.Generator
+        observer: an optional crystal.Observer object, which is notified as
+            the crystal is generated
     """
 
-    def init_common(self, molecules, numMols, volume_factor, allow_inversion, orientations, check_atomic_distances, group, lattice, tm):
+    def init_common(self, molecules, numMols, volume_factor, allow_inversion, orientations, check_atomic_distances, group, lattice, tm, generate=True, observer=None):
         """
         init functionality which is shared by 3D, 2D, and 1D crystals
         """
+        self.observer = observer
+        """The Observer notified during generation, or None"""
         self.numattempts = 0
         """The number of attempts needed to generate the crystal."""
         if type(group) == Group:
@@ -778,7 +1231,7 @@ class molecular_crystal():
             """A pyxtal.symmetry.Group object storing information about the space/layer
             /Rod/point group, and its Wyckoff positions."""
         else:
-            self.group = Group(group, dim=self.dim)
+            self.group = get_group(group, dim=self.dim)
         self.number = self.group.number
         """The international group number of the crystal:
         1-230 for 3D space groups
@@ -796,7 +1249,6 @@ class molecular_crystal():
         """The number of each type of molecule in the PRIMITIVE cell"""
         self.numMols = self.numMols0 * cellsize(self.group)
         """The number of each type of molecule in the CONVENTIONAL cell"""
-        oriented_molecules = []
         #Allow support for generating molecules from text via openbable
         for i, mol in enumerate(molecules):
             if type(mol) == str:
@@ -812,33 +1264,23 @@ class molecular_crystal():
                 if mo is not None:
                     molecules[i] = mo
                 else:
-                    print("Error: Could not create molecules from given parameters.")
-                    print("Supported string values include: C60, H2O, CH4, NH3, benzene, naphthalene, anthracene, tetracene, pentacene, coumarin, resorcinol, benzamide, aspirin, ddt, lindane, glycine, glucose, or ROY")
-                    print("Alternatively, you can input the filename of a molecule file (xyz, gaussian, or json).")
-                    print('Finally, you can input a string representing the molecule (add the option fmt = “xyz”, “gjf”, “g03”, or “json”)')
-                    print("Installing the OpenBabel Python bindings allows more file formats.")
-        for mol in molecules:
-            pga = PointGroupAnalyzer(mol)
-            mo = pga.symmetrize_molecule()['sym_mol']
-            oriented_molecules.append(mo)
-        self.molecules = oriented_molecules
+                    self.message("Error: Could not create molecules from given parameters.")
+                    self.message("Supported string values include: C60, H2O, CH4, NH3, benzene, naphthalene, anthracene, tetracene, pentacene, coumarin, resorcinol, benzamide, aspirin, ddt, lindane, glycine, glucose, or ROY")
+                    self.message("Alternatively, you can input the filename of a molecule file (xyz, gaussian, or json).")
+                    self.message('Finally, you can input a string representing the molecule (add the option fmt = “xyz”, “gjf”, “g03”, or “json”)')
+                    self.message("Installing the OpenBabel Python bindings allows more file formats.")
+        self.prepared = [prepare_molecule(mol) for mol in molecules]
+        """A list of Prepared_molecule objects for each molecule type, shared
+        between crystals with the same molecules."""
+        self.molecules = [p.mol for p in self.prepared]
         """A list of pymatgen.core.structure.Molecule objects, symmetrized and
         oriented along their symmetry axes."""
-        self.boxes = []
+        self.boxes = [p.box for p in self.prepared]
         """A list of bounding boxes for each molecule. Used for estimating
         volume of the unit cell."""
-        self.radii = []
+        self.radii = [p.radius for p in self.prepared]
         """A list of approximated radii for each molecule type. Used for
         checking inter-molecular distances."""
-        #Calculate boxes and radii for each molecule
-        for mol in self.molecules:
-            self.boxes.append(get_box(reoriented_molecule(mol)[0]))
-            max_r = 0
-            for site in mol:
-                radius = math.sqrt( site.x**2 + site.y**2 + site.z**2 )
-                if radius > max_r: max_r = radius
-            self.radii.append(max_r+1.0)
-        """The volume of the generated unit cell"""
         self.check_atomic_distances = check_atomic_distances
         """Whether or not inter-atomic distances are checked at each step."""
         self.allow_inversion = allow_inversion
@@ -899,23 +1341,33 @@ class molecular_crystal():
             try:
                 self.tol_matrix = Tol_matrix(prototype=tm)
             except:
-                print("Error: tm must either be a Tol_matrix object or a prototype string for initializing one.")
+                self.message("Error: tm must either be a Tol_matrix object or a prototype string for initializing one.")
                 self.valid = False
                 self.struct = None
                 return
-        self.generate_crystal()
-
-    def __init__(self, group, molecules, numMols, volume_factor, allow_inversion=False, orientations=None, check_atomic_distances=True, fmt="xyz", lattice=None, tm=Tol_matrix(prototype="molecular")):
+        allowed = [[o != [] for x in ori for o in x] for ori in self.valid_orientations]
+        self.combinations = get_wyckoff_combinations(self.group, self.numMols, allowed)
+        """The Wyckoff_combinations object for placing numMols into the WP's
+        with valid orientations. Shared between crystals with the same group,
+        stoichiometry and valid orientations."""
+        self.degrees = self.check_compatible()
+        """The result of check_compatible: True if the Wyckoff positions have
+        degrees of freedom, 0 if not, and False if the stoichiometry is
+        incompatible with the group."""
+        if generate:
+            self.generate_crystal()
+
+    def __init__(self, group, molecules, numMols, volume_factor, allow_inversion=False, orientations=None, check_atomic_distances=True, fmt="xyz", lattice=None, tm=Tol_matrix(prototype="molecular"), generate=True, observer=None):
         self.dim = 3
         """The number of periodic dimensions of the crystal"""
         #Necessary input
         self.PBC = [1,1,1]
         """The periodic axes of the crystal"""
         if type(group) != Group:
-            group = Group(group, self.dim)
+            group = get_group(group, self.dim)
         self.sg = group.number
         """The international spacegroup number of the crystal."""
-        self.init_common(molecules, numMols, volume_factor, allow_inversion, orientations, check_atomic_distances, group, lattice, tm)
+        self.init_common(molecules, numMols, volume_factor, allow_inversion, orientations, check_atomic_distances, group, lattice, tm, generate, observer)
 
     def Msgs(self):
         self.Msg1 = 'Error: the stoichiometry is incompatible with the wyckoff sites choice'
@@ -925,6 +1377,15 @@ class molecular_crystal():
         self.Msg5 = 'Finishing: added the specie'
         self.Msg6 = 'Finishing: added the whole structure'
 
+    def message(self, text):
+        """
+        Passes a message to the observer, or prints it if there is none.
+        """
+        if self.observer is not None:
+            self.observer.on_message(text)
+        else:
+            print(text)
+
     def get_orientations(self):
         """
         Calculates the valid orientations for each Molecule and Wyckoff
@@ -941,71 +1402,41 @@ class molecular_crystal():
         For example, self.valid_orientations[i][j][k] would be a list of valid
         orientations for self.molecules[i], in the Wyckoff position
         self.group.wyckoffs_organized[j][k]
+
+        The orientations are computed once per molecule and group, and shared
+        through each molecule's Prepared_molecule.
         """
-        self.valid_orientations = []
-        for mol in self.molecules:
-            self.valid_orientations.append([])
-            wp_index = -1
-            for i, x in enumerate(self.group.wyckoffs_organized):
-                self.valid_orientations[-1].append([])
-                for j, wp in enumerate(x):
-                    wp_index += 1
-                    allowed = orientation_in_wyckoff_position(mol, wp, already_oriented=True, allow_inversion=self.allow_inversion)
-                    if allowed is not False:
-                        self.valid_orientations[-1][-1].append(allowed)
-                    else:
-                        self.valid_orientations[-1][-1].append([])
+        self.valid_orientations = [p.get_orientations(self.group, self.allow_inversion) for p in self.prepared]
 
     def check_compatible(self):
         """
         Checks if the number of molecules is compatible with the Wyckoff
-        positions. Considers the number of degrees of freedom for each Wyckoff
-        position, and makes sure at least one valid combination of WP's exists.
+        positions. Counts the valid combinations of WP's with valid
+        orientations (see symmetry.Wyckoff_combinations), and checks whether
+        any of them have degrees of freedom, either in the position or in the
+        molecule's orientation.
+
+        Returns:
+            True if a valid combination with degrees of freedom exists, 0 if
+            all valid combinations have no degrees of freedom, and False if
+            there is no valid combination
         """
-        N_site = [len(x[0]) for x in self.group.wyckoffs_organized]
-        has_freedom = False
-        #remove WP's with no freedom once they are filled
-        removed_wyckoffs = []
-        for i, numMol in enumerate(self.numMols):
-            #Check that the number of molecules is a multiple of the smallest Wyckoff position
-            if numMol % N_site[-1] > 0:
-                return False
-            else:
-                #Check if smallest WP has at least one degree of freedom
-                op = self.group.wyckoffs_organized[-1][-1][0]
-                if op.rotation_matrix.all() != 0.0:
-                    if self.valid_orientations[i][-1][-1] != []:
-                        has_freedom = True
-                else:
-                    #Subtract from the number of ions beginning with the smallest Wyckoff positions
-                    remaining = numMol
-                    for j, x in enumerate(self.group.wyckoffs_organized):
-                        for k, wp in enumerate(x):
-                            while remaining >= len(wp) and wp not in removed_wyckoffs:
-                                if self.valid_orientations[i][j][k] != []:
-                                    #Check if WP has at least one degree of freedom
-                                    op = wp[0]
-                                    remaining -= len(wp)
-                                    if np.allclose(op.rotation_matrix, np.zeros([3,3])):
-                                        if (len(self.valid_orientations[i][j][k]) > 1 or
-                                            self.valid_orientations[i][j][k][0].degrees > 0):
-                                            #NOTE: degrees of freedom may be inaccurate for linear molecules
-                                            has_freedom = True
-                                        else:
-                                            removed_wyckoffs.append(wp)
-                                    else:
-                                        has_freedom = True
-                                else:
-                                    removed_wyckoffs.append(wp)
-                    if remaining != 0:
-                        return False
-        if has_freedom:
+        if self.combinations.count == 0:
+            return False
+        elif self.combinations.count > self.combinations.count_fixed:
             return True
-        else:
-            #Wyckoff Positions have no degrees of freedom
-            return 0
-
-        return True
+        elif self.combinations.combinations is None:
+            return True
+        for combination in self.combinations.combinations:
+            for i, indices in enumerate(combination):
+                for index in indices:
+                    j, k = jk_from_i(index, self.group.wyckoffs_organized)
+                    orientations = self.valid_orientations[i][j][k]
+                    #NOTE: degrees of freedom may be inaccurate for linear molecules
+                    if len(orientations) > 1 or orientations[0].degrees > 0:
+                        return True
+        #Wyckoff Positions have no degrees of freedom
+        return 0
 
     def to_file(self, fmt=None, filename=None):
         """
@@ -1051,6 +1482,29 @@ class molecular_crystal():
         elif self.valid:
             print("Cannot create file: structure did not generate.")
 
+    @property
+    def struct(self):
+        """
+        A pymatgen.core.structure.Structure object for the final generated
+        crystal. Built from lattice_matrix, sites and coordinates the first
+        time it is used. If generation failed, an error message or None.
+        """
+        if "_struct" not in self.__dict__:
+            self._struct = Structure(self.lattice_matrix, self.sites, self.coordinates)
+        return self._struct
+
+    @struct.setter
+    def struct(self, value):
+        self._struct = value
+
+    @property
+    def spg_struct(self):
+        """
+        A tuple (lattice_matrix, coordinates, numbers) describing the
+        generated crystal, which may be used by spglib for symmetry analysis.
+        """
+        return (self.lattice_matrix, self.coordinates, self.numbers)
+
     def print_all(self):
         print("--Molecular Crystal--")
         print("Dimension: "+str(self.dim))
@@ -1063,7 +1517,7 @@ class molecular_crystal():
             print("Pymatgen Structure:")
             print(self.struct)
 
-    def generate_crystal(self, max1=max1, max2=max2, max3=max3, max4=max4):
+    def generate_crystal(self, max1=max1, max2=max2, max3=max3, max4=max4, rng=None, merge=True):
         """
         The main code to generate a random molecular crystal. If successful,
         stores a pymatgen.core.structure object in self.struct and sets
@@ -1075,58 +1529,80 @@ class molecular_crystal():
             max2: the number of attempts for a given lattice
             max3: the number of attempts for a given Wyckoff position
             max4: the number of attempts for changing the molecular orientation
+            rng: an optional numpy.random.Generator to draw from
+            merge: if True, molecules which are too close are merged into
+                special Wyckoff positions (see merge_coordinate_molecular).
+                If False, points are placed directly into the chosen Wyckoff
+                position (see crystal.sample_wyckoff), and rejected if they
+                are too close
         """
+        rng = get_rng(rng)
+        self.stats = Generation_stats()
+        """A Generation_stats object recording the time and attempts spent
+        in the last call to generate_crystal."""
+        stats = self.stats
+        stats.structures = 1
+        observer = self.observer
         #Check the minimum number of degrees of freedom within the Wyckoff positions
-        degrees = self.check_compatible()
+        degrees = self.degrees
         if degrees is False:
-            print(self.Msg1)
+            self.message(self.Msg1)
             self.struct = None
             self.valid = False
+            if observer is not None:
+                observer.on_finish(self)
             return
         else:
             if degrees == 0:
-                max1 = 10
-                max2 = 10
-                max3 = 10
-                max4 = 5
+                max1 = min(max1, 10)
+                max2 = min(max2, 10)
+                max3 = min(max3, 10)
+                max4 = min(max4, 5)
             #Calculate a minimum vector length for generating a lattice
             #minvector = max(radius*2 for radius in self.radii)
             all_lengths = []
             for box in self.boxes:
                 all_lengths.append(box.minl)
             minvector = max(all_lengths)
+            #The largest tolerance between any two atomic species
+            all_species = list(set(specie for mol in self.molecules for specie in mol.species))
+            cutoff = self.tol_matrix.get_tols(all_species).max()
             for cycle1 in range(max1):
+                stats.attempt("cycle1")
+                t = time()
                 #1, Generate a lattice
-                self.lattice.reset_matrix()
+                self.lattice.reset_matrix(rng=rng)
                 cell_matrix = self.lattice.matrix
                 cell_para = self.lattice.get_para()
-
-                if cell_para is None:
-                    break
+                t = stats.add_time("lattice", t)
+
+                if cell_matrix is None:
+                    self.message("Error: Could not generate lattice matrix.")
+                    stats.reject("lattice")
+                    if observer is not None:
+                        observer.on_reject("lattice", None)
+                    continue
                 else:
                     cell_matrix = para2matrix(cell_para)
                     if abs(self.volume - np.linalg.det(cell_matrix)) > 1.0: 
-                        print('Error, volume is not equal to the estimated value: ', self.volume, ' -> ', np.linalg.det(cell_matrix))
-                        print('cell_para:  ', cell_para)
-                        sys.exit(0)
-
-                    molecular_coordinates_total = [] #to store the added molecular coordinates
-                    molecular_sites_total = []      #to store the corresponding molecular specie
-                    coordinates_total = [] #to store the added atomic coordinates
-                    species_total = []      #to store the corresponding atomic specie
-                    wps_total = []      #to store corresponding Wyckoff position indices
-                    points_total = []   #to store the generating x,y,z points
-                    mol_generators_total = []
+                        self.message('Error, volume is not equal to the estimated value: '+str(self.volume)+' -> '+str(np.linalg.det(cell_matrix)))
+                        stats.reject("lattice")
+                        if observer is not None:
+                            observer.on_reject("lattice", cell_matrix)
+                        continue
+                    if observer is not None:
+                        observer.on_lattice(cell_matrix)
+
+                    #to store the added atomic coordinates, atomic species and mol_sites
+                    space = Occupied_space(cell_matrix, cutoff, PBC=self.PBC, tm=self.tol_matrix)
                     good_structure = False
 
                     for cycle2 in range(max2):
-                        molecular_coordinates_tmp = deepcopy(molecular_coordinates_total)
-                        molecular_sites_tmp = deepcopy(molecular_sites_total)
-                        coordinates_tmp = deepcopy(coordinates_total)
-                        species_tmp = deepcopy(species_total)
-                        wps_tmp = deepcopy(wps_total)
-                        points_tmp = deepcopy(points_total)
-                        mol_generators_tmp = []
+                        stats.attempt("cycle2")
+                        #Remove the sites of an unfinished molecule type
+                        removed = space.rollback()
+                        if observer is not None and removed:
+                            observer.on_rollback(removed)
                         
                         #Add molecules specie by specie
                         for numMol, mol in zip(self.numMols, self.molecules):
@@ -1136,77 +1612,121 @@ class molecular_crystal():
                             #Now we start to add the specie to the wyckoff position
                             for cycle3 in range(max3):
                                 self.numattempts += 1
+                                stats.attempt("cycle3")
+                                t = time()
                                 #Choose a random Wyckoff position for given multiplicity: 2a, 2b, 2c
                                 #NOTE: The molecular version return wyckoff indices, not ops
-                                wp = choose_wyckoff_molecular(self.group, numMol-numMol_added, self.valid_orientations[i])
-                                if wp is not False:
+                                wp = choose_wyckoff_molecular(self.group, numMol-numMol_added, self.valid_orientations[i], rng=rng)
+                                t = stats.add_time("wyckoff", t)
+                                if wp is False:
+                                    stats.reject("wyckoff")
+                                    if observer is not None:
+                                        observer.on_reject("wyckoff", None)
+                                else:
                                     #Generate a list of coords from the wyckoff position
-                                    point = self.lattice.generate_point()
-                                    coords = np.array([op.operate(point) for op in wp])
+                                    point = self.lattice.generate_point(rng=rng)
+                                    if observer is not None:
+                                        observer.on_trial(wp, point)
                                     #merge coordinates if the atoms are close
                                     if self.check_atomic_distances is False:
-                                        mtol = self.radii[i]*2
+                                        #Molecules closer than twice the smallest semi-axis of
+                                        #their ellipsoid overlap in any orientation
+                                        mtol = np.linalg.norm(self.prepared[i].ellipsoid.rotation_matrix, axis=0).min()*2
                                     elif self.check_atomic_distances is True:
                                         mtol = self.radii[i]*0.5
-                                    coords_toadd, good_merge, point = merge_coordinate_molecular(coords, cell_matrix, self.group, mtol, self.valid_orientations[i])
-                                    if good_merge is not False:
+                                    if merge:
+                                        coords = wp.operate_many(point)
+                                        coords_toadd, good_merge, point = merge_coordinate_molecular(coords, cell_matrix, self.group, mtol, self.valid_orientations[i])
+                                    else:
+                                        #Place the point directly into the chosen WP
+                                        coords_toadd, point = sample_wyckoff(wp, point, cell_matrix, mtol, PBC=self.PBC)
+                                        good_merge = wp.index if coords_toadd is not None else False
+                                    t = stats.add_time("merge", t)
+                                    if good_merge is False:
+                                        stats.reject("merge")
+                                        if observer is not None:
+                                            observer.on_reject("merge", wp)
+                                    else:
                                         wp_index = good_merge
                                         coords_toadd = filtered_coords(coords_toadd, PBC=self.PBC) #scale the coordinates to [0,1], very important!
+                                        #Skip sites after which the remaining molecules cannot be placed
+                                        remaining = [0]*i + [numMol-numMol_added-len(coords_toadd)] + list(self.numMols[i+1:])
+                                        used = [site.wp.index for site in space.sites] + [int(wp_index)]
+                                        if not self.combinations.completable(remaining, used):
+                                            stats.reject("wyckoff")
+                                            if observer is not None:
+                                                observer.on_reject("wyckoff", self.group[wp_index])
+                                            continue
 
                                         #Create a mol_site object
-                                        mo = deepcopy(self.molecules[i])
+                                        mo = self.molecules[i]
+                                        name = str(mo.formula).replace(" ","")
                                         j, k = jk_from_i(wp_index, self.group.wyckoffs_organized)
-                                        ori = choose(self.valid_orientations[i][j][k]).random_orientation()
-                                        ms0 = mol_site(mo, point, ori, self.group[wp_index], cell_matrix, tm=self.tol_matrix)
+                                        orientations = self.valid_orientations[i][j][k]
+                                        ori = orientations[rng.integers(len(orientations))].random_orientation(rng=rng)
+                                        ms0 = mol_site(mo, point, ori, self.group[wp_index], cell_matrix, ellipsoid=self.prepared[i].ellipsoid, tm=self.tol_matrix)
                                         #Check distances within the WP
                                         if ms0.check_distances(atomic=self.check_atomic_distances) is False: #continue
                                             #Check distance between centers
-                                            d = distance_matrix(ms0.get_centers(), ms0.get_centers(), ms0.lattice, PBC=ms0.PBC)
+                                            centers = ms0.get_centers()
                                             min_box_l = self.boxes[i].minl
-                                            xys = np.where(d < min_box_l)
-                                            passed_center = True
-                                            for i_y, x in enumerate(xys[0]):
-                                                y = xys[1][i_y]
-                                                val = d[x][y]
-                                                #Ignore self-distances
-                                                if x == y:
-                                                    continue
-                                                else:
-                                                    passed_center = False
-                                            if not passed_center: continue
+                                            xs, ys, ds = find_pairs(centers, centers, ms0.lattice, min_box_l, PBC=ms0.PBC)
+                                            #Ignore self-distances
+                                            passed_center = not ((xs != ys) & (ds < min_box_l)).any()
+                                            if not passed_center:
+                                                stats.add_time("orientation", t)
+                                                stats.reject("distance:"+name+"-"+name)
+                                                if observer is not None:
+                                                    observer.on_reject("distance:"+name+"-"+name, ms0)
+                                                continue
                                             #If centers are farther apart than min box length, allow multiple orientation attempts
                                             passed_ori = False
                                             for cycle4 in range(max4):
-                                                ori = choose(self.valid_orientations[i][j][k]).random_orientation()
-                                                ms0 = mol_site(mo, point, ori, self.group[wp_index], cell_matrix, tm=self.tol_matrix)
+                                                stats.attempt("cycle4")
+                                                ori = orientations[rng.integers(len(orientations))].random_orientation(rng=rng)
+                                                ms0 = mol_site(mo, point, ori, self.group[wp_index], cell_matrix, ellipsoid=self.prepared[i].ellipsoid, tm=self.tol_matrix)
                                                 if ms0.check_distances(atomic=self.check_atomic_distances):
                                                     passed_ori = True
                                                     break
                                         else:
                                             passed_ori = True
-                                        if passed_ori is False: continue
+                                        t = stats.add_time("orientation", t)
+                                        if passed_ori is False:
+                                            stats.reject("orientation")
+                                            if observer is not None:
+                                                observer.on_reject("orientation", ms0)
+                                            continue
                                         #Check distances with other WP's
                                         coords_toadd, species_toadd = ms0.get_coords_and_species()
-                                        passed = True
-                                        for ms1 in mol_generators_tmp:
-                                            if check_mol_sites(ms0, ms1, atomic=self.check_atomic_distances, tm=self.tol_matrix) is False:
-                                                passed = False
-                                                break
-                                        if passed is False: continue
+                                        #Label the atoms by molecule, counting the molecules already placed
+                                        labels_toadd = ms0.get_labels() + sum(ms1.multiplicity for ms1 in space.sites)
+                                        if self.check_atomic_distances is True:
+                                            passed = space.test(coords_toadd, species_toadd, labels=labels_toadd)
+                                            if passed is False:
+                                                violation = "-".join(str(x) for x in space.violation)
+                                        else:
+                                            index = find_overlapping_mol_site(ms0, space.sites)
+                                            passed = index is None
+                                            if passed is False:
+                                                violation = name+"-"+str(space.sites[index].mol.formula).replace(" ","")
+                                        stats.add_time("distance", t)
+                                        if passed is False:
+                                            stats.reject("distance:"+violation)
+                                            if observer is not None:
+                                                observer.on_reject("distance:"+violation, ms0)
+                                            continue
                                         elif passed is True:
                                             #Distance checks passed; store the new Wyckoff position
-                                            mol_generators_tmp.append(ms0)
-                                            if coordinates_tmp == []:
-                                                coordinates_tmp = coords_toadd
+                                            if self.check_atomic_distances is True:
+                                                space.commit(site=ms0)
                                             else:
-                                                coordinates_tmp = np.vstack([coordinates_tmp, coords_toadd])
-                                            species_tmp += species_toadd
+                                                space.commit(coords_toadd, species_toadd, site=ms0, labels=labels_toadd)
+                                            if observer is not None:
+                                                observer.on_accept(ms0)
                                             numMol_added += len(coords_toadd)/len(mo)
                                             if numMol_added == numMol:
                                                 #We have enough molecules of the current type
-                                                mol_generators_total = deepcopy(mol_generators_tmp)
-                                                coordinates_total = deepcopy(coordinates_tmp)
-                                                species_total = deepcopy(species_tmp)
+                                                space.checkpoint()
                                                 break
 
                             if numMol_added != numMol:
@@ -1217,11 +1737,12 @@ class molecular_crystal():
                             good_structure = True
                             break
                         else: #reset the coordinates and sites
-                            molecular_coordinates_total = []
-                            molecular_sites_total = []
-                            wps_total = []
+                            removed = space.rollback(0)
+                            if observer is not None and removed:
+                                observer.on_rollback(removed)
                     #placing molecules here
                     if good_structure:
+                        t = time()
                         final_lattice = cell_matrix 
                         final_coor = []
                         final_site = []
@@ -1229,10 +1750,11 @@ class molecular_crystal():
                         self.mol_generators = []
                         """A list of mol_site objects which can be used to regenerate the crystal."""
 
-                        final_coor = deepcopy(coordinates_total)
-                        final_site = deepcopy(species_total)
+                        coordinates_total, species_total = space.get_coords_and_species()
+                        final_coor = coordinates_total
+                        final_site = species_total
                         final_number = list(Element(ele).z for ele in species_total)
-                        self.mol_generators = deepcopy(mol_generators_total)
+                        self.mol_generators = space.get_sites()
                         """A list of mol_site objects which can be used
                         for generating the crystal."""
 
@@ -1242,6 +1764,9 @@ class molecular_crystal():
                         self.lattice = final_lattice
                         """A 3x3 matrix representing the lattice of the
                         unit cell."""  
+                        self.lattice_matrix = final_lattice
+                        """A 3x3 matrix representing the lattice of the
+                        unit cell."""
                         self.coordinates = final_coor
                         """The fractional coordinates for each molecule
                         in the final structure"""
@@ -1249,22 +1774,26 @@ class molecular_crystal():
                         """The indices within self.molecules corresponding
                         to the type of molecule for each site in
                         self.coordinates."""              
-                        self.struct = Structure(final_lattice, self.sites, self.coordinates)
-                        """A pymatgen.core.structure.Structure object for
-                        the final generated crystal."""
-                        self.spg_struct = (final_lattice, self.coordinates, final_number)
-                        """A list of information describing the generated
-                        crystal, which may be used by spglib for symmetry
-                        analysis."""
+                        self.numbers = np.array(final_number)
+                        """The atomic numbers for each site in
+                        self.coordinates"""
+                        #struct and spg_struct are built when first used
+                        self.__dict__.pop("_struct", None)
+                        stats.add_time("output", t)
+                        stats.valid = 1
                         self.valid = True
                         """Whether or not a valid crystal was generated."""
+                        if observer is not None:
+                            observer.on_finish(self)
                         return
                         #else: print("Failed final distance check.")
-        print("Couldn't generate crystal after max attempts.")
+        self.message("Couldn't generate crystal after max attempts.")
         if degrees == 0:
-            print("Note: Wyckoff positions have no degrees of freedom.")
+            self.message("Note: Wyckoff positions have no degrees of freedom.")
         self.struct = self.Msg2
         self.valid = False
+        if observer is not None:
+            observer.on_finish(self)
         return self.Msg2
 
 class molecular_crystal_2D(molecular_crystal):
@@ -1307,15 +1836,18 @@ class molecular_crystal_2D(molecular_crystal):
             when molecule values are strings
         lattice: an optional Lattice object to use for the unit cell
         tm: the Tol_matrix object used to generate the crystal
+        generate: whether or not to generate a crystal during initialization
+        observer: an optional crystal.Observer object, which is notified as
+            the crystal is generated
     """
-    def __init__(self, group, molecules, numMols, volume_factor, allow_inversion=False, orientations=None, check_atomic_distances=True, fmt='xyz', thickness=None, lattice=None, tm=Tol_matrix(prototype="molecular")):
+    def __init__(self, group, molecules, numMols, volume_factor, allow_inversion=False, orientations=None, check_atomic_distances=True, fmt='xyz', thickness=None, lattice=None, tm=Tol_matrix(prototype="molecular"), generate=True, observer=None):
         self.dim = 2
         """The number of periodic dimensions of the crystal"""
         self.numattempts = 0
         """The number of attempts needed to generate the crystal."""
         #Necessary input
         if type(group) != Group:
-            group = Group(group, self.dim)
+            group = get_group(group, self.dim)
         number = group.number
         """The layer group number of the crystal."""
         self.lgp = Layergroup(number)
@@ -1327,7 +1859,7 @@ class molecular_crystal_2D(molecular_crystal):
         dimension."""
         self.PBC = [1,1,0]
         """The periodic axes of the crystal."""
-        self.init_common(molecules, numMols, volume_factor, allow_inversion, orientations, check_atomic_distances, group, lattice, tm)
+        self.init_common(molecules, numMols, volume_factor, allow_inversion, orientations, check_atomic_distances, group, lattice, tm, generate, observer)
 
 class molecular_crystal_1D(molecular_crystal):
     """
@@ -1368,8 +1900,11 @@ class molecular_crystal_1D(molecular_crystal):
             when molecule values are strings
         lattice: an optional Lattice object to use for the unit cell
         tm: the Tol_matrix object used to generate the crystal
+        generate: whether or not to generate a crystal during initialization
+        observer: an optional crystal.Observer object, which is notified as
+            the crystal is generated
     """
-    def __init__(self, group, molecules, numMols, volume_factor, allow_inversion=False, orientations=None, check_atomic_distances=True, fmt='xyz', area=None, lattice=None, tm=Tol_matrix(prototype="molecular")):
+    def __init__(self, group, molecules, numMols, volume_factor, allow_inversion=False, orientations=None, check_atomic_distances=True, fmt='xyz', area=None, lattice=None, tm=Tol_matrix(prototype="molecular"), generate=True, observer=None):
         self.dim = 1
         """The number of periodic dimensions of the crystal"""
         #Necessary input
@@ -1381,7 +1916,7 @@ class molecular_crystal_1D(molecular_crystal):
         self.sg = None
         """The international space group number (there is not a 1-1 correspondence
         with Rod groups)."""
-        self.init_common(molecules, numMols, volume_factor, allow_inversion, orientations, check_atomic_distances, group, lattice, tm)
+        self.init_common(molecules, numMols, volume_factor, allow_inversion, orientations, check_atomic_distances, group, lattice, tm, generate, observer)
 
 
 if __name__ == "__main__":
@@ -1410,6 +1945,16 @@ if __name__ == "__main__":
             help="desired dimension: (3 or 2 for 3d or 2d, respectively): default 3")
     parser.add_option("-t", "--thickness", dest="thickness", metavar='thickness', default=None, type=float,
             help="Thickness, in Angstroms, of a 2D crystal, or area of a 1D crystal, None generates a value automatically: default None")
+    parser.add_option("-j", "--jobs", dest="jobs", metavar='jobs', default=1, type=int,
+            help="number of processes to generate crystals with; 0 uses all CPUs: default 1")
+    parser.add_option("-r", "--seed", dest="seed", metavar='seed', default=None, type=int,
+            help="master random seed, for reproducing a run: default None")
+    parser.add_option("-u", "--unique", dest="unique", action="store_true", default=False,
+            help="skip structures which duplicate an earlier one: default False")
+    parser.add_option("-w", "--write", dest="write", metavar='write', default=None, type=str,
+            help="single file (.cif or .extxyz, optionally .gz) to write all structures to, instead of one cif file each: default None")
+    parser.add_option("-p", "--prewarm", dest="prewarm", action="store_true", default=False,
+            help="store the molecules' orientations for every group in the disk cache, then exit: default False")
 
     (options, args) = parser.parse_args()    
     molecule = options.molecule
@@ -1445,38 +1990,61 @@ if __name__ == "__main__":
         numMols = [int(number)]
     orientations = None
 
+    if options.prewarm:
+        jobs = options.jobs
+        if jobs < 1:
+            jobs = None
+        start = time()
+        count = prewarm_orientations(system, dim=dimension, allow_inversion=allowinversion, workers=jobs)
+        print("Stored orientations for "+str(count)+" molecule/group pairs in "+str(np.around(time()-start, decimals=2))+" s")
+        sys.exit(0)
+
     try:
         os.mkdir(outdir)
     except: pass
 
     filecount = 1 #To check whether a file already exists
-    for i in range(attempts):
-        start = time()
-        numMols0 = np.array(numMols)
-        sg = options.sg
-        if dimension == 3:
-            rand_crystal = molecular_crystal(options.sg, system, numMols0, factor, check_atomic_distances=checkatoms, allow_inversion=allowinversion)
-        elif dimension == 2:
-            rand_crystal = molecular_crystal_2D(options.sg, system, numMols0, thickness, factor, allow_inversion=allowinversion, check_atomic_distances=checkatoms)
+    numMols0 = np.array(numMols)
+    sg = options.sg
+    if dimension == 3:
+        generator = Generator(molecular_crystal, options.sg, system, numMols0, factor, check_atomic_distances=checkatoms, allow_inversion=allowinversion)
+    elif dimension == 2:
+        generator = Generator(molecular_crystal_2D, options.sg, system, numMols0, factor, thickness=thickness, allow_inversion=allowinversion, check_atomic_distances=checkatoms)
+    jobs = options.jobs
+    if jobs < 1:
+        jobs = None
+    unique = None
+    if options.unique:
+        unique = Fingerprint_filter()
+    writer = None
+    if options.write is not None:
+        writer = Structure_writer(options.write)
+    start = time()
+    for i, rand_crystal in generate_parallel(generator, attempts, workers=jobs, seed=options.seed, unique=unique):
         end = time()
         timespent = np.around((end - start), decimals=2)
+        start = end
         if rand_crystal.valid:
             #Output a cif file
             written = False
-            try:
-                comp = str(rand_crystal.struct.composition)
-                comp = comp.replace(" ", "")
-                cifpath = outdir + '/' + comp + "_" + str(filecount) + '.cif'
-                while os.path.isfile(cifpath):
-                    filecount += 1
-                    cifpath = outdir + '/' + comp + "_" + str(filecount) + '.cif'
-                CifWriter(rand_crystal.struct, symprec=0.1).write_file(filename = cifpath)
+            if writer is not None:
+                cifpath = options.write + ", structure " + str(writer.write(rand_crystal) + 1)
                 written = True
-            except: pass
+            else:
+                try:
+                    comp = str(rand_crystal.struct.composition)
+                    comp = comp.replace(" ", "")
+                    cifpath = outdir + '/' + comp + "_" + str(filecount) + '.cif'
+                    while os.path.isfile(cifpath):
+                        filecount += 1
+                        cifpath = outdir + '/' + comp + "_" + str(filecount) + '.cif'
+                    CifWriter(rand_crystal.struct, symprec=0.1).write_file(filename = cifpath)
+                    written = True
+                except: pass
 
             #spglib style structure called cell
             ans = get_symmetry_dataset(rand_crystal.spg_struct, symprec=1e-1)['number']
-            print('Space group requested: ', sg, 'generated', ans, 'vol: ', rand_crystal.volume)
+            print('Space group requested: ', sg, 'generated', ans, 'vol: ', rand_crystal.volume, 'seed: ', rand_crystal.seed)
             if written is True:
                 print("    Output to "+cifpath)
             else:
@@ -1495,3 +2063,8 @@ if __name__ == "__main__":
         else: 
             print('something is wrong')
             print('Time spent during generation attempt: ' + str(timespent) + "s")
+
+    if writer is not None:
+        writer.close()
+    if verbosity > 0:
+        print(generator.stats)
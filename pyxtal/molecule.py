@@ -14,8 +14,6 @@ from numpy.linalg import eigh
 from numpy.linalg import det
 from copy import deepcopy
 from math import fabs
-from random import random
-from random import choice as choose
 
 from pyxtal.operations import *
 
@@ -24,10 +22,50 @@ from pyxtal.database.collection import Collection
 identity = np.array([[1,0,0],[0,1,0],[0,0,1]])
 inversion = np.array([[-1,0,0],[0,-1,0],[0,0,-1]])
 
-#TODO: implement minimal enclosing ellipsoid algorithm
-def find_ellipsoid(mol):
-    print("Error: bounding ellipsoid calculator not yet implemented.")
-    pass
+def find_ellipsoid(mol, padding=0.0, tol=1e-3, max_iterations=1000):
+    """
+    Finds the minimum-volume ellipsoid enclosing the atoms of a molecule,
+    using Khachiyan's algorithm. Each atom is replaced by the 6 points
+    at +/-0.1 Angstroms along the Cartesian axes, so that planar and linear
+    molecules (and single atoms) still have a 3D ellipsoid.
+
+    Args:
+        mol: a pymatgen Molecule object
+        padding: a distance (in Angstroms) added to each semi-axis, so that
+            the ellipsoid also encloses spheres of this radius around the atoms
+        tol: the convergence tolerance of Khachiyan's algorithm
+        max_iterations: the maximum number of iterations
+
+    Returns:
+        a SymmOp which maps the unit sphere onto the ellipsoid. Its
+        rotation_matrix has the semi-axes (as orthogonal column vectors) and
+        its translation_vector is the center of the ellipsoid
+    """
+    offsets = 0.1 * np.vstack([np.identity(3), -np.identity(3)])
+    points = (np.array(mol.cart_coords)[:,None,:] + offsets[None,:,:]).reshape((-1,3))
+    n, d = points.shape
+    Q = np.vstack([points.T, np.ones(n)])
+    u = np.full(n, 1.0/n)
+    for i in range(max_iterations):
+        X = np.dot(Q * u, Q.T)
+        M = np.einsum('in,ij,jn->n', Q, np.linalg.inv(X), Q)
+        j = np.argmax(M)
+        step = (M[j] - d - 1.0) / ((d + 1.0) * (M[j] - 1.0))
+        new_u = (1.0 - step) * u
+        new_u[j] += step
+        converged = np.linalg.norm(new_u - u) < tol
+        u = new_u
+        if converged:
+            break
+    center = np.dot(u, points)
+    #The ellipsoid is (x-center).A.(x-center) <= 1
+    A = np.linalg.inv(np.dot(points.T * u, points) - np.outer(center, center)) / d
+    #Enlarge the approximate ellipsoid so that it encloses every point
+    diff = points - center
+    A /= max(np.einsum('ni,ij,nj->n', diff, A, diff).max(), 1.0)
+    values, vectors = eigh(A)
+    axes = 1.0 / np.sqrt(values) + padding
+    return SymmOp.from_rotation_and_translation(vectors * axes, center)
 
 def mol_from_file(fname):
     """
@@ -256,7 +294,8 @@ def get_symmetry(mol, already_oriented=False):
         return symm_m
 
 def orientation_in_wyckoff_position(mol, wyckoff_position, randomize=True,
-    exact_orientation=False, already_oriented=False, allow_inversion=False):
+    exact_orientation=False, already_oriented=False, allow_inversion=False, rng=None,
+    pga=None, symm_m=None):
     """
     Tests if a molecule meets the symmetry requirements of a Wyckoff position,
     and returns the valid orientations.
@@ -276,6 +315,11 @@ def orientation_in_wyckoff_position(mol, wyckoff_position, randomize=True,
             inverted. Should only be True if the chemical and biological
             properties of the mirror image are known to be suitable for the
             desired application
+        rng: an optional numpy.random.Generator to draw the random rotation
+            from
+        pga: an optional PointGroupAnalyzer for mol, to avoid creating a new one
+        symm_m: an optional list of mol's symmetry operations, as returned by
+            get_symmetry, to avoid recomputing them
 
     Returns:
         a list of operations.Orientation objects which can be applied to the
@@ -288,7 +332,8 @@ def orientation_in_wyckoff_position(mol, wyckoff_position, randomize=True,
 
     #Obtain the Wyckoff symmetry
     symm_w = w_symm[0]
-    pga = PointGroupAnalyzer(mol)
+    if pga is None:
+        pga = PointGroupAnalyzer(mol)
 
     #Check exact orientation
     if exact_orientation is True:
@@ -303,7 +348,8 @@ def orientation_in_wyckoff_position(mol, wyckoff_position, randomize=True,
             return False
 
     #Obtain molecular symmetry, exact_orientation==False
-    symm_m = get_symmetry(mol, already_oriented=already_oriented)
+    if symm_m is None:
+        symm_m = get_symmetry(mol, already_oriented=already_oriented)
     #Store OperationAnalyzer objects for each molecular SymmOp
     chiral = True
     opa_m = []
@@ -472,7 +518,7 @@ def orientation_in_wyckoff_position(mol, wyckoff_position, randomize=True,
     allowed = []
     for o in orientations:
         if randomize is True:
-            op = o.get_op()
+            op = o.get_op(rng=rng)
         elif randomize is False:
             op = o.get_op(angle=0)
         mo = deepcopy(mol)
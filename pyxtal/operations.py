@@ -11,7 +11,6 @@ import numpy as np
 from numpy import matrix
 from numpy import isclose
 from numpy import allclose
-from numpy.random import random as rand
 from numpy.linalg import eig
 from numpy.linalg import eigh
 from numpy.linalg import det
@@ -23,6 +22,35 @@ from copy import deepcopy
 rad = pi/180.
 deg = 180./pi
 
+rng_default = np.random.default_rng()
+"""The numpy.random.Generator used when no rng is passed to a function."""
+
+def get_rng(rng=None):
+    """
+    Returns the random number generator to draw from. Functions with random
+    output accept an optional rng argument and pass it through this function.
+
+    Args:
+        rng: a numpy.random.Generator, or None to use the module's default
+            generator
+
+    Returns:
+        a numpy.random.Generator
+    """
+    if rng is None:
+        return rng_default
+    return rng
+
+def set_seed(seed=None):
+    """
+    Reseeds the default random number generator used when no rng is given.
+
+    Args:
+        seed: an integer seed, or None to seed from the OS
+    """
+    global rng_default
+    rng_default = np.random.default_rng(seed)
+
 def euler_from_matrix(m, radians=True):
     """
     Given a 3x3 rotation matrix, determines the Euler angles
@@ -51,16 +79,52 @@ def apply_ops(coord, ops):
     the generated vectors. This is the inverse of SymmOp.operate_multi.
 
     Args:
-        coord: a 3-vector (list or numpy array)
+        coord: a 3-vector (list or numpy array), or an array of 3-vectors
+        ops: a list, tuple, or array of SymmOp objects, or a
+            pyxtal.symmetry.Wyckoff_position object
+
+    Returns:
+        an np array of floating-point 3-vectors. If coord is a single
+        3-vector, the shape is (m,3), where m is the number of ops. If coord
+        has shape (K,3), the shape is (K,m,3)
+    """
+    #Wyckoff_position objects already store their stacked operations
+    if hasattr(ops, "operate_many"):
+        return ops.operate_many(coord)
+    rotations, translations = stack_ops(ops)
+    return operate_many(coord, rotations, translations)
+
+def stack_ops(ops):
+    """
+    Splits a list of SymmOps into stacked rotation and translation arrays,
+    which can be passed to operate_many.
+
+    Args:
         ops: a list, tuple, or array of SymmOp objects
 
     Returns:
-        an np array of floating-point 3-vectors
+        rotations, translations: an (m,3,3) array of rotation matrices and an
+        (m,3) array of translation vectors
+    """
+    affine = np.array([op.affine_matrix for op in ops], dtype=float).reshape(-1,4,4)
+    return affine[:,:3,:3], affine[:,:3,3]
+
+def operate_many(points, rotations, translations):
+    """
+    Applies a set of stacked operations to a set of points at once, using a
+    single einsum call.
+
+    Args:
+        points: a 3-vector, or a (K,3) array of 3-vectors
+        rotations: an (m,3,3) array of rotation matrices
+        translations: an (m,3) array of translation vectors
+
+    Returns:
+        an (m,3) array if points is a single 3-vector, or a (K,m,3) array
+        containing the m images of each of the K points
     """
-    coord = np.array(coord)
-    affine_point = np.concatenate([coord, np.ones(coord.shape[:-1] + (1,))], axis=-1)
-    matrices = np.array([op.affine_matrix for op in ops])
-    return np.inner(affine_point, matrices)[..., :-1]
+    points = np.asarray(points, dtype=float)
+    return np.einsum('mij,...j->...mi', rotations, points) + translations
 
 def angle(v1, v2, radians=True):
     """
@@ -87,23 +151,25 @@ def angle(v1, v2, radians=True):
     else:
         return a * deg
 
-def random_shear_matrix(width=1.0, unitary=False):
+def random_shear_matrix(width=1.0, unitary=False, rng=None):
     """
     Generate a random symmetric shear matrix with Gaussian elements. If unitary
     is True, normalize to determinant 1
 
     Args:
         width: the width of the normal distribution to use when choosing values.
-            Passed to numpy.random.normal
+            Passed to numpy.random.Generator.normal
         unitary: whether or not to normalize the matrix to determinant 1
+        rng: an optional numpy.random.Generator to draw from
     
     Returns:
         a 3x3 numpy array of floats
     """
+    rng = get_rng(rng)
     mat = np.zeros([3,3])
     determinant = 0
     while determinant == 0:
-        a, b, c = np.random.normal(scale=width), np.random.normal(scale=width), np.random.normal(scale=width)
+        a, b, c = rng.normal(scale=width, size=3)
         mat = np.array([[1,a,b],[a,1,c],[b,c,1]])
         determinant = np.linalg.det(mat)
     if unitary:
@@ -111,7 +177,7 @@ def random_shear_matrix(width=1.0, unitary=False):
         return new
     else: return mat
 
-def random_vector(minvec=[0.,0.,0.], maxvec=[1.,1.,1.], width=0.35, unit=False):
+def random_vector(minvec=[0.,0.,0.], maxvec=[1.,1.,1.], width=0.35, unit=False, rng=None):
     """
     Generate a random vector for lattice constant generation. The ratios between
     x, y, and z of the returned vector correspond to the ratios between a, b,
@@ -121,13 +187,14 @@ def random_vector(minvec=[0.,0.,0.], maxvec=[1.,1.,1.], width=0.35, unit=False):
         minvec: the bottom-left-back minimum point which can be chosen
         maxvec: the top-right-front maximum point which can be chosen
         width: the width of the normal distribution to use when choosing values.
-            Passed to numpy.random.normal
+            Passed to numpy.random.Generator.normal
         unit: whether or not to normalize the vector to determinant 1
+        rng: an optional numpy.random.Generator to draw from
 
     Returns:
         a 1x3 numpy array of floats
     """
-    vec = np.array([np.exp(np.random.normal(scale=width)), np.exp(np.random.normal(scale=width)), np.exp(np.random.normal(scale=width))])
+    vec = np.exp(get_rng(rng).normal(scale=width, size=3))
     if unit:
         return vec/np.linalg.norm(vec)
     else:
@@ -152,7 +219,7 @@ def is_orthogonal(m, tol=.001):
     else:
         return True
 
-def aa2matrix(axis, angle, radians=True, random=False):
+def aa2matrix(axis, angle, radians=True, random=False, rng=None):
     """
     Given an axis and an angle, return a 3x3 rotation matrix.
     Based on:
@@ -165,6 +232,8 @@ def aa2matrix(axis, angle, radians=True, random=False):
             or in degrees (False)
         random: whether or not to choose a random rotation matrix. If True, the
             axis and angle are ignored, and a random orientation is generated
+        rng: an optional numpy.random.Generator to draw the random axis and
+            angle from
 
     Returns:
         a 3x3 numpy array representing a rotation matrix
@@ -174,9 +243,9 @@ def aa2matrix(axis, angle, radians=True, random=False):
         angle *= rad
     #Allow for generation of random rotations
     if random is True:
-        a = rand()
-        axis = [rand(),rand(),rand()]
-        angle = rand()*pi*2
+        rng = get_rng(rng)
+        axis = rng.random(3)
+        angle = rng.random()*pi*2
     #Ensure axis is a unit vector
     axis = axis / np.linalg.norm(axis)
     #Define quantities which are reused
@@ -292,7 +361,7 @@ def rotate_vector(v1, v2):
     if np.isclose(dot, 1, rtol=.0001):
         return np.identity(3)
     elif np.isclose(dot, -1, rtol=.0001):
-        r = [rand(),rand(),rand()]
+        r = get_rng().random(3)
         v3 = np.cross(v1, r)
         return aa2matrix(v3, pi)
     theta = angle(v1, v2)
@@ -556,7 +625,7 @@ class Orientation():
         self.axis = axis
         """The axis (optional) about which the orientation may rotate."""
 
-    def get_matrix(self, angle="random"):
+    def get_matrix(self, angle="random", rng=None):
         """
         Generate a 3x3 rotation matrix consistent with the orientation's
         constraints. Allows for specification of an angle (possibly random) to
@@ -567,18 +636,20 @@ class Orientation():
                 chooses a random rotation angle. If self.degrees==2, chooses a
                 random 3d rotation matrix to multiply by. If the original matrix
                 is wanted, set angle=0, or call self.matrix
+            rng: an optional numpy.random.Generator to draw the random
+                rotation from
 
         Returns:
             a 3x3 rotation (and/or inversion) matrix (numpy array)
         """
         if self.degrees == 2:
             if angle == "random":
-                return aa2matrix(1,1,random=True)
+                return aa2matrix(1,1,random=True,rng=rng)
             else:
                 return self.matrix
         elif self.degrees == 1:
             if angle == "random":
-                R = aa2matrix(self.axis, rand()*2*pi)
+                R = aa2matrix(self.axis, get_rng(rng).random()*2*pi)
                 return np.dot(R, self.matrix)
             else:
                 R = aa2matrix(self.axis, angle)
@@ -586,7 +657,7 @@ class Orientation():
         elif self.degrees == 0:
             return self.matrix
 
-    def get_op(self, angle="random"):
+    def get_op(self, angle="random", rng=None):
         """
         Generate a SymmOp object consistent with the orientation's
         constraints. Allows for specification of an angle (possibly random) to
@@ -597,12 +668,14 @@ class Orientation():
                 chooses a random rotation angle. If self.degrees==2, chooses a
                 random 3d rotation matrix to multiply by. If the original matrix
                 is wanted, set angle=0, or call self.matrix
+            rng: an optional numpy.random.Generator to draw the random
+                rotation from
 
         Returns:
             pymatgen.core.structure. SymmOp object
         """
         #If "random", rotates by a random amount
-        m = self.get_matrix(angle=angle)
+        m = self.get_matrix(angle=angle, rng=rng)
         return SymmOp.from_rotation_and_translation(m,[0,0,0])
 
     def from_constraint(v1, c1):
@@ -654,15 +727,18 @@ class Orientation():
             print("Error: Generated incorrect rotation: "+str(theta))
         return Orientation(T2, degrees=0)
 
-    def random_orientation(self):
+    def random_orientation(self, rng=None):
         """
         Applies random rotation (if possible) and returns a new orientation with
         the new base matrix.
 
+        Args:
+            rng: an optional numpy.random.Generator to draw the rotation from
+
         Returns:
             a new orientation object with a different base rotation matrix
         """
-        return Orientation(self.get_matrix(), degrees=self.degrees, axis=self.axis)
+        return Orientation(self.get_matrix(rng=rng), degrees=self.degrees, axis=self.axis)
 
 #Test Functionality
 if __name__ == "__main__":
@@ -1,16 +1,22 @@
 from pkg_resources import resource_filename
 
 from math import sqrt
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from time import time
+from collections import OrderedDict
 
 import numpy as np
 from scipy.spatial.distance import cdist
+from scipy.spatial import cKDTree
 
 from pymatgen.symmetry.groups import sg_symbol_from_int_number
 from pymatgen.symmetry.analyzer import generate_full_symmops
 from pymatgen.core.operations import SymmOp
 
-from pandas import read_csv
-
 from pyxtal.operations import *
 
 #Define variables
@@ -18,19 +24,6 @@ from pyxtal.operations import *
 Euclidean_lattice = np.array([[1,0,0],[0,1,0],[0,0,1]])
 letters = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
 
-wyckoff_df = read_csv(resource_filename("pyxtal", "database/wyckoff_list.csv"))
-wyckoff_symmetry_df = read_csv(resource_filename("pyxtal", "database/wyckoff_symmetry.csv"))
-wyckoff_generators_df = read_csv(resource_filename("pyxtal", "database/wyckoff_generators.csv"))
-layer_df = read_csv(resource_filename("pyxtal", "database/layer.csv"))
-layer_symmetry_df = read_csv(resource_filename("pyxtal", "database/layer_symmetry.csv"))
-layer_generators_df = read_csv(resource_filename("pyxtal", "database/layer_generators.csv"))
-rod_df = read_csv(resource_filename("pyxtal", "database/rod.csv"))
-rod_symmetry_df = read_csv(resource_filename("pyxtal", "database/rod_symmetry.csv"))
-rod_generators_df = read_csv(resource_filename("pyxtal", "database/rod_generators.csv"))
-point_df = read_csv(resource_filename("pyxtal", "database/point.csv"))
-point_symmetry_df = read_csv(resource_filename("pyxtal", "database/point_symmetry.csv"))
-point_generators_df = read_csv(resource_filename("pyxtal", "database/point_generators.csv"))
-
 pi = np.pi
 
 Identity = SymmOp.from_xyz_string('x,y,z')
@@ -123,11 +116,8 @@ def filtered_coords(coords, PBC=[1,1,1]):
     Returns:
         an array of filtered coords with the same shape as coords
     """
-    def filter_vector(vector):
-        f = np.floor(vector)
-        return vector - np.multiply(f, PBC)
-
-    return np.apply_along_axis(filter_vector, -1, coords)
+    coords = np.array(coords, dtype=float)
+    return coords - np.floor(coords) * np.array(PBC)
 
 def filtered_coords_euclidean(coords, PBC=[1,1,1]):
     """
@@ -205,14 +195,13 @@ def distance_matrix(points1, points2, lattice, PBC=[1,1,1], metric='euclidean'):
     Returns:
         a 2x2 np array of scalar distances
     """
-    l1 = filtered_coords(points1, PBC=PBC)
-    l2 = filtered_coords(points2, PBC=PBC)
+    l1 = filtered_coords(np.reshape(points1, (-1,3)), PBC=PBC)
+    l2 = filtered_coords(np.reshape(points2, (-1,3)), PBC=PBC)
     l2 = np.dot(l2, lattice)
     matrix = create_matrix(PBC=PBC)
-    m1 = np.array([(l1 + v) for v in matrix])
-    m1 = np.dot(m1, lattice)
-    all_distances = np.array([cdist(l, l2, metric) for l in m1])
-    return np.apply_along_axis(np.min, 0, all_distances)
+    m1 = np.dot(matrix[:,None,:] + l1[None,:,:], lattice).reshape(-1,3)
+    all_distances = cdist(m1, l2, metric).reshape(len(matrix), len(l1), len(l2))
+    return all_distances.min(axis=0)
 
 def distance_matrix_euclidean(points1, points2, PBC=[1,1,1], squared=False):
     """
@@ -239,6 +228,375 @@ def distance_matrix_euclidean(points1, points2, PBC=[1,1,1], squared=False):
     else:
         return np.apply_along_axis(np.linalg.norm, -1, displacements)
 
+#Periodic neighbor search
+#------------------------------
+#Below this many (query point, image) distances, Neighbor_search compares the
+#points directly instead of building a cKDTree
+neighbor_dense_size = 20000
+
+def image_translations(lattice, cutoff, PBC=[1,1,1]):
+    """
+    Returns the lattice translations needed to find every periodic image within
+    a distance cutoff of a point in the unit cell. Unlike create_matrix, the
+    number of translations grows with the cutoff, and is based on the spacing
+    between lattice planes, so skewed and small cells are handled correctly.
+
+    Args:
+        lattice: a 3x3 matrix describing a unit cell's lattice vectors
+        cutoff: the largest distance (in Angstroms) which will be searched
+        PBC: A periodic boundary condition list, where 1 means periodic, 0 means not periodic.
+            Ex: [1,1,1] -> full 3d periodicity, [0,0,1] -> periodicity along the z axis
+
+    Returns:
+        an (n,3) array of integer-valued fractional translations. The first
+        translation is always [0,0,0]
+    """
+    lattice = np.array(lattice, dtype=float)
+    volume = abs(np.linalg.det(lattice))
+    ranges = []
+    for i, a in enumerate(PBC):
+        if a:
+            #cutoff divided by the distance between neighboring lattice planes
+            area = np.linalg.norm(np.cross(lattice[(i+1)%3], lattice[(i+2)%3]))
+            n = int(np.floor(cutoff * area / volume)) + 1
+            ranges.append(np.arange(-n, n+1))
+        else:
+            ranges.append(np.array([0]))
+    grid = np.array(np.meshgrid(*ranges, indexing='ij'), dtype=float).reshape(3,-1).T
+    order = np.argsort(np.abs(grid).sum(axis=1), kind='stable')
+    return grid[order]
+
+class Neighbor_search():
+    """
+    Class for finding close pairs between a fixed set of fractional coordinates
+    and any number of query points, under periodic boundary conditions. The
+    periodic images of the stored points within the cutoff distance are placed
+    in a scipy cKDTree, so large sets are searched without computing the full
+    distance matrix. Small sets are compared directly.
+
+    Args:
+        points: a list of fractional coordinates to store
+        lattice: a 3x3 matrix describing a unit cell's lattice vectors
+        cutoff: the largest distance (in Angstroms) which will be searched
+        PBC: A periodic boundary condition list, where 1 means periodic, 0 means not periodic.
+            Ex: [1,1,1] -> full 3d periodicity, [0,0,1] -> periodicity along the z axis
+    """
+    def __init__(self, points, lattice, cutoff, PBC=[1,1,1]):
+        self.lattice = np.array(lattice, dtype=float)
+        self.cutoff = cutoff
+        self.PBC = PBC
+        points = filtered_coords(np.reshape(points, (-1,3)), PBC=PBC)
+        self.translations = image_translations(self.lattice, cutoff, PBC=PBC)
+        """The fractional lattice translations used to generate the images"""
+        images = self.translations[:,None,:] + points[None,:,:]
+        self.images = np.dot(images.reshape(-1,3), self.lattice)
+        """The absolute coordinates of the periodic images of the stored points"""
+        self.index = np.tile(np.arange(len(points)), len(self.translations))
+        """The index of the stored point for each image"""
+        self.tree = None
+
+    def query_pairs(self, points, r=None):
+        """
+        Finds all pairs of query points and stored points which are within a
+        distance r of each other. Only the closest periodic image of each
+        pair is returned.
+
+        Args:
+            points: a list of fractional coordinates
+            r: the search distance in Angstroms. Defaults to, and may not
+                exceed, the cutoff of the Neighbor_search object
+
+        Returns:
+            i, j, d: numpy arrays of the query point indices, the stored point
+            indices, and the distances between them, sorted by i and then j
+        """
+        if r is None:
+            r = self.cutoff
+        elif r > self.cutoff:
+            raise ValueError("Search distance "+str(r)+" exceeds the cutoff "+str(self.cutoff))
+        points = filtered_coords(np.reshape(points, (-1,3)), PBC=self.PBC)
+        coords = np.dot(points, self.lattice)
+        if len(coords) * len(self.images) <= neighbor_dense_size:
+            d = cdist(coords, self.images)
+            i, k = np.where(d <= r)
+            d = d[i, k]
+        else:
+            if self.tree is None:
+                self.tree = cKDTree(self.images)
+            sdm = cKDTree(coords).sparse_distance_matrix(self.tree, r, output_type='ndarray')
+            i, k, d = sdm['i'], sdm['j'], sdm['v']
+        j = self.index[k]
+        #Keep only the closest image of each pair
+        order = np.lexsort((d, j, i))
+        i, j, d = i[order], j[order], d[order]
+        first = np.ones(len(i), dtype=bool)
+        first[1:] = (i[1:] != i[:-1]) | (j[1:] != j[:-1])
+        return i[first], j[first], d[first]
+
+    def check(self, points, tols):
+        """
+        Checks whether any query point is closer to a stored point than the
+        given tolerance.
+
+        Args:
+            points: a list of fractional coordinates
+            tols: a single tolerance, or a matrix of tolerances whose [i][j]
+                entry is used for the ith query point and jth stored point
+
+        Returns:
+            True if no pair is closer than its tolerance, False otherwise
+        """
+        tols = np.asarray(tols, dtype=float)
+        if tols.size == 0:
+            return True
+        i, j, d = self.query_pairs(points, r=min(tols.max(), self.cutoff))
+        if tols.ndim > 0:
+            tols = tols[i, j]
+        return not (d < tols).any()
+
+def find_pairs(points1, points2, lattice, r, PBC=[1,1,1]):
+    """
+    Returns all pairs of points from two sets of fractional coordinates which
+    are closer than a distance r, including periodic images. Uses
+    Neighbor_search, so the cost grows with the number of close pairs rather
+    than with the size of the full distance matrix.
+
+    Args:
+        points1: a list of fractional coordinates
+        points2: another list of fractional coordinates
+        lattice: a 3x3 matrix describing a unit cell's lattice vectors
+        r: the search distance in Angstroms
+        PBC: A periodic boundary condition list, where 1 means periodic, 0 means not periodic.
+            Ex: [1,1,1] -> full 3d periodicity, [0,0,1] -> periodicity along the z axis
+
+    Returns:
+        i, j, d: numpy arrays of indices within points1, indices within points2,
+        and the shortest distance between each pair
+    """
+    return Neighbor_search(points2, lattice, r, PBC=PBC).query_pairs(points1)
+
+#Compiled symmetry database
+#------------------------------
+#The Wyckoff positions, site symmetry, and Wyckoff generators for every space,
+#layer, Rod, and point group are stored in database/symmetry.npz. The csv files
+#in the database folder are the source for the compiled file, and are only read
+#by compile_symmetry_database.
+symmetry_db_version = 1
+symmetry_db_file = resource_filename("pyxtal", "database/symmetry.npz")
+#Name of each table, with the source csv file and the number of nested levels
+#(group, Wyckoff position, and for site symmetry, point) above each operation
+symmetry_db_tables = {
+    "wyckoff": ("wyckoff_list.csv", 2),
+    "wyckoff_symmetry": ("wyckoff_symmetry.csv", 3),
+    "wyckoff_generators": ("wyckoff_generators.csv", 2),
+    "layer": ("layer.csv", 2),
+    "layer_symmetry": ("layer_symmetry.csv", 3),
+    "layer_generators": ("layer_generators.csv", 2),
+    "rod": ("rod.csv", 2),
+    "rod_symmetry": ("rod_symmetry.csv", 3),
+    "rod_generators": ("rod_generators.csv", 2),
+    "point": ("point.csv", 2),
+    "point_symmetry": ("point_symmetry.csv", 3),
+    "point_generators": ("point_generators.csv", 2),
+    }
+symmetry_db_levels = ["group", "wp", "point"]
+#Every entry of every operation is a multiple of 1/24, so the operations are
+#stored exactly as small integers
+symmetry_db_denominator = 24
+
+#Change of basis between hexagonal and Euclidean axes
+P_hexagonal = np.array([[1,-.5,0,0],[0,sqrt(3)/2,0,0],[0,0,1,0],[0,0,0,1]])
+P_hexagonal_inverse = np.linalg.inv(P_hexagonal)
+
+def compile_symmetry_database(filename=symmetry_db_file):
+    """
+    Reads the Wyckoff position, site symmetry, and generator csv files for all
+    space, layer, Rod, and point groups, and compiles them into a single .npz
+    file. For each table, every operation is stored as a 3x4 affine matrix in
+    one flattened array (name+"_ops"), and offset arrays (name+"_group",
+    name+"_wp", and for site symmetry tables, name+"_point") give the index
+    of the first entry on the next level for each group, Wyckoff position, or
+    point. Only needs to be called after the csv files have been changed.
+
+    Args:
+        filename: the path of the .npz file to write. If None, no file is
+            written
+
+    Returns:
+        a dictionary containing the compiled arrays
+    """
+    from pandas import read_csv
+    data = {"version": np.array(symmetry_db_version)}
+    for name, (csvfile, depth) in symmetry_db_tables.items():
+        df = read_csv(resource_filename("pyxtal", "database/"+csvfile))
+        #Row 0 of each table is empty, so that rows match group numbers
+        current = []
+        for num in range(len(df)):
+            string = df["0"][num]
+            if type(string) is str:
+                current.append(eval(string))
+            else:
+                current.append([])
+        #Flatten one level at a time, keeping the offsets for each entry
+        for level in range(depth):
+            offsets = [0]
+            children = []
+            for entry in current:
+                children += entry
+                offsets.append(len(children))
+            data[name+"_"+symmetry_db_levels[level]] = np.array(offsets, dtype=np.int32)
+            current = children
+        ops = np.zeros([len(current),3,4])
+        for i, xyz in enumerate(current):
+            ops[i] = SymmOp.from_xyz_string(xyz).affine_matrix[:3]
+        codes = np.rint(ops*symmetry_db_denominator)
+        if not np.allclose(codes, ops*symmetry_db_denominator):
+            print("Error: could not encode operations for "+name)
+            return
+        data[name+"_ops"] = codes.astype(np.int8)
+    if filename is not None:
+        np.savez_compressed(filename, **data)
+    return data
+
+def load_symmetry_table(name, filename=symmetry_db_file):
+    """
+    Loads a single table from the compiled symmetry database. If the file is
+    missing or was written by an older version of compile_symmetry_database,
+    the database is recompiled from the csv files.
+
+    Args:
+        name: the name of the table (a key of symmetry_db_tables)
+        filename: the path of the compiled .npz file
+
+    Returns:
+        a dictionary containing "ops", an (N,4,4) array of affine matrices, and
+        the offset arrays "group", "wp", and (for site symmetry tables) "point"
+    """
+    levels = symmetry_db_levels[:symmetry_db_tables[name][1]]
+    keys = ["ops"] + levels
+    data = None
+    try:
+        with np.load(filename) as f:
+            if int(f["version"]) == symmetry_db_version:
+                data = {key: f[name+"_"+key] for key in keys}
+    except (IOError, KeyError):
+        pass
+    if data is None:
+        try:
+            compiled = compile_symmetry_database(filename)
+        except IOError:
+            compiled = compile_symmetry_database(None)
+        data = {key: compiled[name+"_"+key] for key in keys}
+    codes = data["ops"]
+    ops = np.zeros([len(codes),4,4])
+    ops[:,:3] = codes / symmetry_db_denominator
+    ops[:,3,3] = 1
+    data["ops"] = ops
+    return data
+
+symmetry_db = {}
+"""The tables of the compiled symmetry database which have been loaded so far.
+Tables are only read from disk the first time a group which uses them is
+requested, so layer, Rod, and point group data is not loaded for 3D crystals."""
+symmetry_db_lock = threading.Lock()
+
+def get_symmetry_table(name):
+    """
+    Returns a table of the compiled symmetry database, loading it from disk if
+    it has not been used yet in this process.
+
+    Args:
+        name: the name of the table (a key of symmetry_db_tables)
+
+    Returns:
+        a dictionary of arrays, as returned by load_symmetry_table
+    """
+    table = symmetry_db.get(name)
+    if table is None:
+        with symmetry_db_lock:
+            if name not in symmetry_db:
+                symmetry_db[name] = load_symmetry_table(name)
+            table = symmetry_db[name]
+    return table
+
+def read_symmetry_table(name, num):
+    """
+    Returns the operations for a single group from a table of the compiled
+    symmetry database.
+
+    Args:
+        name: the name of the table (a key of symmetry_db_tables), for example
+            "wyckoff", "layer_symmetry", or "rod_generators"
+        num: the international number of the group
+
+    Returns:
+        for Wyckoff position and generator tables, a list containing an (n,4,4)
+        array of affine matrices for each Wyckoff position. For site symmetry
+        tables, a list containing a list of such arrays (one per point) for each
+        Wyckoff position
+    """
+    table = get_symmetry_table(name)
+    ops = table["ops"]
+    wp = table["wp"]
+    start, end = table["group"][num], table["group"][num+1]
+    if "point" in table:
+        point = table["point"]
+        return [[ops[point[p]:point[p+1]] for p in range(wp[i], wp[i+1])] for i in range(start, end)]
+    else:
+        return [ops[wp[i]:wp[i+1]] for i in range(start, end)]
+
+def ops_from_affine(affine, convert=False, molecular=False):
+    """
+    Creates a list of SymmOp objects from an array of affine matrices.
+
+    Args:
+        affine: an (n,4,4) array of affine matrices
+        convert: whether or not to convert non-orthogonal trigonal/hexagonal
+            operations to the Euclidean reference frame
+        molecular: whether or not to cut off the translational part of the
+            operations
+
+    Returns:
+        a list of SymmOp objects
+    """
+    if convert is True:
+        affine = np.matmul(np.matmul(P_hexagonal, affine), P_hexagonal_inverse)
+    if molecular is True:
+        affine = np.array(affine)
+        affine[:,:3,3] = 0
+    return [SymmOp(m) for m in affine]
+
+def wyckoff_PBC_mask(wyckoffs, PBC=[1,1,1]):
+    """
+    Determines which Wyckoff positions of a space group can be used with a given
+    set of periodic boundary conditions. A Wyckoff position is kept if its first
+    operation maps the center of the cell (0.5) onto itself along every
+    non-periodic axis.
+
+    Args:
+        wyckoffs: a list of (n,4,4) affine matrix arrays, one per Wyckoff
+            position, as returned by read_symmetry_table
+        PBC: A periodic boundary condition list, where 1 means periodic, 0 means not periodic.
+            Ex: [1,1,1] -> full 3d periodicity, [0,0,1] -> periodicity along the z axis
+
+    Returns:
+        a list of booleans, one for each Wyckoff position
+    """
+    if PBC == [1,1,1]:
+        return [True] * len(wyckoffs)
+    coor = np.array([0.5 if not a else 0. for a in PBC])
+    mask = []
+    for ops in wyckoffs:
+        coor1 = np.dot(ops[0][:3,:3], coor) + ops[0][:3,3]
+        valid = True
+        for i, a in enumerate(PBC):
+            if not a:
+                if not abs(coor1[i]-0.5) < 1e-2:
+                    #invalid wyckoffs for layer group
+                    valid = False
+        mask.append(valid)
+    return mask
+
 def get_wyckoffs(sg, organized=False, PBC=[1,1,1]):
     """
     Returns a list of Wyckoff positions for a given space group. Has option to
@@ -272,33 +630,11 @@ def get_wyckoffs(sg, organized=False, PBC=[1,1,1]):
     Returns: 
         a list of Wyckoff positions, each of which is a list of SymmOp's
     """
-    if PBC != [1,1,1]:
-        coor = [0,0,0]
-        for i, a in enumerate(PBC):
-            if not a:
-                coor[i] = 0.5
-        coor = np.array(coor)
-
-    wyckoff_strings = eval(wyckoff_df["0"][sg])
     wyckoffs = []
-    for x in wyckoff_strings:
-        if PBC != [1,1,1]:
-            op = SymmOp.from_xyz_string(x[0])
-            coor1 = op.operate(coor)
-            invalid = False
-            for i, a in enumerate(PBC):
-                if not a:
-                    if not abs(coor1[i]-0.5) < 1e-2:
-                        #invalid wyckoffs for layer group
-                        invalid = True
-            if invalid is False:
-                wyckoffs.append([])
-                for y in x:
-                    wyckoffs[-1].append(SymmOp.from_xyz_string(y))
-        else:
-            wyckoffs.append([])
-            for y in x:
-                wyckoffs[-1].append(SymmOp.from_xyz_string(y))
+    tables = read_symmetry_table("wyckoff", sg)
+    for ops, valid in zip(tables, wyckoff_PBC_mask(tables, PBC)):
+        if valid:
+            wyckoffs.append(ops_from_affine(ops))
     if organized:
         wyckoffs_organized = [[]] #2D Array of WP's organized by multiplicity
         old = len(wyckoffs[0])
@@ -346,12 +682,9 @@ def get_layer(num, organized=False):
     Returns: 
         a list of Wyckoff positions, each of which is a list of SymmOp's
     """
-    wyckoff_strings = eval(layer_df["0"][num])
     wyckoffs = []
-    for x in wyckoff_strings:
-        wyckoffs.append([])
-        for y in x:
-            wyckoffs[-1].append(SymmOp.from_xyz_string(y))
+    for ops in read_symmetry_table("layer", num):
+        wyckoffs.append(ops_from_affine(ops))
     if organized:
         wyckoffs_organized = [[]] #2D Array of WP's organized by multiplicity
         old = len(wyckoffs[0])
@@ -399,12 +732,9 @@ def get_rod(num, organized=False):
     Returns: 
         a list of Wyckoff positions, each of which is a list of SymmOp's
     """
-    wyckoff_strings = eval(rod_df["0"][num])
     wyckoffs = []
-    for x in wyckoff_strings:
-        wyckoffs.append([])
-        for y in x:
-            wyckoffs[-1].append(SymmOp.from_xyz_string(y))
+    for ops in read_symmetry_table("rod", num):
+        wyckoffs.append(ops_from_affine(ops))
     if organized:
         wyckoffs_organized = [[]] #2D Array of WP's organized by multiplicity
         old = len(wyckoffs[0])
@@ -438,27 +768,13 @@ def get_point(num, organized=False, molecular=True):
     Returns: 
         a list of Wyckoff positions, each of which is a list of SymmOp's
     """
-    P = SymmOp.from_rotation_and_translation([[1,-.5,0],[0,math.sqrt(3)/2,0],[0,0,1]], [0,0,0])
     convert = False
     if molecular is True:
         if num in range(16,28):
             convert = True
-    wyckoff_strings = eval(point_df["0"][num])
     wyckoffs = []
-    for x in wyckoff_strings:
-        wyckoffs.append([])
-        for y in x:
-
-            op = SymmOp.from_xyz_string(y)
-            if convert is True:
-                #Convert non-orthogonal trigonal/hexagonal operations
-                op = P*op*P.inverse
-            if molecular is False:
-                wyckoffs[-1].append(op)
-            elif molecular is True:
-                op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                wyckoffs[-1].append(op)
-
+    for ops in read_symmetry_table("point", num):
+        wyckoffs.append(ops_from_affine(ops, convert=convert, molecular=molecular))
     if organized:
         wyckoffs_organized = [[]] #2D Array of WP's organized by multiplicity
         old = len(wyckoffs[0])
@@ -493,63 +809,17 @@ def get_wyckoff_symmetry(sg, PBC=[1,1,1], molecular=False):
         a 3d list of SymmOp objects representing the site symmetry of each
         point in each Wyckoff position
     """
-    if PBC != [1,1,1]:
-        coor = [0,0,0]
-        for i, a in enumerate(PBC):
-            if not a:
-                coor[i] = 0.5
-        coor = np.array(coor)
-    wyckoffs = get_wyckoffs(sg, PBC=PBC)
-
-    P = SymmOp.from_rotation_and_translation([[1,-.5,0],[0,math.sqrt(3)/2,0],[0,0,1]], [0,0,0])
-    symmetry_strings = eval(wyckoff_symmetry_df["0"][sg])
-    symmetry = []
     convert = False
     if molecular is True:
         if sg >= 143 and sg <= 194:
             convert = True
+    wyckoffs = read_symmetry_table("wyckoff", sg)
+    symmetry = []
     #Loop over Wyckoff positions
-    for x, w in zip(symmetry_strings, wyckoffs):
-        if PBC != [1,1,1]:
-            op = w[0]
-            coor1 = op.operate(coor)
-            invalid = False
-            for i, a in enumerate(PBC):
-                if not a:
-                    if not abs(coor1[i]-0.5) < 1e-2:
-                        invalid = True
-            if invalid == False:
-                symmetry.append([])
-                #Loop over points in WP
-                for y in x:
-                    symmetry[-1].append([])
-                    #Loop over ops
-                    for z in y:
-                        op = SymmOp.from_xyz_string(z)
-                        if convert is True:
-                            #Convert non-orthogonal trigonal/hexagonal operations
-                            op = P*op*P.inverse
-                        if molecular is False:
-                            symmetry[-1][-1].append(op)
-                        elif molecular is True:
-                            op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                            symmetry[-1][-1].append(op)
-        else:
-            symmetry.append([])
+    for x, valid in zip(read_symmetry_table("wyckoff_symmetry", sg), wyckoff_PBC_mask(wyckoffs, PBC)):
+        if valid:
             #Loop over points in WP
-            for y in x:
-                symmetry[-1].append([])
-                #Loop over ops
-                for z in y:
-                    op = SymmOp.from_xyz_string(z)
-                    if convert is True:
-                        #Convert non-orthogonal trigonal/hexagonal operations
-                        op = P*op*P.inverse
-                    if molecular is False:
-                        symmetry[-1][-1].append(op)
-                    elif molecular is True:
-                        op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                        symmetry[-1][-1].append(op)
+            symmetry.append([ops_from_affine(y, convert=convert, molecular=molecular) for y in x])
     return symmetry
 
 def get_layer_symmetry(num, molecular=False):
@@ -571,31 +841,15 @@ def get_layer_symmetry(num, molecular=False):
         a 3d list of SymmOp objects representing the site symmetry of each
         point in each Wyckoff position
     """
-
-    P = SymmOp.from_rotation_and_translation([[1,-.5,0],[0,math.sqrt(3)/2,0],[0,0,1]], [0,0,0])
-    symmetry_strings = eval(layer_symmetry_df["0"][num])
-    symmetry = []
     convert = False
     if molecular is True:
         if num >= 65:
             convert = True
+    symmetry = []
     #Loop over Wyckoff positions
-    for x in symmetry_strings:
-        symmetry.append([])
+    for x in read_symmetry_table("layer_symmetry", num):
         #Loop over points in WP
-        for y in x:
-            symmetry[-1].append([])
-            #Loop over ops
-            for z in y:
-                op = SymmOp.from_xyz_string(z)
-                if convert is True:
-                    #Convert non-orthogonal trigonal/hexagonal operations
-                    op = P*op*P.inverse
-                if molecular is False:
-                    symmetry[-1][-1].append(op)
-                elif molecular is True:
-                    op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                    symmetry[-1][-1].append(op)
+        symmetry.append([ops_from_affine(y, convert=convert, molecular=molecular) for y in x])
     return symmetry
 
 def get_rod_symmetry(num, molecular=False):
@@ -617,31 +871,15 @@ def get_rod_symmetry(num, molecular=False):
         a 3d list of SymmOp objects representing the site symmetry of each
         point in each Wyckoff position
     """
-
-    P = SymmOp.from_rotation_and_translation([[1,-.5,0],[0,math.sqrt(3)/2,0],[0,0,1]], [0,0,0])
-    symmetry_strings = eval(rod_symmetry_df["0"][num])
-    symmetry = []
     convert = False
     if molecular is True:
         if num >= 42:
             convert = True
+    symmetry = []
     #Loop over Wyckoff positions
-    for x in symmetry_strings:
-        symmetry.append([])
+    for x in read_symmetry_table("rod_symmetry", num):
         #Loop over points in WP
-        for y in x:
-            symmetry[-1].append([])
-            #Loop over ops
-            for z in y:
-                op = SymmOp.from_xyz_string(z)
-                if convert is True:
-                    #Convert non-orthogonal trigonal/hexagonal operations
-                    op = P*op*P.inverse
-                if molecular is False:
-                    symmetry[-1][-1].append(op)
-                elif molecular is True:
-                    op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                    symmetry[-1][-1].append(op)
+        symmetry.append([ops_from_affine(y, convert=convert, molecular=molecular) for y in x])
     return symmetry
 
 def get_point_symmetry(num, molecular=True):
@@ -660,30 +898,15 @@ def get_point_symmetry(num, molecular=True):
         a 3d list of SymmOp objects representing the site symmetry of each
         point in each Wyckoff position
     """
-    P = SymmOp.from_rotation_and_translation([[1,-.5,0],[0,math.sqrt(3)/2,0],[0,0,1]], [0,0,0])
-    symmetry_strings = eval(point_symmetry_df["0"][num])
-    symmetry = []
     convert = False
     if molecular is True:
         if num in range(16,28):
             convert = True
+    symmetry = []
     #Loop over Wyckoff positions
-    for x in symmetry_strings:
-        symmetry.append([])
+    for x in read_symmetry_table("point_symmetry", num):
         #Loop over points in WP
-        for y in x:
-            symmetry[-1].append([])
-            #Loop over ops
-            for z in y:
-                op = SymmOp.from_xyz_string(z)
-                if convert is True:
-                    #Convert non-orthogonal trigonal/hexagonal operations
-                    op = P*op*P.inverse
-                if molecular is False:
-                    symmetry[-1][-1].append(op)
-                elif molecular is True:
-                    op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                    symmetry[-1][-1].append(op)
+        symmetry.append([ops_from_affine(y, convert=convert, molecular=molecular) for y in x])
     return symmetry
 
 def get_wyckoff_generators(sg, PBC=[1,1,1], molecular=False):
@@ -710,56 +933,16 @@ def get_wyckoff_generators(sg, PBC=[1,1,1], molecular=False):
         a 2d list of SymmOp objects which can be used to generate a Wyckoff position given a
         single fractional (x,y,z) coordinate
     """
-    if PBC != [1,1,1]:
-        coor = [0,0,0]
-        for i, a in enumerate(PBC):
-            if not a:
-                coor[i] = 0.5
-        coor = np.array(coor)
-    wyckoffs = get_wyckoffs(sg, PBC=PBC)
-
-    P = SymmOp.from_rotation_and_translation([[1,-.5,0],[0,math.sqrt(3)/2,0],[0,0,1]], [0,0,0])
-    generator_strings = eval(wyckoff_generators_df["0"][sg])
-    generators = []
     convert = False
     if molecular is True:
         if sg >= 143 and sg <= 194:
             convert = True
+    wyckoffs = read_symmetry_table("wyckoff", sg)
+    generators = []
     #Loop over Wyckoff positions
-    for x, w in zip(generator_strings, wyckoffs):
-        if PBC != [1,1,1]:
-            op = w[0]
-            coor1 = op.operate(coor)
-            invalid = False
-            for i, a in enumerate(PBC):
-                if not a:
-                    if not abs(coor1[i]-0.5) < 1e-2:
-                        invalid = True
-            if invalid == False:
-                generators.append([])
-                #Loop over ops
-                for y in x:
-                    op = SymmOp.from_xyz_string(y)
-                    if convert is True:
-                        #Convert non-orthogonal trigonal/hexagonal operations
-                        op = P*op*P.inverse
-                    if molecular is False:
-                        generators[-1].append(op)
-                    elif molecular is True:
-                        op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                        generators[-1].append(op)
-        else:
-            generators.append([])
-            for y in x:
-                op = SymmOp.from_xyz_string(y)
-                if convert is True:
-                    #Convert non-orthogonal trigonal/hexagonal operations
-                    op = P*op*P.inverse
-                if molecular is False:
-                    generators[-1].append(op)
-                elif molecular is True:
-                    op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                    generators[-1].append(op)
+    for x, valid in zip(read_symmetry_table("wyckoff_generators", sg), wyckoff_PBC_mask(wyckoffs, PBC)):
+        if valid:
+            generators.append(ops_from_affine(x, convert=convert, molecular=molecular))
     return generators
 
 def get_layer_generators(num, molecular=False):
@@ -784,28 +967,14 @@ def get_layer_generators(num, molecular=False):
         a 2d list of SymmOp objects which can be used to generate a Wyckoff position given a
         single fractional (x,y,z) coordinate
     """
-
-    P = SymmOp.from_rotation_and_translation([[1,-.5,0],[0,math.sqrt(3)/2,0],[0,0,1]], [0,0,0])
-    generator_strings = eval(layer_generators_df["0"][num])
-    generators = []
     convert = False
     if molecular is True:
         if num >= 65:
             convert = True
+    generators = []
     #Loop over Wyckoff positions
-    for x in generator_strings:
-        generators.append([])
-        #Loop over ops
-        for y in x:
-            op = SymmOp.from_xyz_string(y)
-            if convert is True:
-                #Convert non-orthogonal trigonal/hexagonal operations
-                op = P*op*P.inverse
-            if molecular is False:
-                generators[-1].append(op)
-            elif molecular is True:
-                op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                generators[-1].append(op)
+    for x in read_symmetry_table("layer_generators", num):
+        generators.append(ops_from_affine(x, convert=convert, molecular=molecular))
     return generators
 
 def get_rod_generators(num, molecular=False):
@@ -830,28 +999,14 @@ def get_rod_generators(num, molecular=False):
         a 2d list of SymmOp objects which can be used to generate a Wyckoff position given a
         single fractional (x,y,z) coordinate
     """
-
-    P = SymmOp.from_rotation_and_translation([[1,-.5,0],[0,math.sqrt(3)/2,0],[0,0,1]], [0,0,0])
-    generator_strings = eval(rod_generators_df["0"][num])
-    generators = []
     convert = False
     if molecular is True:
         if num >= 42:
             convert = True
+    generators = []
     #Loop over Wyckoff positions
-    for x in generator_strings:
-        generators.append([])
-        #Loop over ops
-        for y in x:
-            op = SymmOp.from_xyz_string(y)
-            if convert is True:
-                #Convert non-orthogonal trigonal/hexagonal operations
-                op = P*op*P.inverse
-            if molecular is False:
-                generators[-1].append(op)
-            elif molecular is True:
-                op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                generators[-1].append(op)
+    for x in read_symmetry_table("rod_generators", num):
+        generators.append(ops_from_affine(x, convert=convert, molecular=molecular))
     return generators
 
 def get_point_generators(num, molecular=True):
@@ -873,27 +1028,14 @@ def get_point_generators(num, molecular=True):
         a 2d list of SymmOp objects which can be used to generate a Wyckoff position given a
         single fractional (x,y,z) coordinate
     """
-    P = SymmOp.from_rotation_and_translation([[1,-.5,0],[0,math.sqrt(3)/2,0],[0,0,1]], [0,0,0])
-    generator_strings = eval(point_generators_df["0"][num])
-    generators = []
     convert = False
     if molecular is True:
         if num in range(16,28):
             convert = True
+    generators = []
     #Loop over Wyckoff positions
-    for x in generator_strings:
-        generators.append([])
-        #Loop over ops
-        for y in x:
-            op = SymmOp.from_xyz_string(y)
-            if convert is True:
-                #Convert non-orthogonal trigonal/hexagonal operations
-                op = P*op*P.inverse
-            if molecular is False:
-                generators[-1].append(op)
-            elif molecular is True:
-                op = SymmOp.from_rotation_and_translation(op.rotation_matrix,[0,0,0])
-                generators[-1].append(op)
+    for x in read_symmetry_table("point_generators", num):
+        generators.append(ops_from_affine(x, convert=convert, molecular=molecular))
     return generators
 
 def general_position(number, dim=3):
@@ -1058,7 +1200,7 @@ def check_wyckoff_position(points, group, tol=1e-3):
 
             if dsquared(xyz) > t: continue
             #Calculate distances between original and generated points
-            pw = np.array([op.operate(p) for op in wp])
+            pw = operate_many(p, group.rotations[i], group.translations[i])
             dw = distance_matrix_euclidean(points, pw, PBC=PBC, squared=True)
 
             #Check each row for a zero
@@ -1077,7 +1219,7 @@ def check_wyckoff_position(points, group, tol=1e-3):
                     break
 
             #Calculate distance between original and generated points
-            ps = np.array([op.operate(p) for op in w_symm_all[i][0]])
+            ps = apply_ops(p, w_symm_all[i][0])
             ds = distance_matrix_euclidean([p], ps, PBC=PBC, squared=True)
             #Check whether any generated points are too far away
             num = (ds > t).sum()
@@ -1481,6 +1623,8 @@ class Wyckoff_position():
         wp = Wyckoff_position()
         for key in dictionary:
             setattr(wp, key, dictionary[key])
+        if "ops" in dictionary:
+            wp.set_arrays()
         return wp
 
     def __str__(self):
@@ -1638,6 +1782,7 @@ class Wyckoff_position():
         elif dim == 0:
             #TODO: implement Clusters
             return Wyckoff_position.from_dict({"dim": 0})
+        wp.set_arrays()
         return wp
 
     def wyckoff_from_generating_op(gen_op, gen_pos):
@@ -1661,6 +1806,44 @@ class Wyckoff_position():
             symm.append(site_symm(op, gen_pos))
         return symm
 
+    def set_arrays(self):
+        """
+        Stores the operations and generators (Euclidean and not) of the Wyckoff
+        position as stacked rotation and translation arrays, which are used by
+        operate_many and mol_site. Called automatically when the object is created.
+        """
+        self.rotations, self.translations = stack_ops(self.ops)
+        """(m,3,3) rotation and (m,3) translation arrays for the operations in ops"""
+        try:
+            self.generator_rotations, self.generator_translations = stack_ops(self.generators)
+            """Stacked rotation and translation arrays for the operations in generators"""
+        except AttributeError:
+            pass
+        try:
+            self.generator_rotations_m, self.generator_translations_m = stack_ops(self.generators_m)
+            """Stacked rotation and translation arrays for the operations in generators_m"""
+        except AttributeError:
+            pass
+
+    def operate_many(self, points, generators=False):
+        """
+        Applies every operation of the Wyckoff position to one or more points
+        at once. For a single point, this is equivalent to
+        np.array([op.operate(point) for op in self.ops]).
+
+        Args:
+            points: a 3-vector, or a (K,3) array of 3-vectors
+            generators: if True, apply the Wyckoff generators instead of the
+                operations in ops
+
+        Returns:
+            an (m,3) array if points is a single 3-vector, or a (K,m,3) array
+            containing the images of each point, where m is the multiplicity
+        """
+        if generators is True:
+            return operate_many(points, self.generator_rotations, self.generator_translations)
+        return operate_many(points, self.rotations, self.translations)
+
     def __iter__(self):
         yield from self.ops
 
@@ -2086,6 +2269,10 @@ class Group():
             "PBC": self.PBC, "dim": self.dim, "number": self.number, "symbol": self.symbol} for i in range(len(self.wyckoffs))]
         self.Wyckoff_positions = [Wyckoff_position.from_dict(wpdict) for wpdict in wpdicts]
         """A list of Wyckoff_position objects, sorted by descending multiplicity"""
+        self.rotations = [wp.rotations for wp in self.Wyckoff_positions]
+        """A list of (m,3,3) rotation matrix arrays, one for each Wyckoff position"""
+        self.translations = [wp.translations for wp in self.Wyckoff_positions]
+        """A list of (m,3) translation vector arrays, one for each Wyckoff position"""
         self.wyckoffs_organized = organized_wyckoffs(self)
         """A 2D list of Wyckoff_position objects, grouped and sorted by
         multiplicity."""
@@ -2189,3 +2376,359 @@ class Group():
         """
         return self.Wyckoff_positions[0]
 
+
+#Group registry
+#------------------------------
+group_cache_size = 512
+"""The maximum number of Group objects kept by get_group. The least recently
+used groups are discarded first."""
+group_cache = OrderedDict()
+group_cache_lock = threading.Lock()
+
+def get_group(group, dim=3):
+    """
+    Returns a Group object for the given group and dimension. Groups are
+    memoized by (group, dim) in a process-wide registry, so repeated calls
+    (for example, when generating many crystals with the same symmetry) only
+    build the Wyckoff positions once. The registry is thread-safe and holds at
+    most group_cache_size groups. The returned Group is shared, and should not
+    be modified.
+
+    Args:
+        group: the group symbol or international number
+        dim: the periodic dimension of the group
+
+    Returns:
+        a Group object
+    """
+    key = (group, dim)
+    with group_cache_lock:
+        g = group_cache.get(key)
+        if g is not None:
+            group_cache.move_to_end(key)
+            return g
+    #Build outside of the lock, so that different groups can be built at once
+    g = Group(group, dim=dim)
+    #Do not store groups which failed to initialize
+    if not hasattr(g, "Wyckoff_positions"):
+        return g
+    with group_cache_lock:
+        g = group_cache.setdefault(key, g)
+        group_cache.move_to_end(key)
+        while len(group_cache) > group_cache_size:
+            group_cache.popitem(last=False)
+    return g
+
+def set_group_cache_size(size):
+    """
+    Sets the maximum number of Group objects kept by get_group, discarding the
+    least recently used groups if needed.
+
+    Args:
+        size: the new maximum number of groups. 0 disables the registry
+    """
+    global group_cache_size
+    with group_cache_lock:
+        group_cache_size = int(size)
+        while len(group_cache) > group_cache_size:
+            group_cache.popitem(last=False)
+
+def clear_group_cache():
+    """
+    Removes all Group objects from the registry used by get_group.
+    """
+    with group_cache_lock:
+        group_cache.clear()
+
+#Disk cache
+#------------------------------
+cache_dir = os.environ.get("PYXTAL_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "pyxtal"))
+"""The directory in which results that are expensive to compute (such as
+Wyckoff combinations) are kept between runs. Defaults to the PYXTAL_CACHE
+environment variable, or ~/.cache/pyxtal. Set to None to disable the disk
+cache."""
+
+def cache_path(*parts):
+    """
+    Returns the path of a file in the disk cache, or None if the disk cache is
+    disabled.
+
+    Args:
+        *parts: the subdirectory and file name within cache_dir
+    """
+    if cache_dir is None:
+        return None
+    return os.path.join(cache_dir, *parts)
+
+def write_cache_file(path, write):
+    """
+    Writes a file in the disk cache. The data is written to a temporary file
+    which is then renamed, so that readers never see a partial file and
+    several processes may write the same file at once. Errors (for example,
+    a read-only cache directory) are ignored.
+
+    Args:
+        path: the path returned by cache_path
+        write: a function which writes the data to a given file object
+    """
+    if path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                write(f)
+            os.replace(tmp, path)
+        except:
+            os.remove(tmp)
+            raise
+    except OSError:
+        pass
+
+#Wyckoff combinations
+#------------------------------
+wyckoff_combinations_max = 10000
+"""The largest number of Wyckoff combinations which are listed explicitly.
+Above this, Wyckoff_combinations only stores the counts."""
+wyckoff_combinations_min_time = 0.05
+"""Wyckoff combinations which take less than this many seconds to compute are
+not stored in the disk cache, since reading them back would not be faster."""
+wyckoff_combinations_version = 1
+"""The version of the Wyckoff combinations stored in the disk cache. Increase
+it whenever the way they are computed changes, so that stored files are
+recomputed."""
+wyckoff_combinations_cache = {}
+wyckoff_combinations_lock = threading.Lock()
+
+class Wyckoff_combinations():
+    """
+    Class for the ways to place a given number of atoms (or molecules) of each
+    specie into the Wyckoff positions of a group. A combination is a multiset
+    of Wyckoff positions for each specie whose multiplicities add up to the
+    number of atoms of that specie. Positions without degrees of freedom (for
+    example, 4a in Fm-3m) can be occupied at most once, by a single specie.
+    Positions with degrees of freedom may be used any number of times.
+
+    The combinations are counted exactly with a dynamic program over the
+    Wyckoff positions. If there are no more than wyckoff_combinations_max of
+    them, they are also listed. Use get_wyckoff_combinations to obtain a
+    memoized object.
+
+    Args:
+        group: a Group object
+        numIons: the number of atoms of each specie in the conventional cell
+        allowed: an optional list with, for each specie, a list of booleans
+            for whether each Wyckoff position may be used. Used for molecules,
+            which only fit into positions with valid orientations
+        data: an optional dictionary of counts and combinations (as saved by
+            to_dict), used instead of computing them
+    """
+    def __init__(self, group, numIons, allowed=None, data=None):
+        self.numIons = tuple(int(n) for n in numIons)
+        """The number of atoms of each specie"""
+        self.multiplicities = [wp.multiplicity for wp in group.Wyckoff_positions]
+        """The multiplicity of each Wyckoff position, by index in the group"""
+        self.free = [not np.allclose(wp.ops[0].rotation_matrix, 0) for wp in group.Wyckoff_positions]
+        """Whether or not each Wyckoff position has any degrees of freedom"""
+        if allowed is None:
+            allowed = [[True]*len(self.multiplicities) for n in self.numIons]
+        self.allowed = [[bool(a) for a in x] for x in allowed]
+        self.memo = {}
+        if data is None:
+            self.count = self.count_completions(self.numIons)
+            """The number of valid combinations"""
+            self.count_fixed = self.count_completions(self.numIons, fixed_only=True)
+            """The number of valid combinations which only use Wyckoff positions
+            without degrees of freedom"""
+            self.combinations = None
+            """A list of all valid combinations, or None if there are more than
+            wyckoff_combinations_max. Each combination is a tuple with, for
+            each specie, a sorted tuple of Wyckoff position indices"""
+            if self.count <= wyckoff_combinations_max:
+                self.combinations = list(self.iterate())
+        else:
+            self.count = data["count"]
+            self.count_fixed = data["count_fixed"]
+            self.combinations = data["combinations"]
+            if self.combinations is not None:
+                self.combinations = [tuple(tuple(x) for x in c) for c in self.combinations]
+
+    def to_dict(self):
+        return {"version": [symmetry_db_version, wyckoff_combinations_version],
+            "count": self.count, "count_fixed": self.count_fixed,
+            "combinations": self.combinations}
+
+    def options(self, i, s, remaining, used, fixed_only):
+        """
+        Lists the choices for Wyckoff position i in the dynamic program. For a
+        position with degrees of freedom, the choice is how many times specie s
+        uses it. For a position without, it is which specie (if any) takes it.
+
+        Returns:
+            a list of (added, state), where added is a list of
+            (specie, number of times) and state is the next (i, s, remaining)
+        """
+        m = self.multiplicities[i]
+        nspecies = len(remaining)
+        result = []
+        if self.free[i]:
+            if s+1 == nspecies:
+                next_i, next_s = i+1, 0
+            else:
+                next_i, next_s = i, s+1
+            kmax = 0
+            if self.allowed[s][i] and not fixed_only:
+                kmax = remaining[s] // m
+            for k in range(kmax+1):
+                r = list(remaining)
+                r[s] -= k*m
+                result.append(([(s, k)], (next_i, next_s, tuple(r))))
+        else:
+            result.append(([], (i+1, 0, remaining)))
+            if i not in used:
+                for t in range(nspecies):
+                    if self.allowed[t][i] and remaining[t] >= m:
+                        r = list(remaining)
+                        r[t] -= m
+                        result.append(([(t, 1)], (i+1, 0, tuple(r))))
+        return result
+
+    def count_completions(self, remaining, used=frozenset(), fixed_only=False):
+        """
+        Counts the ways to place a number of remaining atoms, given a set of
+        Wyckoff positions (without degrees of freedom) which are already used.
+
+        Args:
+            remaining: the number of atoms of each specie still to be placed
+            used: a set of Wyckoff position indices already occupied
+            fixed_only: if True, only count combinations which do not use any
+                positions with degrees of freedom
+
+        Returns:
+            the number of combinations (an integer)
+        """
+        remaining = tuple(int(r) for r in remaining)
+        used = frozenset(i for i in used if not self.free[i])
+        key = (remaining, used, fixed_only)
+        if key in self.memo:
+            return self.memo[key]
+        counts = self.count_table(remaining, used, fixed_only)
+        result = counts[(0, 0, remaining)]
+        self.memo[key] = result
+        return result
+
+    def count_table(self, remaining, used, fixed_only):
+        #Fill the table of completions from the last Wyckoff position backwards
+        if min(remaining) < 0:
+            return {(0, 0, remaining): 0}
+        nwp = len(self.multiplicities)
+        counts = {}
+        stack = [(0, 0, remaining)]
+        while stack:
+            state = stack[-1]
+            if state in counts:
+                stack.pop()
+                continue
+            i, s, r = state
+            if i == nwp:
+                counts[state] = 1 if not any(r) else 0
+                stack.pop()
+                continue
+            opts = self.options(i, s, r, used, fixed_only)
+            missing = [st for added, st in opts if st not in counts]
+            if missing:
+                stack += missing
+            else:
+                counts[state] = sum(counts[st] for added, st in opts)
+                stack.pop()
+        return counts
+
+    def iterate(self, remaining=None, used=frozenset()):
+        """
+        Iterates over every valid combination.
+
+        Returns:
+            a generator of combinations
+        """
+        if remaining is None:
+            remaining = self.numIons
+        remaining = tuple(remaining)
+        counts = self.count_table(remaining, used, False)
+        nspecies = len(remaining)
+        def walk(state, chosen):
+            if counts[state] == 0:
+                return
+            i, s, r = state
+            if i == len(self.multiplicities):
+                yield tuple(tuple(sorted(c)) for c in chosen)
+                return
+            for added, st in self.options(i, s, r, used, False):
+                new = [list(c) for c in chosen]
+                for t, k in added:
+                    new[t] += [i]*k
+                yield from walk(st, new)
+        yield from walk((0, 0, remaining), [[] for n in remaining])
+
+    def completable(self, remaining, used):
+        """
+        Checks whether the remaining atoms can still be placed, given the
+        Wyckoff positions which are already occupied.
+
+        Args:
+            remaining: the number of atoms of each specie still to be placed
+            used: the indices of the Wyckoff positions already occupied
+
+        Returns:
+            True or False
+        """
+        return self.count_completions(remaining, used) > 0
+
+def get_wyckoff_combinations(group, numIons, allowed=None):
+    """
+    Returns the Wyckoff_combinations for placing numIons atoms into a group.
+    Results are memoized in memory, and on disk (see cache_dir) by group,
+    dimension and numIons (and the allowed positions, if given). Only results
+    which take at least wyckoff_combinations_min_time to compute are stored
+    on disk. Stored files from other versions of the symmetry database or of
+    Wyckoff_combinations are recomputed.
+
+    Args:
+        group: a Group object
+        numIons: the number of atoms of each specie in the conventional cell
+        allowed: an optional list with, for each specie, a list of booleans
+            for whether each Wyckoff position may be used
+
+    Returns:
+        a Wyckoff_combinations object
+    """
+    numIons = tuple(int(n) for n in numIons)
+    name = str(group.dim) + "_" + str(group.number if group.number is not None else group.symbol)
+    name += "_" + "-".join(str(n) for n in numIons)
+    if allowed is not None:
+        bits = "".join("1" if a else "0" for x in allowed for a in x)
+        name += "_" + hashlib.sha1(bits.encode()).hexdigest()[:12]
+    #Non-crystallographic point groups are not numbered, and are not stored
+    #on disk
+    persistent = group.number is not None
+    with wyckoff_combinations_lock:
+        if name in wyckoff_combinations_cache:
+            return wyckoff_combinations_cache[name]
+    path = cache_path("wyckoff_combinations", name + ".json") if persistent else None
+    wc = None
+    if path is not None and os.path.exists(path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("version") == [symmetry_db_version, wyckoff_combinations_version]:
+                wc = Wyckoff_combinations(group, numIons, allowed, data=data)
+        except (OSError, ValueError, KeyError, AttributeError):
+            wc = None
+    if wc is None:
+        t = time()
+        wc = Wyckoff_combinations(group, numIons, allowed)
+        if time() - t >= wyckoff_combinations_min_time:
+            data = json.dumps(wc.to_dict()).encode()
+            write_cache_file(path, lambda f: f.write(data))
+    with wyckoff_combinations_lock:
+        return wyckoff_combinations_cache.setdefault(name, wc)
@@ -851,6 +851,17 @@ def test_modules():
                 except:
                     fail("Could not access class methods")
 
+    if passed():
+        try:
+            for i in range(1, 106):
+                ele = Element(i)
+                if Element(ele.short_name).z != i or Element(ele.long_name).z != i:
+                    fail("Element lookup does not match for element # "+str(i))
+            if Element("Xx").z is not None or Element(200).short_name is not None:
+                fail("Invalid element was found")
+        except Exception as e:
+            fail(e)
+
     check()
 
     #=====database.hall=====
@@ -956,6 +967,29 @@ def test_modules():
 
     check()
 
+    print("  get_rng")
+    try:
+        from pyxtal.operations import get_rng
+        from pyxtal.operations import random_vector
+        from pyxtal.operations import aa2matrix
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            draws = []
+            for i in range(2):
+                rng = np.random.default_rng(42)
+                draws.append(np.concatenate([random_vector(rng=rng), aa2matrix(1, 1, random=True, rng=rng).ravel()]))
+            if not np.allclose(draws[0], draws[1]):
+                fail("Draws with the same seed differ")
+            elif get_rng(rng) is not rng or get_rng() is None:
+                fail("Wrong generator returned")
+        except Exception as e:
+            fail(e)
+
+    check()
+
     print("  angle")
     try:
         from pyxtal.operations import angle
@@ -1167,6 +1201,28 @@ def test_modules():
 
     check()
 
+    print("  read_symmetry_table")
+    try:
+        from pyxtal.symmetry import read_symmetry_table
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            ops = read_symmetry_table("wyckoff", 230)
+            op = SymmOp.from_xyz_string('y+1/4, -x+1/4, z+3/4')
+            if len(ops) != 8 or len(ops[0]) != 96 or len(ops[-1]) != 16:
+                fail("Wrong number of operations in compiled database")
+            elif not np.allclose(ops[0][14], op.affine_matrix):
+                fail("Compiled operation does not match the csv database")
+            ss = read_symmetry_table("layer_symmetry", 80)
+            if len(ss[0]) != 24 or len(ss[0][0]) != 1:
+                fail("Wrong site symmetry in compiled database")
+        except Exception as e:
+            fail(e)
+
+    check()
+
     print("  letter_from_index")
     try:
         from pyxtal.symmetry import letter_from_index
@@ -1273,6 +1329,52 @@ def test_modules():
 
     check()
 
+    print("  find_pairs")
+    try:
+        from pyxtal.symmetry import find_pairs
+        from pyxtal.symmetry import distance_matrix
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            lattice = np.array([[4.,0.,0.],[3.,3.,0.],[1.,1.,5.]])
+            for n in [5, 200]:
+                points = np.random.random([n,3])
+                d = distance_matrix(points, points, lattice)
+                i, j, ds = find_pairs(points, points, lattice, 2.0)
+                if not np.allclose(ds, d[i,j]):
+                    fail("find_pairs distances do not match distance_matrix")
+                if not np.array_equal(np.sort(d[d <= 2.0]), np.sort(ds)):
+                    fail("find_pairs missed a pair")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  Wyckoff_position.operate_many")
+    try:
+        from pyxtal.operations import apply_ops
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            wp = Wyckoff_position.from_group_and_index(227, 0)
+            points = np.random.random([5,3])
+            coords = wp.operate_many(points)
+            if coords.shape != (5, len(wp), 3):
+                fail("Wrong shape for batched Wyckoff operations")
+            for p, c in zip(points, coords):
+                if not np.allclose(c, [op.operate(p) for op in wp]):
+                    fail("Batched operations do not match SymmOp.operate")
+                if not np.allclose(c, apply_ops(p, wp.ops)):
+                    fail("apply_ops does not match operate_many")
+        except Exception as e:
+            fail(e)
+
+    check()
+
     print("  Group")
     try:
         from pyxtal.symmetry import Group
@@ -1289,6 +1391,83 @@ def test_modules():
 
     check()
 
+    print("  get_group")
+    try:
+        from pyxtal.symmetry import get_group
+        from pyxtal.symmetry import set_group_cache_size
+        from pyxtal.symmetry import group_cache
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            g = get_group(225)
+            if get_group(225) is not g or get_group(225, dim=3) is not g:
+                fail("Group registry returned a new object")
+            if get_group(47, dim=2) is get_group(47):
+                fail("Group registry mixed up dimensions")
+            set_group_cache_size(2)
+            get_group(1)
+            if len(group_cache) != 2 or (225, 3) in group_cache:
+                fail("Group registry did not discard the oldest group")
+            set_group_cache_size(512)
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  get_wyckoff_combinations")
+    try:
+        import pyxtal.symmetry
+        from pyxtal.symmetry import get_wyckoff_combinations
+        from pyxtal.symmetry import wyckoff_combinations_cache, cache_path
+        from tempfile import mkdtemp
+        import json
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            default_dir = pyxtal.symmetry.cache_dir
+            default_time = pyxtal.symmetry.wyckoff_combinations_min_time
+            pyxtal.symmetry.cache_dir = mkdtemp()
+            pyxtal.symmetry.wyckoff_combinations_min_time = 0
+            try:
+                g = get_group(14)
+                wc = get_wyckoff_combinations(g, [4])
+                if wc.count != 7 or wc.count_fixed != 6 or len(wc.combinations) != 7:
+                    fail("Wrong combinations for 4 atoms in P2_1/c")
+                if ((0,),) not in wc.combinations:
+                    fail("Wrong combinations for 4 atoms in P2_1/c")
+                if get_wyckoff_combinations(g, [3]).count != 0:
+                    fail("Found combinations for 3 atoms in P2_1/c")
+                if wc.completable([2], [1, 2, 3, 4]) or not wc.completable([2], [1, 2, 3]):
+                    fail("Occupied Wyckoff positions were not excluded")
+                wc = get_wyckoff_combinations(get_group(221), [48, 48])
+                if wc.combinations is not None or not wc.completable([48, 48], []):
+                    fail("Large numbers of combinations were listed")
+                wyckoff_combinations_cache.clear()
+                if get_wyckoff_combinations(get_group(221), [48, 48]).count != wc.count:
+                    fail("Combinations were not read back from disk")
+                #Files from another version are recomputed
+                path = cache_path("wyckoff_combinations", "3_14_4.json")
+                with open(path) as f:
+                    data = json.load(f)
+                data["version"][-1] -= 1
+                data["count"] = 0
+                with open(path, "w") as f:
+                    json.dump(data, f)
+                wyckoff_combinations_cache.clear()
+                if get_wyckoff_combinations(g, [4]).count != 7:
+                    fail("Combinations from another version were used")
+            finally:
+                pyxtal.symmetry.cache_dir = default_dir
+                pyxtal.symmetry.wyckoff_combinations_min_time = default_time
+        except Exception as e:
+            fail(e)
+
+    check()
+
     #=====crystal=====
     print("pyxtal.crystal")
     reset()
@@ -1297,6 +1476,114 @@ def test_modules():
     except Exception as e:
         fail(e)
 
+    print("  Tol_matrix")
+    try:
+        from pyxtal.crystal import Tol_matrix
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            tm = Tol_matrix(("C", "N", 1.5), prototype="molecular")
+            species1 = ["C", "N", 8, "Si"]
+            species2 = ["H", "C"]
+            tols = tm.get_tols(species1, species2)
+            if tols.shape != (4, 2):
+                fail("Wrong shape for tolerance block")
+            for i, s1 in enumerate(species1):
+                for j, s2 in enumerate(species2):
+                    if tols[i][j] != tm.get_tol(s1, s2):
+                        fail("get_tols does not match get_tol")
+            if tm.get_tols(["N"], ["C"])[0][0] != 1.5:
+                fail("Custom tolerance was not used")
+            if Tol_matrix(prototype="molecular").get_tol("C", "N") == 1.5:
+                fail("Custom tolerance changed the shared default matrix")
+            metallic = Tol_matrix(prototype="metallic").matrix
+            if not np.allclose(metallic, metallic.T, equal_nan=True):
+                fail("Tolerance matrix is not symmetric")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  Occupied_space")
+    try:
+        from pyxtal.crystal import Occupied_space
+        from pyxtal.crystal import Tol_matrix
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            tm = Tol_matrix(prototype="atomic")
+            space = Occupied_space(np.eye(3)*4.0, tm.get_tol('C', 'C'), tm=tm)
+            if space.test([[0.,0.,0.],[.5,.5,.5]], ['C','C']) is True:
+                space.commit(site="site 1")
+                space.checkpoint()
+            else:
+                fail("Empty space rejected new atoms")
+            if space.test([[.99,0.,0.]], ['C']) is not False:
+                fail("Periodic image was not found")
+            if space.test([[0.,.5,.5]], ['C']) is True:
+                space.commit(site="site 2")
+            else:
+                fail("Distant atom was rejected")
+            space.rollback()
+            if len(space) != 2 or space.test([[0.,.5,.5]], ['C']) is not True:
+                fail("Rollback did not remove the newest atoms")
+            elif space.get_sites() != ["site 1"]:
+                fail("Rollback did not remove the newest site")
+            space = Occupied_space(np.eye(3)*4.0, tm.get_tol('C', 'C'), tm=tm)
+            space.commit([[0.,0.,0.]], ['C'], labels=[0])
+            if space.test([[.05,0.,0.]], ['C'], labels=[0]) is not True:
+                fail("Atoms with the same label were checked")
+            if space.test([[.05,0.,0.]], ['C'], labels=[1]) is not False:
+                fail("Atoms with different labels were not checked")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  Lattice")
+    try:
+        from pyxtal.crystal import Lattice
+        from pyxtal.crystal import generate_lattice_batch
+        from pyxtal.crystal import Generator, random_crystal
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            rng = np.random.default_rng(0)
+            para = generate_lattice_batch("triclinic", 100.0, size=500, minvec=2.0, rng=rng, min_l=3.0)
+            if len(para) == 0 or len(para) > 500:
+                fail("Wrong number of batched lattices")
+            l = np.sort(para[:,:3], axis=1)
+            if (l[:,0] < 3.0).any() or (l[:,2]/l[:,0] >= 10.0).any():
+                fail("Batched lattices do not meet the length limits")
+            if (para[:,3:] <= np.pi/6).any() or (para[:,3:] >= 5*np.pi/6).any():
+                fail("Batched lattices do not meet the angle limits")
+            lat = Lattice("monoclinic", 100.0)
+            lat.reset_matrix(rng=rng)
+            if not np.isclose(np.linalg.det(lat.get_matrix()), 100.0):
+                fail("Lattice from the pool has the wrong volume")
+            n = len(lat.pool)
+            lat.reset_matrix(rng=rng)
+            if len(lat.pool) != n-1:
+                fail("Lattice did not take the next cell from its pool")
+            lat.volume = 200.0
+            lat.reset_matrix(rng=rng)
+            if not np.isclose(np.linalg.det(lat.get_matrix()), 200.0):
+                fail("Lattice pool was not refilled for the new volume")
+            g = Generator(random_crystal, 14, ['C'], [4], 1.0)
+            cells = [tuple(np.round(c.lattice_matrix, 6).flatten()) for c in g.sample_many(6) if c.valid]
+            if len(cells) > 1 and len(set(cells)) == 1:
+                fail("Unseeded samples share their lattice")
+        except Exception as e:
+            fail(e)
+
+    check()
+
     print("  random_crystal")
     try:
         from pyxtal.crystal import random_crystal
@@ -1310,6 +1597,12 @@ def test_modules():
                 pass
             else:
                 fail()
+            if "_struct" in vars(c):
+                fail("Structure was built before it was used")
+            if c.struct.num_sites != 1 or c.struct is not c.struct:
+                fail("Structure was not built and cached")
+            if list(c.spg_struct[2]) != [1] or c.numbers[0] != 1:
+                fail("Wrong atomic numbers")
         except Exception as e:
             fail(e)
 
@@ -1333,6 +1626,287 @@ def test_modules():
 
     check()
 
+    print("  Generator")
+    try:
+        from pyxtal.crystal import Generator
+        from pyxtal.crystal import random_crystal
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            gen = Generator(random_crystal, 225, ['C'], [4], 1.0)
+            crystals = list(gen.sample_many(3))
+            if len(crystals) != 3 or not all(c.valid for c in crystals):
+                fail("Could not generate crystals from the prepared setup")
+            elif crystals[0].lattice is crystals[1].lattice or crystals[0].struct is crystals[1].struct:
+                fail("Generated crystals share state")
+            elif crystals[0].group is not gen.template.group:
+                fail("Setup was repeated for each crystal")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  generate_parallel")
+    try:
+        from pyxtal.crystal import Generator
+        from pyxtal.crystal import generate_parallel
+        from pyxtal.crystal import get_seeds
+        from pyxtal.crystal import random_crystal
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            gen = Generator(random_crystal, 19, ['C', 'Si'], [4, 4], 1.0)
+            results = dict(generate_parallel(gen, 4, workers=2, seed=1))
+            c = gen.sample(seed=get_seeds(1, 4)[2])
+            if sorted(results.keys()) != [0, 1, 2, 3]:
+                fail("Missing results")
+            elif results[2].group is not gen.template.group:
+                fail("Shared attributes were not restored")
+            elif not np.allclose(c.coordinates, results[2].coordinates):
+                fail("Could not regenerate a crystal from its seed")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  random_crystal with rng")
+    try:
+        from pyxtal.crystal import random_crystal
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            c = random_crystal(14, ['C'], [8], 1.0, generate=False)
+            results = []
+            for i in range(2):
+                c.generate_crystal(rng=np.random.default_rng(7))
+                if c.valid:
+                    results.append((c.lattice_matrix, c.coordinates))
+            if len(results) != 2:
+                fail("Could not generate crystal")
+            elif not (np.allclose(results[0][0], results[1][0]) and np.allclose(results[0][1], results[1][1])):
+                fail("Crystals generated with the same seed differ")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  sample_wyckoff")
+    try:
+        from pyxtal.crystal import sample_wyckoff
+        from pyxtal.symmetry import Group
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            g = Group(225)
+            wp = g.get_wyckoff_position("24d")
+            coords, point = sample_wyckoff(wp, [0.3, 0.6, 0.1], np.eye(3)*5, 0.5)
+            if len(coords) != 24 or not np.allclose(point, wp[0].operate([0.3, 0.6, 0.1])):
+                fail("Point was not placed into the Wyckoff position")
+            wp = g.get_wyckoff_position("24e")
+            coords, point = sample_wyckoff(wp, [0.01, 0.5, 0.5], np.eye(3)*5, 0.5)
+            if coords is not None:
+                fail("Overlapping points were not rejected")
+            c = random_crystal(225, ['Na', 'Cl'], [1, 1], 1.0, generate=False)
+            c.generate_crystal(merge=False)
+            if not c.valid:
+                fail("Could not generate crystal without merging")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  Generation_stats")
+    try:
+        from pyxtal.crystal import Generation_stats
+        from pyxtal.crystal import Generator
+        import json
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            g = Generator(random_crystal, 225, ['Na', 'Cl'], [1, 1], 1.0)
+            crystals = list(g.sample_many(2))
+            stats = crystals[0].stats
+            if stats.structures != 1 or stats.attempts["cycle1"] < 1 or stats.attempts["cycle3"] < 2:
+                fail("Attempts were not counted")
+            if g.stats.structures != 2 or g.stats.valid != sum(c.valid for c in crystals):
+                fail("Generator did not add up the stats")
+            d = json.loads(g.stats.to_json())
+            if Generation_stats.from_dict(d).to_dict() != g.stats.to_dict():
+                fail("Stats changed after exporting to JSON")
+            stats = Generation_stats()
+            stats.reject("distance:C-O")
+            stats.reject("distance:C-O")
+            stats.add(g.stats)
+            if stats.rejections["distance:C-O"] != 2 or stats.structures != 2:
+                fail("Stats were not added")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  Observer")
+    try:
+        from pyxtal.crystal import Observer
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            class Counter(Observer):
+                def __init__(self):
+                    self.calls = {}
+                def count(self, name):
+                    self.calls[name] = self.calls.get(name, 0) + 1
+                def on_lattice(self, matrix): self.count("lattice")
+                def on_trial(self, wp, point): self.count("trial")
+                def on_reject(self, reason, data): self.count("reject")
+                def on_accept(self, site): self.count("accept")
+                def on_rollback(self, sites): self.calls["rollback"] = self.calls.get("rollback", 0) + len(sites)
+                def on_finish(self, crystal): self.count("finish")
+                def on_message(self, text): self.count("message")
+            o = Counter()
+            c = random_crystal(225, ['Na', 'Cl'], [1, 1], 1.0, observer=o)
+            if c.valid:
+                if o.calls.get("finish") != 1 or o.calls.get("accept", 0) - o.calls.get("rollback", 0) != len(c.wyckoff_sites):
+                    fail("Observer was not notified")
+                if o.calls["trial"] != o.calls["accept"] + o.calls.get("reject", 0):
+                    fail("Observer was not notified")
+            o = Counter()
+            c = random_crystal(225, ['C', 'N', 'O'], [1, 1, 1], 1.0, observer=o)
+            if c.valid is not False or o.calls.get("message") != 1:
+                fail("Messages were not passed to the observer")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  Scheduler")
+    try:
+        from pyxtal.crystal import Scheduler
+        from pyxtal.operations import set_seed
+        from contextlib import redirect_stdout
+        import io
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            g = Generator(random_crystal, 225, ['Na', 'Cl'], [1, 1], 1.0)
+            c = g.sample(seed=1, scheduler=Scheduler(time_limit=10))
+            if not c.valid or c.stats.valid != 1:
+                fail("Could not generate crystal with a time limit")
+            #Seed both the volume estimate and the generation, since the
+            #volume is only grown if distance failures dominate
+            set_seed(0)
+            g = Generator(random_crystal, 14, ['C', 'O'], [16, 16], 0.1)
+            stats = Scheduler(max_trials=200, growth=1.5, max_factor=0.2, patience=1).generate(g.template, rng=np.random.default_rng(0))
+            c = g.template
+            if stats.attempts["cycle3"] > 250 or c.stats is not stats:
+                fail("Scheduler did not stop at the trial budget")
+            if c.valid is False:
+                if stats.rejections.get("budget") != 1 or not 0.1 < c.factor <= 0.2:
+                    fail("Scheduler did not grow the volume")
+            #No valid lattice exists, so no Wyckoff position is ever tried
+            c = random_crystal(225, ['C'], [4], 1.0, generate=False)
+            c.lattice = Lattice("cubic", c.volume, min_l=50.0)
+            out = io.StringIO()
+            with redirect_stdout(out):
+                stats = Scheduler(max_trials=200).generate(c)
+            if c.valid or stats.attempts["cycle1"] > 30:
+                fail("Scheduler did not stop without valid lattices")
+            if "lattice" in out.getvalue():
+                fail("Lattice failures were printed")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  Fingerprint_filter")
+    try:
+        from pyxtal.crystal import Fingerprint_filter
+        import numpy as np
+        import copy
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            #Only one C4 structure exists in group 225 for a fixed volume
+            g = Generator(random_crystal, 225, ['C'], [4], 1.0)
+            f = Fingerprint_filter()
+            crystals = [c for i, c in generate_parallel(g, 5, workers=1, seed=3, unique=f)]
+            if len(crystals) != 1 or f.duplicates != 4 or g.stats.rejections["duplicate"] != 4:
+                fail("Duplicate structures were not dropped")
+            g = Generator(random_crystal, 14, ['C'], [4], 1.0)
+            f = Fingerprint_filter()
+            crystals = [c for c in g.sample_many(5, unique=f) if c.valid]
+            if len(f) != len(crystals):
+                fail("Distinct structures were dropped")
+            if crystals and f.add(crystals[0]) is not False:
+                fail("Repeated structure was not found")
+            if crystals:
+                #The same structure in a different choice of unit cell
+                c = copy.copy(crystals[0])
+                T = np.array([[1,0,0],[1,1,0],[0,-1,1]])
+                c.lattice_matrix = np.dot(T, crystals[0].lattice_matrix)
+                c.coordinates = np.dot(crystals[0].coordinates, np.linalg.inv(T))
+                if f.add(c) is not False:
+                    fail("Repeated structure in another cell was not found")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  Structure_writer")
+    try:
+        from pyxtal.crystal import Structure_writer
+        from pymatgen.io.cif import CifParser
+        import tempfile, gzip, os
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            crystals = [random_crystal(sg, ['C', 'O'], [4, 4], 1.0) for sg in [14, 194]]
+            crystals = [c for c in crystals if c.valid]
+            directory = tempfile.mkdtemp()
+            filename = os.path.join(directory, "out.cif.gz")
+            with Structure_writer(filename) as writer:
+                for c in crystals:
+                    writer.write(c)
+            with gzip.open(filename, "rt") as f:
+                text = f.read()
+            offsets = [int(x) for x in open(filename+".idx")]
+            if len(offsets) != len(crystals) or any(not text[o:].startswith("data_") for o in offsets):
+                fail("Wrong offsets")
+            structs = CifParser.from_string(text).get_structures(primitive=False)
+            if [len(s) for s in structs] != [len(c.sites) for c in crystals]:
+                fail("Symmetric cif blocks do not give the full structures")
+            with Structure_writer(os.path.join(directory, "out.extxyz"), index=False) as writer:
+                for c in crystals:
+                    writer.write(c)
+            if len(open(os.path.join(directory, "out.extxyz")).readlines()) != sum(len(c.sites)+2 for c in crystals):
+                fail("Wrong number of lines in extxyz file")
+            try:
+                Structure_writer(os.path.join(directory, "out.vasp"), fmt="vasp")
+                fail("Unsupported format was accepted")
+            except ValueError:
+                pass
+        except Exception as e:
+            fail(e)
+
+    check()
+
     #=====molecule=====
     print("pyxtal.molecule")
     reset()
@@ -1420,6 +1994,27 @@ def test_modules():
 
     check()
 
+    print("  find_ellipsoid")
+    try:
+        from pyxtal.molecule import find_ellipsoid
+        import numpy as np
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            for mol in [h2o, ch4]:
+                e = find_ellipsoid(mol)
+                u = np.linalg.solve(e.rotation_matrix, (mol.cart_coords - e.translation_vector).T)
+                if np.linalg.norm(u, axis=0).max() > 1 + 1e-8:
+                    fail("Atoms outside of the ellipsoid")
+                if abs(np.linalg.det(e.rotation_matrix)) > 8 * np.linalg.norm(mol.cart_coords, axis=1).max()**3 + 1:
+                    fail("Ellipsoid is too large")
+        except Exception as e:
+            fail(e)
+
+    check()
+
     #=====molecular_crystal=====
     print("pyxtal.molecular_crystal")
     reset()
@@ -1446,6 +2041,181 @@ def test_modules():
 
     check()
 
+    print("  mol_site")
+    try:
+        from pyxtal.molecular_crystal import mol_site
+        from pyxtal.molecule import mol_from_collection
+        from pyxtal.symmetry import Group
+        from pyxtal.operations import Orientation, aa2matrix
+        import numpy as np
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            mol = mol_from_collection('H2O')
+            wp = Group(14)[0]
+            lattice = np.array([[5.,0,0],[0,6.,0],[-1.,0,7.]])
+            ori = Orientation(aa2matrix(1,1,random=True))
+            ms = mol_site(mol, np.array([0.1,0.2,0.3]), ori, wp, lattice)
+            coords, species = ms.get_coords_and_species()
+            expected = []
+            for op, op_m in zip(wp.generators, wp.generators_m):
+                center = np.dot(op.operate(ms.position), lattice)
+                for site in mol:
+                    expected.append(np.dot(op_m.operate(np.dot(ori.matrix, site.coords)) + center, np.linalg.inv(lattice)))
+            if not np.allclose(coords, expected):
+                fail("Wrong coordinates")
+            if species != [site.specie.name for site in mol]*4:
+                fail("Wrong species")
+            if ms.get_coords_and_species()[0] is not coords:
+                fail("Coordinates not cached")
+            if not np.allclose(ms.get_coords_and_species(absolute=True)[0], np.dot(coords, lattice)):
+                fail("Wrong absolute coordinates")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  check_ellipsoids")
+    try:
+        from pyxtal.molecular_crystal import ellipsoids_overlap, check_ellipsoids, find_overlapping_mol_site, molecular_crystal
+        import numpy as np
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            #Spheres of radius 1 and 2
+            axes1 = np.repeat(np.identity(3)[None], 4, axis=0)
+            axes2 = 2 * axes1
+            vectors = np.array([[2.9,0,0], [0,3.1,0], [1.5,1.5,1.5], [0,0,0.5]])
+            if list(ellipsoids_overlap(axes1, axes2, vectors)) != [True, False, True, True]:
+                fail("Wrong overlap of spheres")
+            lattice = np.identity(3) * 5
+            centers = np.array([[0.,0,0]])
+            if check_ellipsoids(axes1[:1], centers, axes1[:1], centers, lattice, same=True) is not True:
+                fail("Sphere overlaps with its images")
+            if check_ellipsoids(3*axes1[:1], centers, 3*axes1[:1], centers, lattice, same=True) is not False:
+                fail("Sphere does not overlap with its images")
+            c = molecular_crystal(14, ['benzene'], [4], 1.0, check_atomic_distances=False)
+            if c.valid is not True:
+                fail("Could not generate crystal with ellipsoid checks")
+            c = molecular_crystal(19, ['CH4', 'H2O'], [4, 4], 1.0, check_atomic_distances=False)
+            if c.valid is not True:
+                fail("Could not generate crystal with ellipsoid checks")
+            ms1, ms2 = c.mol_generators
+            if find_overlapping_mol_site(ms2, [ms1]) is not None or find_overlapping_mol_site(ms2, [ms1, ms2]) != 1:
+                fail("Wrong overlapping mol_site")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  check_mol_sites")
+    try:
+        from pyxtal.molecular_crystal import mol_site, check_mol_sites, check_mol_crystal, molecular_crystal
+        from pyxtal.molecule import mol_from_collection
+        from pyxtal.symmetry import Group
+        from pyxtal.operations import Orientation
+        import numpy as np
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            mol = mol_from_collection('H2O')
+            wp = Group(1)[0]
+            lattice = np.eye(3) * 8.0
+            ms1 = mol_site(mol, np.array([0.,0.,0.]), Orientation(np.eye(3)), wp, lattice)
+            ms2 = mol_site(mol, np.array([.5,.5,.5]), Orientation(np.eye(3)), wp, lattice)
+            ms3 = mol_site(mol, np.array([.05,0.,0.]), Orientation(np.eye(3)), wp, lattice)
+            if check_mol_sites(ms1, ms2, atomic=True) is not True:
+                fail("Distant molecules overlap")
+            if check_mol_sites(ms1, ms3, atomic=True) is not False:
+                fail("Close molecules do not overlap")
+            if check_mol_sites(ms1, ms1, atomic=True) is not True:
+                fail("Molecule overlaps with itself")
+            if check_mol_crystal([ms1, ms2], lattice) is not True or check_mol_crystal([ms1, ms2, ms3], lattice) is not False:
+                fail("Wrong result for a set of sites")
+            c = molecular_crystal(14, ['H2O', 'CH4'], [4, 4], 1.0)
+            if c.valid and not check_mol_crystal(c.mol_generators, c.mol_generators[0].lattice, tm=c.tol_matrix):
+                fail("Generated crystal has overlapping molecules")
+        except Exception as e:
+            fail(e)
+
+    check()
+
+    print("  prepare_molecule")
+    try:
+        import pyxtal.symmetry
+        from pyxtal.molecular_crystal import prepare_molecule, prepared_molecules, molecule_fingerprint, molecular_crystal
+        from pyxtal.symmetry import Group
+        from pyxtal.molecule import mol_from_collection
+        import numpy as np
+        import tempfile, os, json
+    except Exception as e:
+        fail(e)
+
+    if passed():
+        try:
+            old_dir = pyxtal.symmetry.cache_dir
+            pyxtal.symmetry.cache_dir = tempfile.mkdtemp()
+            prepared_molecules.clear()
+            try:
+                mol = mol_from_collection('H2O')
+                p = prepare_molecule(mol)
+                if prepare_molecule(mol.copy()) is not p:
+                    fail("Same molecule prepared twice")
+                o = p.get_orientations(Group(14), False)
+                if p.get_orientations(Group(14), False) is not o:
+                    fail("Orientations not memoized")
+                #Group 36 has orientations with a rotation axis
+                o36 = p.get_orientations(Group(36), False)
+                c = molecular_crystal(14, [mol], [4], 1.0)
+                if c.prepared[0] is not p or c.valid_orientations[0] is not o:
+                    fail("Preparation not shared with molecular_crystal")
+                prepared_molecules.clear()
+                q = prepare_molecule(mol)
+                if q is p or len(q.symm_m) != len(p.symm_m) or q.radius != p.radius:
+                    fail("Prepared molecule not read back from disk")
+                if not os.path.exists(q.orientations_path(Group(14))):
+                    fail("Orientations not stored on disk")
+                for g, orientations in [(Group(14), o), (Group(36), o36)]:
+                    stored = [x for y in q.get_orientations(g, False) for z in y for x in z]
+                    original = [x for y in orientations for z in y for x in z]
+                    if len(stored) != len(original) or not all(x.degrees == y.degrees and np.allclose(x.matrix, y.matrix) for x, y in zip(stored, original)):
+                        fail("Orientations not read back from disk")
+                    if not all(np.allclose(x.axis, y.axis) for x, y in zip(stored, original) if x.degrees == 1):
+                        fail("Orientation axes not read back from disk")
+                #Files from another version are recomputed
+                path = pyxtal.symmetry.cache_path("molecules", molecule_fingerprint(mol) + ".json")
+                with open(path) as f:
+                    data = json.load(f)
+                data["version"] -= 1
+                data["radius"] = 0.0
+                with open(path, "w") as f:
+                    json.dump(data, f)
+                prepared_molecules.clear()
+                if prepare_molecule(mol).radius != p.radius:
+                    fail("Prepared molecule from another version was used")
+                path = p.orientations_path(Group(36))
+                with np.load(path) as f:
+                    arrays = dict(f)
+                arrays["version"] = arrays["version"] - 1
+                arrays["degrees"] = np.zeros_like(arrays["degrees"])
+                np.savez(path, **arrays)
+                prepared_molecules.clear()
+                stored = prepare_molecule(mol).get_orientations(Group(36), False)
+                if [[[x.degrees for x in z] for z in y] for y in stored] != [[[x.degrees for x in z] for z in y] for y in o36]:
+                    fail("Orientations from another version were used")
+            finally:
+                pyxtal.symmetry.cache_dir = old_dir
+        except Exception as e:
+            fail(e)
+
+    check()
+
     print("  molecular_crystal_2D")
     try:
         from pyxtal.molecular_crystal import molecular_crystal_2D
@@ -1484,6 +2254,14 @@ if __name__ == "__main__":
     except Exception as e:
         fail(e)
         sys.exit(0)
+    #Keep the files written by the tests out of the user's disk cache, unless
+    #a cache directory is given with PYXTAL_CACHE
+    import os, shutil, tempfile
+    import pyxtal.symmetry
+    test_cache_dir = None
+    if "PYXTAL_CACHE" not in os.environ:
+        test_cache_dir = tempfile.mkdtemp()
+        pyxtal.symmetry.cache_dir = test_cache_dir
     modules_lib = {
             'atomic': 'test_atomic()', 
             'molecular': 'test_molecular()',
@@ -1511,6 +2289,8 @@ if __name__ == "__main__":
         eval(modules_lib[module])
 
     masterend = time()
+    if test_cache_dir is not None:
+        shutil.rmtree(test_cache_dir, ignore_errors=True)
     mastertime = np.around((masterend-masterstart), decimals=2)
 
     print("TEST COMPLETE")